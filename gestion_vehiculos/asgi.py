@@ -3,6 +3,13 @@ ASGI config for gestion_vehiculos project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+Serving through ASGI (e.g. ``uvicorn gestion_vehiculos.asgi:application``)
+enables the live Server-Sent Events feed at ``/api/eventos/``; each open
+dashboard holds a lightweight async connection instead of a worker. Export
+downloads are also streamed block by block: the views hand Django an async
+iterator, so the sync generators are not collected into a list first. Under
+WSGI the dashboard falls back to long-polling ``/api/eventos/espera/``.
+
 For more information on this file, see
 https://docs.djangoproject.com/en/4.2/howto/deployment/asgi/
 """
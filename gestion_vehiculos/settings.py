@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/4.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -41,6 +42,10 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # Primero, para que la latencia incluya el resto de middlewares
+    'vehiculos.metricas.MetricasMiddleware',
+    # Antes que el resto para comprimir la respuesta final (las métricas miden los bytes comprimidos)
+    'vehiculos.compresion.CompresionMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -74,13 +79,33 @@ WSGI_APPLICATION = 'gestion_vehiculos.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/4.2/ref/settings/#databases
 
+# SQLite con el perfil de producción de vehiculos.backends.sqlite3 (PRAGMAs
+# y transacciones IMMEDIATE). Conexiones persistentes por hilo, verificadas
+# antes de reutilizarse.
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
+        'ENGINE': 'vehiculos.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'CONN_MAX_AGE': int(os.environ.get('VEHICULOS_DB_CONN_MAX_AGE', '600')),
+        'CONN_HEALTH_CHECKS': os.environ.get('VEHICULOS_DB_CONN_HEALTH_CHECKS', '1') == '1',
     }
 }
 
+# PRAGMAs aplicados a cada conexión nueva. WAL permite leer mientras se
+# escribe; con WAL, synchronous=NORMAL es seguro ante caídas del proceso
+# (una caída del sistema puede perder solo las últimas transacciones).
+# cache_size negativo está en KiB.
+VEHICULOS_SQLITE_PRAGMAS = {
+    'journal_mode': os.environ.get('VEHICULOS_SQLITE_JOURNAL_MODE', 'wal'),
+    'synchronous': os.environ.get('VEHICULOS_SQLITE_SYNCHRONOUS', 'normal'),
+    'cache_size': os.environ.get('VEHICULOS_SQLITE_CACHE_SIZE', '-65536'),
+    'mmap_size': os.environ.get('VEHICULOS_SQLITE_MMAP_SIZE', str(256 * 1024 * 1024)),
+    'temp_store': os.environ.get('VEHICULOS_SQLITE_TEMP_STORE', 'memory'),
+    'busy_timeout': os.environ.get('VEHICULOS_SQLITE_BUSY_TIMEOUT_MS', '20000'),
+}
+# Modo de BEGIN de las transacciones (DEFERRED, IMMEDIATE o EXCLUSIVE)
+VEHICULOS_SQLITE_TRANSACCION = os.environ.get('VEHICULOS_SQLITE_TRANSACCION', 'IMMEDIATE')
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
@@ -126,3 +151,88 @@ STATIC_URL = 'static/'
 # https://docs.djangoproject.com/en/4.2/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+
+# Paginación por cursor de la tabla principal
+VEHICULOS_PAGINA_TAMANO = 50
+VEHICULOS_PAGINA_MAXIMO = 500
+
+# Leer las estadísticas del tablero desde el resumen diario (ResumenDiario)
+# cuando los filtros lo permiten (sin filtro de placa ni de texto)
+VEHICULOS_STATS_DESDE_RESUMEN = True
+
+# Filas leídas por lote en las exportaciones en streaming
+VEHICULOS_EXPORT_LOTE = 2000
+
+# Filas por row group en las exportaciones Parquet/Arrow
+VEHICULOS_PARQUET_FILAS_POR_GRUPO = 65536
+
+# Feed incremental de cambios (api/cambios/)
+VEHICULOS_CAMBIOS_LIMITE = 1000
+VEHICULOS_CAMBIOS_LIMITE_MAXIMO = 10000
+VEHICULOS_CAMBIOS_MARGEN_SEGUNDOS = 2
+# Días que se conservan las marcas de eliminación (comando podar_eliminados);
+# los tokens más antiguos reciben 410 y deben sincronizar desde cero
+VEHICULOS_CAMBIOS_RETENCION_DIAS = 30
+
+# Exportaciones en segundo plano
+VEHICULOS_EXPORT_DIR = BASE_DIR / 'exportaciones'
+VEHICULOS_EXPORT_WORKERS = 2
+VEHICULOS_EXPORT_MAX_POR_USUARIO = 2
+VEHICULOS_EXPORT_TIMEOUT = 3600
+# Horas que se conservan los trabajos terminados y sus archivos
+VEHICULOS_EXPORT_RETENCION_HORAS = 24
+
+# Caché en disco de /exportar/ por filtros, formato y versión de datos (LRU por tamaño)
+VEHICULOS_EXPORT_CACHE_DIR = VEHICULOS_EXPORT_DIR / 'cache'
+VEHICULOS_EXPORT_CACHE_MAX_BYTES = 2 * 1024 ** 3
+
+# Caché de resultados versionada por los datos (vehiculos.cache_datos).
+# En disco para que todos los procesos de la máquina (workers de gunicorn)
+# vean la misma versión; con varias máquinas usar Redis o Memcached.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': BASE_DIR / 'cache',
+        'OPTIONS': {'MAX_ENTRIES': 5000},
+    }
+}
+VEHICULOS_CACHE_TTL = 300
+
+# Índice de trigramas (PlacaTrigrama) para buscar placas por contenido;
+# sin él solo las búsquedas por prefijo usan índice
+VEHICULOS_PLACA_TRIGRAMAS = True
+
+# Ids por sentencia UPDATE en la validación masiva (límite de variables de SQLite)
+VEHICULOS_VALIDACION_LOTE = 900
+
+# Importación de archivos (importar_vehiculos, api/importar/): filas por trozo
+# (una transacción cada uno) y errores de fila devueltos como máximo
+VEHICULOS_IMPORTACION_LOTE = 5000
+VEHICULOS_IMPORTACION_MAX_ERRORES = 1000
+
+# Grupos máximos de api/analitica/; con más se devuelven los de mayor facturación
+VEHICULOS_ANALITICA_MAX_GRUPOS = 5000
+
+# Filas por trozo leído y escrito por el comando exportar_powerbi
+VEHICULOS_POWERBI_LOTE = 50000
+
+# Calidad de brotli (0-11) para las respuestas comprimidas al vuelo
+VEHICULOS_BROTLI_CALIDAD = 5
+
+# Eventos en vivo (api/eventos/): sondeo de la versión de datos para detectar
+# escrituras de otros procesos (también el intervalo del long-poll entre
+# respuestas vacías) y espera máxima del long-poll. Con 0 la respuesta es
+# inmediata; esperar retiene un worker WSGI por pestaña abierta
+VEHICULOS_EVENTOS_SONDEO_SEGUNDOS = 5
+VEHICULOS_EVENTOS_ESPERA_SEGUNDOS = 0
+# Con False el proceso no arranca el hilo detector: solo reparte lo que se
+# publique en él (p. ej. procesos que no sirven api/eventos/)
+VEHICULOS_EVENTOS_DETECTOR = True
+
+# Métricas de Prometheus (/metrics). Con token, el scraper debe enviar
+# "Authorization: Bearer <token>"; sin él conviene restringir la ruta en el proxy
+VEHICULOS_METRICAS_TOKEN = os.environ.get('VEHICULOS_METRICAS_TOKEN', '')
+# Registrar (logger vehiculos.metricas) las peticiones más lentas que este
+# umbral junto con su SQL; None lo desactiva
+VEHICULOS_METRICAS_LENTO_MS = None
@@ -0,0 +1,167 @@
+"""
+Analítica de la flota sobre columnas de NumPy/pandas.
+
+En lugar de recorrer instancias de ``Vehiculo`` se leen solo las columnas
+necesarias (``columnas``) y los KPIs se calculan con ``groupby`` vectorizados
+por cualquier combinación de dimensiones: cliente, tipo, estado, prioridad,
+validación, placa, día o mes (local). Los resultados se cachean por versión
+de datos en la vista.
+"""
+import numpy as np
+import pandas as pd
+from django.conf import settings
+from django.db import connection, models
+from django.utils import timezone
+
+
+# Dimensión pública -> campo (dia y mes se derivan de fecha_inicio en hora local)
+DIMENSIONES = {
+    'cliente': 'cliente',
+    'tipo': 'tipo_vehiculo',
+    'estado': 'estado',
+    'prioridad': 'prioridad',
+    'validado': 'validado',
+    'placa': 'placa_normalizada',
+    'dia': 'fecha_inicio',
+    'mes': 'fecha_inicio',
+}
+MAX_DIMENSIONES = 3
+
+CAMPOS_METRICAS = ('numero_entregas', 'facturacion', 'duracion_horas', 'validado', 'rendimiento')
+# Percentiles de rendimiento y facturación por viaje
+PERCENTILES = (10, 50, 90)
+
+
+def max_grupos():
+    return getattr(settings, 'VEHICULOS_ANALITICA_MAX_GRUPOS', 5000)
+
+
+def _convertir(tabla, modelo):
+    for campo in tabla.columns:
+        tipo = modelo._meta.get_field(campo)
+        if isinstance(tipo, models.DateTimeField):
+            tabla[campo] = pd.to_datetime(tabla[campo], utc=True, format='ISO8601')
+        elif isinstance(tipo, models.DecimalField):
+            tabla[campo] = tabla[campo].astype(float)
+        elif isinstance(tipo, models.BooleanField):
+            tabla[campo] = tabla[campo].astype(bool)
+    return tabla
+
+
+def columnas(queryset, campos):
+    """
+    Columnas ``campos`` del queryset como DataFrame, convertidas por columna.
+
+    Se lee con el cursor en lugar de ``values_list``: los conversores del
+    ORM (fechas, decimales) se aplican valor a valor y cuestan más que la
+    propia consulta. Las fechas quedan en UTC, los decimales como float.
+    """
+    sql, params = queryset.order_by().values_list(*campos).query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        tabla = pd.DataFrame.from_records(cursor.fetchall(), columns=campos)
+    return _convertir(tabla, queryset.model)
+
+
+def trozos_columnas(queryset, campos, tamano):
+    """Como ``columnas`` pero en DataFrames de hasta ``tamano`` filas, respetando el orden del queryset"""
+    sql, params = queryset.values_list(*campos).query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        while True:
+            filas = cursor.fetchmany(tamano)
+            if not filas:
+                return
+            yield _convertir(pd.DataFrame.from_records(filas, columns=campos), queryset.model)
+
+
+def dimensiones(texto):
+    """Validar ``por`` (dimensiones separadas por comas); lanza ValueError si no es válido"""
+    nombres = [nombre.strip() for nombre in (texto or '').split(',') if nombre.strip()]
+    invalidas = [nombre for nombre in nombres if nombre not in DIMENSIONES]
+    if invalidas:
+        raise ValueError(f'Dimensiones no válidas: {", ".join(invalidas)} '
+                         f'(se admiten {", ".join(DIMENSIONES)})')
+    if len(nombres) > MAX_DIMENSIONES or len(set(nombres)) != len(nombres):
+        raise ValueError(f'Se admiten hasta {MAX_DIMENSIONES} dimensiones distintas')
+    return nombres
+
+
+def _claves(tabla, nombres):
+    # Arrays y no Series: pandas excluye de la agregación las columnas usadas como clave
+    claves = {}
+    if 'dia' in nombres or 'mes' in nombres:
+        # Se agrupa por datetime64 truncado; las etiquetas se formatean solo por grupo
+        local = tabla['fecha_inicio'].dt.tz_convert(timezone.get_current_timezone()).dt.tz_localize(None).to_numpy()
+        claves['dia'] = local.astype('datetime64[D]')
+        claves['mes'] = local.astype('datetime64[M]')
+    for nombre in nombres:
+        if nombre not in claves:
+            claves[nombre] = tabla[DIMENSIONES[nombre]].to_numpy()
+    return [claves[nombre] for nombre in nombres]
+
+
+def _kpis(grupos):
+    """KPIs de cada grupo de un ``DataFrameGroupBy`` como DataFrame (una fila por grupo)"""
+    resultado = grupos.agg(
+        viajes=('numero_entregas', 'size'),
+        validados=('validado', 'sum'),
+        entregas=('numero_entregas', 'sum'),
+        facturacion=('facturacion', 'sum'),
+        horas=('duracion_horas', 'sum'),
+    )
+    viajes = resultado['viajes'].to_numpy()
+    entregas = resultado['entregas'].to_numpy(dtype=float)
+    horas = resultado['horas'].to_numpy()
+    with np.errstate(divide='ignore', invalid='ignore'):
+        resultado['tasa_validacion'] = 100 * resultado['validados'] / viajes
+        resultado['promedio_entregas'] = entregas / viajes
+        resultado['promedio_facturacion'] = resultado['facturacion'] / viajes
+        # Mismas definiciones agregadas que las estadísticas del tablero
+        resultado['facturacion_por_entrega'] = np.where(entregas > 0, resultado['facturacion'] / entregas, 0)
+        resultado['rendimiento'] = np.where(horas > 0, entregas / horas, 0)
+    for percentil in PERCENTILES:
+        resultado[f'rendimiento_p{percentil}'] = grupos['rendimiento'].quantile(percentil / 100)
+        resultado[f'facturacion_p{percentil}'] = grupos['facturacion'].quantile(percentil / 100)
+    return resultado.round(2)
+
+
+def analizar(queryset, nombres):
+    """
+    KPIs del queryset en total y por las dimensiones ``nombres``.
+
+    Devuelve ``{'dimensiones', 'total', 'grupos', 'truncado'}`` (``total`` es
+    None si no hay viajes). Con más de ``VEHICULOS_ANALITICA_MAX_GRUPOS``
+    grupos se devuelven los de mayor facturación.
+    """
+    campos = sorted(set(CAMPOS_METRICAS) | {DIMENSIONES[nombre] for nombre in nombres})
+    tabla = columnas(queryset, campos)
+    tabla['duracion_horas'] = tabla['duracion_horas'].fillna(0)
+
+    if tabla.empty:
+        return {'dimensiones': nombres, 'total': None, 'grupos': [], 'truncado': False}
+
+    total = _kpis(tabla.groupby(np.zeros(len(tabla), dtype=int))).to_dict('records')[0]
+    grupos = []
+    truncado = False
+    if nombres:
+        resultado = _kpis(tabla.groupby(_claves(tabla, nombres), sort=True))
+        resultado.index.names = nombres
+        limite = max_grupos()
+        if len(resultado) > limite:
+            resultado = resultado.nlargest(limite, 'facturacion').sort_index()
+            truncado = True
+        resultado = resultado.reset_index()
+        if 'dia' in nombres:
+            resultado['dia'] = resultado['dia'].dt.date
+        if 'mes' in nombres:
+            resultado['mes'] = resultado['mes'].dt.strftime('%Y-%m')
+        grupos = resultado.to_dict('records')
+
+    return {
+        'dimensiones': nombres,
+        'total': total,
+        'grupos': grupos,
+        'truncado': truncado,
+    }
+
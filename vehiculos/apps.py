@@ -4,3 +4,14 @@ from django.apps import AppConfig
 class VehiculosConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'vehiculos'
+
+    def ready(self):
+        from django.db.backends.signals import connection_created
+        from django.db.models.signals import post_migrate
+
+        from . import signals  # noqa: F401
+        from .busqueda import restaurar_triggers_fts
+        from .metricas import instalar_contador
+
+        connection_created.connect(instalar_contador)
+        post_migrate.connect(restaurar_triggers_fts, sender=self)
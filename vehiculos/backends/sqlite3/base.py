@@ -0,0 +1,50 @@
+"""
+Backend SQLite con el perfil de conexión de producción.
+
+Cada conexión nueva aplica ``VEHICULOS_SQLITE_PRAGMAS`` (WAL, synchronous,
+caché, mmap, temp_store, busy_timeout). En WAL los lectores no bloquean al
+escritor ni al revés: una exportación larga ya no impide validar.
+
+Las transacciones (``atomic``) empiezan con ``BEGIN`` +
+``VEHICULOS_SQLITE_TRANSACCION`` (``IMMEDIATE`` por defecto). Con un BEGIN
+diferido, una transacción que lee y luego escribe (validación masiva,
+resumen diario) intenta ampliar su bloqueo a mitad de camino y, si otro
+escritor confirmó entretanto, SQLite devuelve "database is locked" sin
+esperar el ``busy_timeout``. IMMEDIATE toma el bloqueo de escritura al
+empezar, de modo que las transacciones concurrentes esperan su turno.
+"""
+import re
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db.backends.sqlite3 import base
+
+
+_VALOR_PRAGMA = re.compile(r'^-?\w+$')
+
+
+def pragmas():
+    """PRAGMAs configurados, validados (se interpolan en el SQL)"""
+    configurados = getattr(settings, 'VEHICULOS_SQLITE_PRAGMAS', {})
+    for nombre, valor in configurados.items():
+        if not nombre.isidentifier() or not _VALOR_PRAGMA.match(str(valor)):
+            raise ImproperlyConfigured(f'PRAGMA inválido en VEHICULOS_SQLITE_PRAGMAS: {nombre} = {valor}')
+    return configurados
+
+
+def modo_transaccion():
+    modo = (getattr(settings, 'VEHICULOS_SQLITE_TRANSACCION', '') or 'DEFERRED').upper()
+    if modo not in ('DEFERRED', 'IMMEDIATE', 'EXCLUSIVE'):
+        raise ImproperlyConfigured(f'VEHICULOS_SQLITE_TRANSACCION inválido: {modo}')
+    return modo
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    def get_new_connection(self, conn_params):
+        conexion = super().get_new_connection(conn_params)
+        for nombre, valor in pragmas().items():
+            conexion.execute(f'PRAGMA {nombre} = {valor}')
+        return conexion
+
+    def _start_transaction_under_autocommit(self):
+        self.cursor().execute(f'BEGIN {modo_transaccion()}')
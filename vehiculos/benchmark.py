@@ -0,0 +1,369 @@
+"""
+Benchmark de vistas, estadísticas y exportaciones.
+
+Cada caso se ejecuta con el cliente de pruebas de Django (o directamente, si
+es una función) con la caché vacía, es decir, en el peor caso. Por caso se
+registran el tiempo (mediana y mínimo de ``repeticiones`` pasadas), el número
+de consultas SQL, el pico de memoria de Python (tracemalloc, en una pasada
+aparte para no distorsionar el tiempo) y el tamaño de la respuesta.
+
+``max_consultas`` de cada caso es el presupuesto que verifican los tests: un
+N+1 o una consulta de más hace fallar la suite.
+"""
+import json
+import logging
+import platform
+import random
+import sqlite3
+import statistics
+import tempfile
+import threading
+import time
+import tracemalloc
+from collections import namedtuple
+from contextlib import contextmanager
+from pathlib import Path
+
+import django
+from django.core.cache import cache
+from django.conf import settings
+from django.db import close_old_connections, connection, connections
+from django.test import Client
+from django.test.utils import (
+    CaptureQueriesContext, override_settings, setup_test_environment, teardown_test_environment,
+)
+from django.utils import timezone
+
+from . import cache_datos
+from .models import TrabajoExportacion, Vehiculo
+from .views import calculate_real_time_stats
+
+
+Caso = namedtuple('Caso', 'nombre ejecutar max_consultas')
+
+# Consultas de sesión y usuario que hace toda vista con login_required
+CONSULTAS_SESION = 2
+
+
+def _contenido(respuesta):
+    if respuesta.status_code >= 400:
+        raise AssertionError(f'{respuesta.request["PATH_INFO"]} respondió {respuesta.status_code}')
+    if respuesta.streaming:
+        return sum(len(bloque) for bloque in respuesta.streaming_content)
+    return len(respuesta.content)
+
+
+def get(ruta, **params):
+    """Caso GET; ``ruta`` admite campos del contexto como ``{vehiculo}``"""
+    def ejecutar(cliente, contexto):
+        return _contenido(cliente.get(ruta.format(**contexto), params))
+    return ejecutar
+
+
+def _stats_directas(cliente, contexto):
+    return len(json.dumps(calculate_real_time_stats(Vehiculo.objects.all()), default=str))
+
+
+def _validar_y_revertir(cliente, contexto):
+    tamano = 0
+    for accion in ('validate', 'invalidate'):
+        tamano += _contenido(cliente.post('/api/bulk-validation/', {
+            'action': accion, 'vehicle_ids[]': contexto['ids_validacion'],
+        }))
+    return tamano
+
+
+CASOS = [
+    # Página, stats desde el resumen y última actualización
+    Caso('principal', get('/'), CONSULTAS_SESION + 3),
+    Caso('principal_filtrada', get('/', placa='ABC', fecha_inicio='2000-01-01', validado='true'),
+         CONSULTAS_SESION + 2),
+    Caso('calculate_real_time_stats', _stats_directas, 1),
+    Caso('exportar_resumen', get('/exportar/', type='resumen'), CONSULTAS_SESION + 1),
+    Caso('exportar_csv', get('/exportar/', type='csv'), CONSULTAS_SESION + 1),
+    Caso('exportar_csv_gzip', get('/exportar/', type='csv', gzip='1'), CONSULTAS_SESION + 1),
+    Caso('exportar_excel', get('/exportar/', type='excel'), CONSULTAS_SESION + 1),
+    Caso('exportar_parquet', get('/exportar/', type='parquet'), CONSULTAS_SESION + 1),
+    Caso('exportar_arrow', get('/exportar/', type='arrow'), CONSULTAS_SESION + 1),
+    Caso('api_real_time_stats', get('/api/real-time-stats/'), CONSULTAS_SESION + 2),
+    Caso('api_real_time_stats_placa', get('/api/real-time-stats/', placa='ABC'), CONSULTAS_SESION + 1),
+    # Además de la consulta guarda la sesión (transacción + UPDATE)
+    Caso('api_check_updates', get('/api/check-updates/'), CONSULTAS_SESION + 4),
+    Caso('api_vehiculos', get('/api/vehiculos/'), CONSULTAS_SESION + 1),
+    Caso('api_vehicle_details', get('/api/vehicle/{vehiculo}/'), CONSULTAS_SESION + 1),
+    Caso('api_cambios', get('/api/cambios/', limite='1000'), CONSULTAS_SESION + 3),
+    Caso('api_buscar', get('/api/buscar/', q='urgente'), CONSULTAS_SESION + 2),
+    Caso('api_ranking_rendimiento', get('/api/ranking-rendimiento/'), CONSULTAS_SESION + 1),
+    Caso('api_analitica', get('/api/analitica/', por='cliente,tipo'), CONSULTAS_SESION + 1),
+    Caso('api_exportacion_estado', get('/api/exportaciones/{trabajo}/'), CONSULTAS_SESION + 1),
+    # Valida e invalida los mismos ids (un lote) en cada pasada para no alterar los datos.
+    # Por petición: transacción, agrupado, UPDATE, upsert del resumen y borrado de
+    # filas vacías, sin importar cuántas filas del resumen cambien
+    Caso('api_bulk_validation', _validar_y_revertir, 2 * (CONSULTAS_SESION + 10)),
+]
+
+
+def preparar_contexto(usuario):
+    """Objetos que necesitan las rutas de los casos (ids existentes)"""
+    vehiculo = Vehiculo.objects.order_by('-fecha_inicio').values_list('pk', flat=True).first()
+    trabajo = TrabajoExportacion.objects.create(
+        usuario=usuario, formato='csv', estado='completado', finalizado_at=timezone.now()
+    )
+    ids = list(
+        Vehiculo.objects.filter(validado=False).order_by('-fecha_inicio').values_list('pk', flat=True)[:100]
+    )
+    return {'vehiculo': vehiculo, 'trabajo': trabajo.pk, 'ids_validacion': ids}
+
+
+def vaciar_cache():
+    """Vaciar los resultados cacheados conservando la versión de datos, como tras un desalojo"""
+    cache.clear()
+    cache_datos.version_datos()
+
+
+def medir(caso, cliente, contexto, repeticiones=3):
+    """Medir un caso; la caché se vacía antes de cada pasada"""
+    tiempos = []
+    for _ in range(repeticiones):
+        vaciar_cache()
+        inicio = time.perf_counter()
+        caso.ejecutar(cliente, contexto)
+        tiempos.append(time.perf_counter() - inicio)
+
+    vaciar_cache()
+    tracemalloc.start()
+    try:
+        with CaptureQueriesContext(connection) as consultas:
+            tamano = caso.ejecutar(cliente, contexto)
+        _, pico = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        'tiempo_ms': round(statistics.median(tiempos) * 1000, 2),
+        'tiempo_min_ms': round(min(tiempos) * 1000, 2),
+        'consultas': len(consultas),
+        'max_consultas': caso.max_consultas,
+        'memoria_pico_kb': round(pico / 1024, 1),
+        'bytes': tamano,
+    }
+
+
+def ejecutar_casos(usuario, repeticiones=3, nombres=None, progreso=None):
+    """Ejecutar los casos (todos o los de ``nombres``) sobre los datos actuales"""
+    cliente = Client()
+    cliente.force_login(usuario)
+    contexto = preparar_contexto(usuario)
+    resultados = {}
+    # Caché de exportaciones aparte; al vaciar la caché cambia la versión de los datos,
+    # así que cada pasada genera los archivos de nuevo
+    with tempfile.TemporaryDirectory(prefix='benchmark_exportaciones_') as directorio:
+        with override_settings(VEHICULOS_EXPORT_CACHE_DIR=directorio):
+            for caso in CASOS:
+                if nombres and caso.nombre not in nombres:
+                    continue
+                resultados[caso.nombre] = medir(caso, cliente, contexto, repeticiones)
+                if progreso:
+                    progreso(caso.nombre, resultados[caso.nombre])
+    return resultados
+
+
+@contextmanager
+def base_de_datos_temporal():
+    """
+    Base de datos y caché de prueba en un directorio temporal (nunca se tocan
+    los datos ni la caché reales).
+
+    En archivo y no en memoria para medir E/S y bloqueos reales y poder
+    abrir conexiones desde varios hilos. La caché es propia para que
+    ``vaciar_cache()`` no borre la de la aplicación ni la versión de datos de
+    la base real se mezcle con la de la temporal.
+    """
+    directorio = tempfile.TemporaryDirectory(prefix='benchmark_vehiculos_')
+    nombre_original = connection.settings_dict['NAME']
+    connection.settings_dict.setdefault('TEST', {})['NAME'] = str(Path(directorio.name) / 'benchmark.sqlite3')
+    caches = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': str(Path(directorio.name) / 'cache'),
+            'OPTIONS': {'MAX_ENTRIES': 5000},
+        }
+    }
+    setup_test_environment()
+    try:
+        with override_settings(CACHES=caches):
+            connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+            try:
+                yield
+            finally:
+                connection.creation.destroy_test_db(nombre_original, verbosity=0)
+    finally:
+        teardown_test_environment()
+        directorio.cleanup()
+
+
+# Perfil de conexión por defecto de Django frente al de settings
+PERFILES_CONEXION = {
+    'antes': {
+        'pragmas': {'journal_mode': 'delete'},
+        'transaccion': 'DEFERRED',
+        'conn_max_age': 0,
+        'health_checks': False,
+    },
+    'despues': None,
+}
+
+
+@contextmanager
+def perfil_conexion(nombre):
+    """Aplicar a las conexiones nuevas uno de ``PERFILES_CONEXION``"""
+    perfil = PERFILES_CONEXION[nombre] or {
+        'pragmas': settings.VEHICULOS_SQLITE_PRAGMAS,
+        'transaccion': settings.VEHICULOS_SQLITE_TRANSACCION,
+        'conn_max_age': connection.settings_dict['CONN_MAX_AGE'],
+        'health_checks': connection.settings_dict['CONN_HEALTH_CHECKS'],
+    }
+    # Todas las conexiones (una por hilo) comparten settings_dict
+    ajustes = connection.settings_dict
+    previos = ajustes['CONN_MAX_AGE'], ajustes['CONN_HEALTH_CHECKS']
+    connections.close_all()
+    ajustes['CONN_MAX_AGE'], ajustes['CONN_HEALTH_CHECKS'] = perfil['conn_max_age'], perfil['health_checks']
+    try:
+        with override_settings(VEHICULOS_SQLITE_PRAGMAS=perfil['pragmas'],
+                               VEHICULOS_SQLITE_TRANSACCION=perfil['transaccion']):
+            yield perfil
+    finally:
+        connections.close_all()
+        ajustes['CONN_MAX_AGE'], ajustes['CONN_HEALTH_CHECKS'] = previos
+
+
+def _validar(cliente, ids, rng):
+    respuesta = cliente.post('/toggle-validacion/', {
+        'vehiculo_id': rng.choice(ids), 'validado': rng.choice(('true', 'false')),
+    })
+    datos = respuesta.json()
+    if not datos['success']:
+        raise RuntimeError(datos['message'])
+
+
+def _exportar(cliente, ids, rng):
+    respuesta = cliente.get('/exportar/', {'type': 'csv'})
+    for _ in respuesta.streaming_content:
+        pass
+    respuesta.close()
+
+
+def _stats(cliente, ids, rng):
+    vaciar_cache()
+    _contenido(cliente.get('/api/real-time-stats/', {'placa': rng.choice('ABCDEFGH')}))
+
+
+# Operaciones de la carga mixta: validaciones (escritura) frente a
+# exportaciones en streaming y estadísticas sin caché (lectura)
+OPERACIONES = {'validar': _validar, 'exportar': _exportar, 'stats': _stats}
+
+
+def carga_concurrente(usuario, hilos, segundos, semilla=0):
+    """
+    Ejecutar durante ``segundos`` la carga mixta con ``hilos`` ({operación: hilos}).
+
+    Cada hilo usa su propio cliente y su propia conexión. Devuelve, por
+    operación, el throughput, la latencia (p50/p95/máx) y los errores.
+    """
+    ids = list(Vehiculo.objects.values_list('pk', flat=True))
+    # Una sola sesión, creada antes de que empiece la contención
+    sesion = Client()
+    sesion.force_login(usuario)
+    medidas = {nombre: {'latencias': [], 'errores': []} for nombre in hilos}
+    lock = threading.Lock()
+    fin = time.perf_counter() + segundos
+
+    def trabajar(nombre, numero):
+        rng = random.Random(f'{semilla}-{nombre}-{numero}')
+        cliente = Client()
+        cliente.cookies = sesion.cookies
+        try:
+            while time.perf_counter() < fin:
+                inicio = time.perf_counter()
+                try:
+                    OPERACIONES[nombre](cliente, ids, rng)
+                    error = None
+                except Exception as e:
+                    error = str(e)
+                latencia = time.perf_counter() - inicio
+                # El cliente de pruebas no cierra la conexión al terminar la
+                # petición como hace el servidor; se reproduce según CONN_MAX_AGE
+                close_old_connections()
+                with lock:
+                    medidas[nombre]['latencias'].append(latencia)
+                    if error:
+                        medidas[nombre]['errores'].append(error)
+        finally:
+            connections.close_all()
+
+    trabajadores = [
+        threading.Thread(target=trabajar, args=(nombre, numero))
+        for nombre, cantidad in hilos.items()
+        for numero in range(cantidad)
+    ]
+    # Los errores se cuentan en los resultados; sin el traceback de cada 500
+    registro_peticiones = logging.getLogger('django.request')
+    nivel = registro_peticiones.level
+    registro_peticiones.setLevel(logging.CRITICAL)
+    try:
+        for trabajador in trabajadores:
+            trabajador.start()
+        for trabajador in trabajadores:
+            trabajador.join()
+    finally:
+        registro_peticiones.setLevel(nivel)
+
+    resultados = {}
+    for nombre, medida in medidas.items():
+        latencias = sorted(medida['latencias']) or [0]
+        errores = medida['errores']
+        resultados[nombre] = {
+            'operaciones': len(medida['latencias']),
+            'por_segundo': round((len(medida['latencias']) - len(errores)) / segundos, 2),
+            'errores': len(errores),
+            'bloqueos': sum('locked' in error for error in errores),
+            'p50_ms': round(latencias[len(latencias) // 2] * 1000, 1),
+            'p95_ms': round(latencias[int(len(latencias) * 0.95)] * 1000, 1),
+            'max_ms': round(latencias[-1] * 1000, 1),
+        }
+    return resultados
+
+
+def entorno():
+    return {
+        'python': platform.python_version(),
+        'django': django.get_version(),
+        'sqlite': sqlite3.sqlite_version,
+        'plataforma': platform.platform(),
+    }
+
+
+def comparar(actual, base, tolerancia=0.25, ruido_ms=5):
+    """
+    Regresiones de ``actual`` frente a ``base`` (ambos con la forma de los resultados).
+
+    Un caso empeora si hace más consultas, o si su mediana supera la de la
+    base en más de ``tolerancia`` (fracción) y de ``ruido_ms`` milisegundos.
+    """
+    regresiones = []
+    for tamano, casos in actual['resultados'].items():
+        casos_base = base.get('resultados', {}).get(tamano, {})
+        for nombre, medida in casos.items():
+            previa = casos_base.get(nombre)
+            if not previa:
+                continue
+            if medida['consultas'] > previa['consultas']:
+                regresiones.append(
+                    f'{tamano} {nombre}: {previa["consultas"]} -> {medida["consultas"]} consultas'
+                )
+            limite = previa['tiempo_ms'] * (1 + tolerancia)
+            if medida['tiempo_ms'] > limite and medida['tiempo_ms'] - previa['tiempo_ms'] > ruido_ms:
+                regresiones.append(
+                    f'{tamano} {nombre}: {previa["tiempo_ms"]} -> {medida["tiempo_ms"]} ms'
+                )
+    return regresiones
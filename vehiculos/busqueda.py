@@ -0,0 +1,178 @@
+"""
+Búsqueda de texto libre sobre ``observacion`` y ``cliente`` con SQLite FTS5.
+
+``vehiculos_vehiculo_fts`` es una tabla FTS5 de contenido externo: guarda
+solo el índice invertido y lee el texto de ``vehiculos_vehiculo``. Los
+triggers creados en las migraciones 0009 y 0011 la mantienen sincronizada con
+cualquier escritura (``save()``, ``update()``, ``bulk_create()`` o SQL
+directo). En otros motores se recurre a ``icontains``.
+"""
+import re
+from contextlib import contextmanager
+
+from django.db import connection, connections
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+
+
+TABLA_FTS = 'vehiculos_vehiculo_fts'
+TRIGGERS_FTS = ('vehiculos_vehiculo_fts_ai', 'vehiculos_vehiculo_fts_ad', 'vehiculos_vehiculo_fts_au')
+
+# Mismos triggers que crean las migraciones 0009 y 0011 (UPDATE solo si cambia el texto)
+SQL_TRIGGERS_FTS = {
+    'vehiculos_vehiculo_fts_ai': f"""
+        CREATE TRIGGER vehiculos_vehiculo_fts_ai AFTER INSERT ON vehiculos_vehiculo BEGIN
+            INSERT INTO {TABLA_FTS}(rowid, observacion, cliente)
+            VALUES (new.id, new.observacion, new.cliente);
+        END
+    """,
+    'vehiculos_vehiculo_fts_ad': f"""
+        CREATE TRIGGER vehiculos_vehiculo_fts_ad AFTER DELETE ON vehiculos_vehiculo BEGIN
+            INSERT INTO {TABLA_FTS}({TABLA_FTS}, rowid, observacion, cliente)
+            VALUES ('delete', old.id, old.observacion, old.cliente);
+        END
+    """,
+    'vehiculos_vehiculo_fts_au': f"""
+        CREATE TRIGGER vehiculos_vehiculo_fts_au AFTER UPDATE OF observacion, cliente ON vehiculos_vehiculo
+        WHEN old.observacion IS NOT new.observacion OR old.cliente IS NOT new.cliente BEGIN
+            INSERT INTO {TABLA_FTS}({TABLA_FTS}, rowid, observacion, cliente)
+            VALUES ('delete', old.id, old.observacion, old.cliente);
+            INSERT INTO {TABLA_FTS}(rowid, observacion, cliente)
+            VALUES (new.id, new.observacion, new.cliente);
+        END
+    """,
+}
+
+# Palabras de la consulta: letras y dígitos (incluye acentos)
+_PALABRA = re.compile(r'\w+', re.UNICODE)
+
+
+def fts_disponible():
+    return connection.vendor == 'sqlite'
+
+
+def consulta_fts(texto):
+    """
+    Convertir el texto del usuario en una consulta FTS5 segura.
+
+    Cada palabra se entrecomilla (la sintaxis de FTS5 no llega al usuario) y
+    la última se busca como prefijo para que funcione mientras se escribe.
+    """
+    palabras = _PALABRA.findall(texto or '')
+    if not palabras:
+        return ''
+    terminos = [f'"{palabra}"' for palabra in palabras]
+    terminos[-1] += '*'
+    return ' '.join(terminos)
+
+
+def filtrar_texto(queryset, texto):
+    """Restringir el queryset a los vehículos que contienen todas las palabras de ``texto``"""
+    consulta = consulta_fts(texto)
+    if not consulta:
+        return queryset
+    if not fts_disponible():
+        condicion = Q()
+        for palabra in _PALABRA.findall(texto):
+            condicion &= Q(observacion__icontains=palabra) | Q(cliente__icontains=palabra)
+        return queryset.filter(condicion)
+    return queryset.filter(id__in=RawSQL(
+        f'SELECT rowid FROM {TABLA_FTS} WHERE {TABLA_FTS} MATCH %s', (consulta,)
+    ))
+
+
+def buscar(texto, limite=20, queryset=None):
+    """
+    Resultados ordenados por relevancia (BM25) como ``[(id, rango, fragmento)]``.
+
+    ``rank`` está configurado en la migración como ``bm25(1.0, 2.0)``:
+    ``cliente`` pesa más que ``observacion``. El fragmento resalta las
+    coincidencias de la observación con ``[`` ``]``. Si se indica
+    ``queryset``, solo se consideran sus filas.
+    """
+    consulta = consulta_fts(texto)
+    if not consulta or not fts_disponible():
+        return []
+
+    sql = (
+        f'SELECT rowid, rank, '
+        f"snippet({TABLA_FTS}, 0, '[', ']', '…', 12) "
+        f'FROM {TABLA_FTS} WHERE {TABLA_FTS} MATCH %s'
+    )
+    params = [consulta]
+    if queryset is not None:
+        subconsulta, subparams = queryset.order_by().values('id').query.sql_with_params()
+        # '+rowid' impide que SQLite pase el IN a FTS5 como una búsqueda por
+        # rowid para cada id del subconjunto (segundos en vez de milisegundos)
+        sql += f' AND +rowid IN ({subconsulta})'
+        params.extend(subparams)
+    sql += ' ORDER BY rank LIMIT %s'
+    params.append(limite)
+
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return cursor.fetchall()
+
+
+def reconstruir_fts():
+    """Regenerar el índice FTS completo desde la tabla de vehículos"""
+    if not fts_disponible():
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute(f"INSERT INTO {TABLA_FTS}({TABLA_FTS}) VALUES ('rebuild')")
+        cursor.execute(f"INSERT INTO {TABLA_FTS}({TABLA_FTS}) VALUES ('optimize')")
+    return True
+
+
+@contextmanager
+def fts_suspendido():
+    """
+    Retirar los triggers FTS durante una carga o un vaciado masivo.
+
+    Indexar fila a fila desde el trigger multiplica el costo de cada INSERT;
+    al salir se restauran los triggers y el índice se reconstruye de una vez,
+    incluyendo lo que otras conexiones hayan escrito mientras tanto.
+    """
+    if not fts_disponible():
+        yield
+        return
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT name, sql FROM sqlite_master WHERE type = 'trigger' AND name IN (%s, %s, %s)",
+            TRIGGERS_FTS,
+        )
+        triggers = cursor.fetchall()
+        for nombre, _ in triggers:
+            cursor.execute(f'DROP TRIGGER {nombre}')
+    try:
+        yield
+    finally:
+        with connection.cursor() as cursor:
+            for _, sql in triggers:
+                cursor.execute(sql)
+        reconstruir_fts()
+
+
+def restaurar_triggers_fts(using='default', **kwargs):
+    """
+    Recrear los triggers FTS que falten y reconstruir el índice (receptor de ``post_migrate``).
+
+    En SQLite las migraciones que alteran ``vehiculos_vehiculo`` copian la
+    tabla a una nueva y borran la original, y con ella sus triggers.
+    """
+    conexion = connections[using]
+    if conexion.vendor != 'sqlite':
+        return []
+    with conexion.cursor() as cursor:
+        cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name = %s", [TABLA_FTS])
+        if cursor.fetchone() is None:
+            return []
+        cursor.execute("SELECT name FROM sqlite_master WHERE type = 'trigger'")
+        existentes = {nombre for nombre, in cursor.fetchall()}
+        faltantes = [nombre for nombre in TRIGGERS_FTS if nombre not in existentes]
+        for nombre in faltantes:
+            cursor.execute(SQL_TRIGGERS_FTS[nombre])
+        if faltantes:
+            cursor.execute(f"INSERT INTO {TABLA_FTS}({TABLA_FTS}) VALUES ('rebuild')")
+    return faltantes
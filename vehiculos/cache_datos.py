@@ -0,0 +1,115 @@
+"""
+Caché de resultados de consultas versionada por los datos.
+
+Todas las claves incluyen un contador global de versión que se incrementa
+después de cada escritura confirmada sobre ``Vehiculo``. El contador es una
+fila de ``VersionDatos``, compartida por todos los procesos; la caché guarda
+una copia para que leerla no cueste consultas, así que con varios procesos
+el backend de caché también debe ser compartido. En lugar de borrar
+claves (los backends de Django no permiten borrar por patrón), una escritura
+simplemente deja huérfanas las entradas anteriores, que expiran por TTL.
+"""
+import hashlib
+import json
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F
+from django.dispatch import Signal
+
+
+CLAVE_VERSION = 'vehiculos:version'
+
+# Se emite (tras el commit) cada vez que cambia la versión de los datos
+datos_modificados = Signal()
+
+_AUSENTE = object()
+_contadores = {'aciertos': 0, 'fallos': 0}
+_contadores_lock = threading.Lock()
+
+
+def _fila_version():
+    from .models import VersionDatos  # models importa este módulo
+
+    fila, _ = VersionDatos.objects.get_or_create(pk=1, defaults={
+        # Basada en el reloj: mayor que cualquier versión usada antes de existir la fila
+        'version': time.time_ns() // 1000,
+    })
+    return fila
+
+
+def _cargar_version():
+    # Si la clave se perdió (reinicio, desalojo) se relee de la base de
+    # datos. add() no pisa una versión más nueva publicada entretanto
+    cache.add(CLAVE_VERSION, _fila_version().version, timeout=None)
+
+
+def version_datos():
+    """Versión actual de los datos de vehículos"""
+    version = cache.get(CLAVE_VERSION)
+    if version is None:
+        _cargar_version()
+        version = cache.get(CLAVE_VERSION)
+    return version
+
+
+def _incrementar_version():
+    from .models import VersionDatos
+
+    # El UPDATE bloquea la fila hasta el commit: los incrementos de todos los
+    # procesos se serializan y la caché nunca recibe una versión anterior
+    with transaction.atomic():
+        if not VersionDatos.objects.filter(pk=1).update(version=F('version') + 1):
+            _fila_version()
+            VersionDatos.objects.filter(pk=1).update(version=F('version') + 1)
+        version = VersionDatos.objects.values_list('version', flat=True).get(pk=1)
+        cache.set(CLAVE_VERSION, version, timeout=None)
+    datos_modificados.send(sender=None, version=version)
+
+
+def invalidar():
+    """Invalidar la caché tras una escritura, una vez confirmada la transacción"""
+    transaction.on_commit(_incrementar_version)
+
+
+def clave_cache(tipo, params):
+    """Clave derivada del tipo de consulta, los parámetros normalizados y la versión"""
+    normalizados = {k: v for k, v in params.items() if v not in (None, '')}
+    resumen = hashlib.sha1(
+        json.dumps(normalizados, sort_keys=True, default=str).encode()
+    ).hexdigest()
+    return f'vehiculos:{tipo}:v{version_datos()}:{resumen}'
+
+
+def obtener_o_calcular(tipo, params, calcular, ttl=None):
+    """Devolver el resultado cacheado para ``(tipo, params)`` o calcularlo y guardarlo"""
+    clave = clave_cache(tipo, params)
+    valor = cache.get(clave, _AUSENTE)
+    if valor is not _AUSENTE:
+        _contar('aciertos')
+        return valor
+
+    _contar('fallos')
+    valor = calcular()
+    cache.set(clave, valor, ttl if ttl is not None else getattr(settings, 'VEHICULOS_CACHE_TTL', 300))
+    return valor
+
+
+def _contar(nombre):
+    with _contadores_lock:
+        _contadores[nombre] += 1
+
+
+def estadisticas_cache():
+    """Aciertos, fallos y tasa de aciertos de la caché en este proceso"""
+    with _contadores_lock:
+        aciertos, fallos = _contadores['aciertos'], _contadores['fallos']
+    total = aciertos + fallos
+    return {
+        'aciertos': aciertos,
+        'fallos': fallos,
+        'tasa_aciertos': round(aciertos / total, 4) if total else 0,
+    }
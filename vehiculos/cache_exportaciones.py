@@ -0,0 +1,267 @@
+"""
+Caché en disco de las exportaciones, direccionada por contenido.
+
+Cada archivo se nombra ``v<versión>-<hash>.<extensión>``, donde el hash cubre
+el formato y los filtros normalizados: la misma exportación con los mismos
+datos siempre tiene el mismo nombre, así que una repetición se sirve con
+``FileResponse`` (sendfile en el servidor) sin consultas ni CPU.
+
+- Single-flight: dentro del proceso, las peticiones idénticas concurrentes
+  esperan a la generación en curso en lugar de repetirla. Entre procesos la
+  generación va a un temporal que se renombra al terminar, de modo que a lo
+  sumo se duplica el trabajo, nunca se sirve un archivo a medias.
+- Streaming (``flujo``, para el CSV): el líder envía cada bloque a su cliente
+  a la vez que lo copia al temporal, y las peticiones idénticas siguen ese
+  temporal a medida que crece, sin esperar a que termine ninguna descarga.
+- Desalojo LRU por ``mtime`` (se actualiza en cada acierto) cuando el total
+  supera ``VEHICULOS_EXPORT_CACHE_MAX_BYTES``; primero caen los archivos de
+  versiones anteriores, que ya no pueden volver a pedirse.
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+from django.conf import settings
+
+from . import cache_datos
+
+
+_generaciones = {}
+_generaciones_lock = threading.Lock()
+# Nombre -> _Flujo de los CSV que se están generando en streaming
+_flujos = {}
+TAMANO_BLOQUE = 64 * 1024
+
+
+def directorio():
+    directorio = Path(getattr(
+        settings, 'VEHICULOS_EXPORT_CACHE_DIR', settings.BASE_DIR / 'exportaciones' / 'cache'
+    ))
+    directorio.mkdir(parents=True, exist_ok=True)
+    return directorio
+
+
+def tamano_maximo():
+    return getattr(settings, 'VEHICULOS_EXPORT_CACHE_MAX_BYTES', 2 * 1024 ** 3)
+
+
+def nombre_archivo(formato, filtros, extension):
+    """Nombre en caché de una exportación para la versión actual de los datos"""
+    normalizados = {nombre: valor for nombre, valor in filtros.items() if valor not in (None, '')}
+    resumen = hashlib.sha256(
+        json.dumps({'formato': formato, 'filtros': normalizados}, sort_keys=True).encode()
+    ).hexdigest()[:32]
+    return f'v{cache_datos.version_datos()}-{resumen}.{extension}'
+
+
+def abrir(nombre):
+    """Abrir el archivo en caché (y marcarlo como usado); ``None`` si no existe"""
+    ruta = directorio() / nombre
+    try:
+        archivo = open(ruta, 'rb')
+    except FileNotFoundError:
+        return None
+    try:
+        os.utime(ruta)
+    except FileNotFoundError:
+        # Desalojado entre open y utime: el descriptor abierto sigue siendo válido
+        pass
+    return archivo
+
+
+@contextmanager
+def _generacion(nombre):
+    # Un lock por nombre mientras haya peticiones generándolo o esperándolo
+    with _generaciones_lock:
+        lock, esperando = _generaciones.get(nombre, (threading.Lock(), 0))
+        _generaciones[nombre] = (lock, esperando + 1)
+    try:
+        with lock:
+            yield
+    finally:
+        with _generaciones_lock:
+            lock, esperando = _generaciones[nombre]
+            if esperando == 1:
+                del _generaciones[nombre]
+            else:
+                _generaciones[nombre] = (lock, esperando - 1)
+
+
+def _temporal(nombre):
+    return directorio() / f'{nombre}.{os.getpid()}.{threading.get_ident()}.tmp'
+
+
+def obtener(nombre, escribir):
+    """
+    Archivo en caché abierto para lectura, generándolo si no existe.
+
+    ``escribir(archivo)`` escribe la exportación en un archivo binario; solo
+    una de las peticiones concurrentes con el mismo ``nombre`` lo ejecuta.
+    """
+    archivo = abrir(nombre)
+    if archivo is not None:
+        return archivo
+
+    with _generacion(nombre):
+        archivo = abrir(nombre)
+        if archivo is not None:
+            return archivo
+        temporal = _temporal(nombre)
+        try:
+            with open(temporal, 'wb') as destino:
+                escribir(destino)
+            os.replace(temporal, directorio() / nombre)
+        except BaseException:
+            temporal.unlink(missing_ok=True)
+            raise
+        # Se abre antes de desalojar para que el archivo nuevo no pueda desaparecer
+        archivo = open(directorio() / nombre, 'rb')
+
+    desalojar(conservar=nombre)
+    return archivo
+
+
+class _Flujo:
+    """Generación en streaming en curso: temporal, seguidores y estado final"""
+
+    def __init__(self, temporal):
+        self.temporal = temporal
+        self.condicion = threading.Condition()
+        self.seguidores = 0
+        self.terminado = False
+        self.fallido = False
+
+    def avisar(self, terminado=False, fallido=False):
+        with self.condicion:
+            self.terminado = self.terminado or terminado
+            self.fallido = self.fallido or fallido
+            self.condicion.notify_all()
+
+
+def flujo(nombre, bloques):
+    """
+    Enviar ``bloques`` (bytes) en streaming y guardarlos a la vez en la caché.
+
+    Para respuestas que deben empezar a enviarse de inmediato (CSV). Si otra
+    petición del proceso ya está generando el mismo archivo, ``bloques`` no
+    se consume: se envía el temporal de esa generación a medida que crece.
+    Si el cliente del líder se desconecta y hay seguidores, el líder termina
+    de escribir el archivo para ellos; si no los hay, el temporal se descarta.
+    """
+    with _generaciones_lock:
+        generacion = _flujos.get(nombre)
+        if generacion is not None:
+            generacion.seguidores += 1
+            # Abierto bajo el lock: el líder no puede renombrarlo ni borrarlo antes
+            archivo = open(generacion.temporal, 'rb')
+        else:
+            archivo = abrir(nombre)
+            if archivo is None:
+                generacion = _Flujo(_temporal(nombre))
+                destino = open(generacion.temporal, 'wb')
+                _flujos[nombre] = generacion
+    if archivo is not None:
+        with archivo:
+            if generacion is None:
+                yield from iter(lambda: archivo.read(TAMANO_BLOQUE), b'')
+            else:
+                yield from _seguir(generacion, archivo)
+        return
+    yield from _liderar(nombre, generacion, destino, bloques)
+
+
+def _seguir(generacion, archivo):
+    terminado = False
+    while True:
+        bloque = archivo.read(TAMANO_BLOQUE)
+        if bloque:
+            yield bloque
+        elif terminado:
+            break
+        else:
+            with generacion.condicion:
+                if not generacion.terminado:
+                    generacion.condicion.wait(timeout=1)
+                terminado = generacion.terminado
+    if generacion.fallido:
+        # Cortar la respuesta: el cliente no debe tomar un archivo a medias por completo
+        raise RuntimeError('La generación de la exportación falló')
+
+
+def _liderar(nombre, generacion, destino, bloques):
+    bloques = iter(bloques)
+    completo = False
+    try:
+        with destino:
+            try:
+                for bloque in bloques:
+                    destino.write(bloque)
+                    destino.flush()
+                    generacion.avisar()
+                    yield bloque
+            except GeneratorExit:
+                # Cliente desconectado: se termina el archivo solo si alguien lo espera
+                if generacion.seguidores:
+                    for bloque in bloques:
+                        destino.write(bloque)
+                        destino.flush()
+                        generacion.avisar()
+                else:
+                    raise
+        completo = True
+    finally:
+        with _generaciones_lock:
+            if completo:
+                os.replace(generacion.temporal, directorio() / nombre)
+            else:
+                generacion.temporal.unlink(missing_ok=True)
+            del _flujos[nombre]
+        generacion.avisar(terminado=True, fallido=not completo)
+    desalojar(conservar=nombre)
+
+
+def desalojar(conservar=None):
+    """
+    Borrar archivos hasta que la caché quepa en ``VEHICULOS_EXPORT_CACHE_MAX_BYTES``.
+
+    Primero los de versiones anteriores y luego los menos usados. Los
+    temporales huérfanos (procesos interrumpidos) se borran pasado
+    ``VEHICULOS_EXPORT_TIMEOUT``. Devuelve los bytes liberados.
+    """
+    version = f'v{cache_datos.version_datos()}-'
+    limite_temporales = time.time() - getattr(settings, 'VEHICULOS_EXPORT_TIMEOUT', 3600)
+    archivos = []
+    liberados = 0
+    for ruta in directorio().iterdir():
+        try:
+            estado = ruta.stat()
+            if ruta.suffix == '.tmp':
+                if estado.st_mtime < limite_temporales:
+                    ruta.unlink()
+                continue
+        except FileNotFoundError:
+            continue
+        if ruta.name != conservar:
+            archivos.append((ruta.name.startswith(version), estado.st_mtime, estado.st_size, ruta))
+
+    total = sum(tamano for _, _, tamano, _ in archivos)
+    if conservar:
+        try:
+            total += (directorio() / conservar).stat().st_size
+        except FileNotFoundError:
+            pass
+    for _, _, tamano, ruta in sorted(archivos):
+        if total <= tamano_maximo():
+            break
+        try:
+            # En POSIX las descargas en curso conservan su descriptor abierto
+            ruta.unlink()
+        except OSError:
+            continue
+        total -= tamano
+        liberados += tamano
+    return liberados
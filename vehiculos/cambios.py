@@ -0,0 +1,146 @@
+"""
+Feed incremental de cambios para Power BI y la sincronización nocturna.
+
+El cliente guarda un token opaco con la marca de agua ``(updated_at, id)``
+de la última fila recibida y el id de la última eliminación informada. Cada
+llamada devuelve solo lo ocurrido después de esa marca, recorriendo el
+índice ``(updated_at, id)`` sin escanear la tabla.
+
+Las marcas de eliminación se conservan ``VEHICULOS_CAMBIOS_RETENCION_DIAS``
+(comando ``podar_eliminados``); un token que se haya quedado detrás de las
+marcas borradas se rechaza como expirado y el cliente debe sincronizar de
+nuevo sin token.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Max, Min, Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .models import Vehiculo, VehiculoEliminado
+from .paginacion import codificar_token, decodificar_token
+
+
+CAMPOS_FEED = (
+    'id', 'codigo', 'placa', 'tipo_vehiculo', 'fecha_inicio', 'fecha_fin',
+    'numero_entregas', 'facturacion', 'observacion', 'cliente', 'validado',
+    'prioridad', 'estado', 'duracion_horas', 'facturacion_por_entrega', 'rendimiento',
+    'updated_at',
+)
+
+
+class TokenInvalido(ValueError):
+    pass
+
+
+class TokenExpirado(TokenInvalido):
+    pass
+
+
+def limite_feed(valor=None):
+    por_defecto = getattr(settings, 'VEHICULOS_CAMBIOS_LIMITE', 1000)
+    try:
+        limite = int(valor) if valor else por_defecto
+    except (TypeError, ValueError):
+        limite = por_defecto
+    return max(1, min(limite, getattr(settings, 'VEHICULOS_CAMBIOS_LIMITE_MAXIMO', 10000)))
+
+
+def leer_token(token):
+    """Decodificar ``(updated_at, id, ultimo_eliminado)`` de un token del feed"""
+    try:
+        actualizado, pk, eliminado = decodificar_token(token)
+        actualizado = parse_datetime(actualizado) if actualizado else None
+        return actualizado, int(pk), int(eliminado)
+    except (ValueError, TypeError) as e:
+        raise TokenInvalido(f'Token de cambios inválido: {e}')
+
+
+def retencion_eliminados():
+    return timedelta(days=getattr(settings, 'VEHICULOS_CAMBIOS_RETENCION_DIAS', 30))
+
+
+def podar_eliminados(antes=None):
+    """
+    Borrar las marcas de eliminación anteriores a ``antes`` (por defecto, la retención).
+
+    La más reciente de las marcas vencidas se conserva como límite: un token
+    cuyo último eliminado informado quede por debajo de ella ya no recibiría
+    las eliminaciones borradas y se rechaza con ``TokenExpirado``. Devuelve
+    el número de marcas borradas.
+    """
+    if antes is None:
+        antes = timezone.now() - retencion_eliminados()
+    limite = VehiculoEliminado.objects.filter(eliminado_at__lt=antes).aggregate(m=Max('id'))['m']
+    if limite is None:
+        return 0
+    borradas, _ = VehiculoEliminado.objects.filter(id__lt=limite).delete()
+    return borradas
+
+
+def serializar_fila(fila):
+    return {
+        **fila,
+        'fecha_inicio': fila['fecha_inicio'].isoformat(),
+        'fecha_fin': fila['fecha_fin'].isoformat(),
+        'facturacion': str(fila['facturacion']),
+        'duracion_horas': str(fila['duracion_horas']),
+        'facturacion_por_entrega': str(fila['facturacion_por_entrega']),
+        'rendimiento': str(fila['rendimiento']),
+        'updated_at': fila['updated_at'].isoformat(),
+    }
+
+
+def obtener_cambios(token=None, desde=None, limite=None, margen=None):
+    """
+    Devolver una página del feed de cambios.
+
+    Sin token se parte de ``desde`` (o del principio de la tabla) y solo se
+    informan las eliminaciones posteriores al inicio de la sincronización.
+    Las filas modificadas en los últimos ``VEHICULOS_CAMBIOS_MARGEN_SEGUNDOS``
+    se difieren a la siguiente llamada para no saltarse transacciones que
+    todavía no han confirmado con un ``updated_at`` anterior.
+    """
+    limite = limite_feed(limite)
+
+    if token:
+        actualizado, pk, ultimo_eliminado = leer_token(token)
+        primera = VehiculoEliminado.objects.aggregate(m=Min('id'))['m']
+        if primera is not None and ultimo_eliminado < primera - 1:
+            raise TokenExpirado('Token de cambios expirado: sincronice de nuevo sin token')
+    else:
+        actualizado, pk = desde, 0
+        ultimo_eliminado = VehiculoEliminado.objects.aggregate(m=Max('id'))['m'] or 0
+
+    if margen is None:
+        margen = getattr(settings, 'VEHICULOS_CAMBIOS_MARGEN_SEGUNDOS', 2)
+    corte = timezone.now() - timedelta(seconds=margen)
+
+    vehiculos = Vehiculo.objects.filter(updated_at__lt=corte)
+    if actualizado is not None:
+        vehiculos = vehiculos.filter(
+            Q(updated_at__gt=actualizado) | Q(updated_at=actualizado, id__gt=pk)
+        )
+    filas = list(vehiculos.order_by('updated_at', 'id').values(*CAMPOS_FEED)[:limite + 1])
+
+    eliminados = list(
+        VehiculoEliminado.objects.filter(id__gt=ultimo_eliminado)
+        .order_by('id').values_list('id', 'vehiculo_id')[:limite + 1]
+    )
+
+    hay_mas = len(filas) > limite or len(eliminados) > limite
+    filas = filas[:limite]
+    eliminados = eliminados[:limite]
+
+    if filas:
+        actualizado, pk = filas[-1]['updated_at'], filas[-1]['id']
+    if eliminados:
+        ultimo_eliminado = eliminados[-1][0]
+
+    return {
+        'vehiculos': [serializar_fila(fila) for fila in filas],
+        'eliminados': [vehiculo_id for _, vehiculo_id in eliminados],
+        'hay_mas': hay_mas,
+        'token': codificar_token([actualizado, pk, ultimo_eliminado]),
+    }
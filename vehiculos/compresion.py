@@ -0,0 +1,105 @@
+"""
+Compresión de respuestas negociada con ``Accept-Encoding``.
+
+Brotli (``br``) si el cliente lo acepta y el paquete ``brotli`` está
+instalado; si no, gzip con el ``GZipMiddleware`` de Django. Solo se comprimen
+los tipos de texto (JSON, CSV, HTML...): las exportaciones XLSX, Parquet o
+``.csv.gz`` ya van comprimidas y los eventos SSE deben llegar sin buffer.
+"""
+import re
+import zlib
+
+from django.conf import settings
+from django.middleware.gzip import GZipMiddleware
+from django.utils.cache import patch_vary_headers
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+TIPOS_COMPRIMIBLES = {
+    'application/json', 'text/csv', 'text/html', 'text/plain', 'text/css',
+    'text/javascript', 'application/javascript',
+}
+ACEPTA_BROTLI = re.compile(r'\bbr\b')
+ACEPTA_GZIP = re.compile(r'\bgzip\b')
+# Por debajo de este tamaño la compresión no compensa (mismo umbral que GZipMiddleware)
+TAMANO_MINIMO = 200
+
+
+def calidad_brotli():
+    # 11 (el máximo) es demasiado lento para respuestas dinámicas
+    return getattr(settings, 'VEHICULOS_BROTLI_CALIDAD', 5)
+
+
+def _brotli_flujo(bloques, calidad):
+    compresor = brotli.Compressor(quality=calidad)
+    for bloque in bloques:
+        datos = compresor.process(bloque)
+        if datos:
+            yield datos
+    yield compresor.finish()
+
+
+def _gzip_flujo(bloques):
+    compresor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    for bloque in bloques:
+        datos = compresor.compress(bloque)
+        if datos:
+            yield datos
+    yield compresor.flush()
+
+
+def codificacion_aceptada(request):
+    """``'br'``, ``'gzip'`` o None según ``Accept-Encoding`` y los compresores disponibles"""
+    aceptadas = request.META.get('HTTP_ACCEPT_ENCODING', '')
+    if brotli is not None and ACEPTA_BROTLI.search(aceptadas):
+        return 'br'
+    if ACEPTA_GZIP.search(aceptadas):
+        return 'gzip'
+    return None
+
+
+def comprimir_flujo(bloques, codificacion):
+    """Comprimir al vuelo bloques de bytes con la ``codificacion`` de ``codificacion_aceptada``"""
+    if codificacion == 'br':
+        return _brotli_flujo(bloques, calidad_brotli())
+    if codificacion == 'gzip':
+        return _gzip_flujo(bloques)
+    return bloques
+
+
+class CompresionMiddleware(GZipMiddleware):
+    def process_response(self, request, response):
+        tipo = response.get('Content-Type', '').split(';')[0].strip().lower()
+        if tipo not in TIPOS_COMPRIMIBLES:
+            return response
+        if codificacion_aceptada(request) != 'br' or (response.streaming and response.is_async):
+            return super().process_response(request, response)
+        return self._brotli(response)
+
+    def _brotli(self, response):
+        if not response.streaming and len(response.content) < TAMANO_MINIMO:
+            return response
+        if response.has_header('Content-Encoding'):
+            return response
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+        if response.streaming:
+            response.streaming_content = comprimir_flujo(response.streaming_content, 'br')
+            del response.headers['Content-Length']
+        else:
+            comprimido = brotli.compress(response.content, quality=calidad_brotli())
+            if len(comprimido) >= len(response.content):
+                return response
+            response.content = comprimido
+            response.headers['Content-Length'] = str(len(comprimido))
+
+        # El cuerpo ya no es idéntico byte a byte: el ETag pasa a ser débil
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response.headers['ETag'] = 'W/' + etag
+        response.headers['Content-Encoding'] = 'br'
+        return response
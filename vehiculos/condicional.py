@@ -0,0 +1,46 @@
+"""
+GET condicional (ETag) a partir de la versión de los datos.
+
+Las respuestas de lectura dependen solo de la URL y de los datos, así que
+su ETag se deriva de ``cache_datos.version_datos()`` sin consultar la base
+de datos: si el cliente envía el ETag vigente recibe ``304 Not Modified``
+y la vista no llega a ejecutarse. La codificación negociada (br/gzip) forma
+parte del ETag: cada representación comprimida tiene su propio validador.
+
+No se envía ``Last-Modified``: con resolución de un segundo, dos escrituras
+en el mismo segundo darían la misma fecha y ``If-Modified-Since`` devolvería
+un 304 con datos viejos. La versión del ETag cambia con cada escritura.
+"""
+import hashlib
+from functools import wraps
+
+from django.utils.cache import patch_cache_control
+from django.views.decorators.http import condition
+
+from . import cache_datos
+from .compresion import codificacion_aceptada
+
+
+def etag_datos(request, *args, **kwargs):
+    """ETag de la URL (con sus parámetros) y la codificación aceptada para la versión actual de los datos"""
+    clave = f'{cache_datos.version_datos()}:{codificacion_aceptada(request)}:{request.get_full_path()}'
+    return hashlib.sha1(clave.encode()).hexdigest()
+
+
+def condicional(vista):
+    """
+    Decorador de vistas GET con ETag de la versión de datos.
+
+    ``Cache-Control: private, no-cache`` obliga al navegador a revalidar en
+    cada petición, de modo que los datos nuevos se ven de inmediato y los
+    repetidos cuestan un 304.
+    """
+    vista_condicional = condition(etag_func=etag_datos)(vista)
+
+    @wraps(vista)
+    def envoltura(request, *args, **kwargs):
+        response = vista_condicional(request, *args, **kwargs)
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
+
+    return envoltura
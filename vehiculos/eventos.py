@@ -0,0 +1,201 @@
+"""
+Feed de cambios en vivo (Server-Sent Events) para el tablero.
+
+Un único ``Difusor`` por proceso detecta los cambios y los reparte a todas
+las conexiones abiertas: un hilo detector despierta cuando cambia la
+versión de los datos (inmediatamente para escrituras de este proceso, por
+sondeo de la versión en caché para las de otros procesos), lee una sola vez
+las filas modificadas con el feed incremental y publica el resultado. El
+costo es una detección por escritura, no una consulta por cliente.
+
+Cada evento se numera con la versión de datos (``VersionDatos``) en que se
+detectó, compartida por todos los procesos: un cliente puede reconectarse o
+seguir el long-poll contra cualquier worker con el mismo cursor.
+
+El último evento ``cambios`` de cada detección lleva además los KPIs del
+tablero sin filtros (``stats``); solo los tableros con filtros propios
+vuelven a pedir ``api/real-time-stats/``.
+"""
+import asyncio
+import threading
+import time
+from collections import deque
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.utils import timezone
+
+from . import cache_datos
+from .cambios import obtener_cambios
+from .filtros import filtrar_vehiculos, obtener_filtros
+
+
+class Difusor:
+    """Reparte eventos numerados por versión de datos a suscriptores asíncronos y de long-poll"""
+
+    def __init__(self, capacidad=500):
+        self._condicion = threading.Condition()
+        self._eventos = deque(maxlen=capacidad)
+        # Última versión procesada y versión a partir de la cual la memoria
+        # tiene todos los eventos (``None`` mientras no se conozcan)
+        self._version = None
+        self._completo = None
+        self._suscriptores = set()
+        self._despertar = threading.Event()
+        self._detector = None
+
+    @property
+    def version(self):
+        return self._version
+
+    def _avanzar(self, version):
+        with self._condicion:
+            if self._completo is None:
+                self._completo = version
+            if self._version is None or version > self._version:
+                self._version = version
+                self._condicion.notify_all()
+
+    def publicar(self, tipo, datos, version):
+        """Publicar un evento de la versión de datos ``version``; seguro desde cualquier hilo"""
+        evento = (version, tipo, datos)
+        with self._condicion:
+            if len(self._eventos) == self._eventos.maxlen:
+                self._completo = max(self._completo or 0, self._eventos[0][0])
+            self._eventos.append(evento)
+            self._version = max(self._version or 0, version)
+            suscriptores = list(self._suscriptores)
+            self._condicion.notify_all()
+        for suscriptor in suscriptores:
+            loop, cola = suscriptor
+            try:
+                loop.call_soon_threadsafe(cola.put_nowait, evento)
+            except RuntimeError:
+                # Bucle ya cerrado (conexión terminada sin pasar por ``finally``)
+                with self._condicion:
+                    self._suscriptores.discard(suscriptor)
+
+    def _pendientes(self, desde):
+        """Eventos posteriores a ``desde``; si ya no están en memoria se pide recargar"""
+        if desde is None or self._version is None or desde >= self._version:
+            return []
+        if self._completo is not None and desde < self._completo:
+            return [(self._version, 'recargar', {})]
+        return [evento for evento in self._eventos if evento[0] > desde]
+
+    async def escuchar(self, desde=None, latido=15):
+        """
+        Generador asíncrono de eventos para una conexión SSE.
+
+        Produce ``None`` cada ``latido`` segundos sin eventos para que la
+        vista envíe un comentario de keep-alive.
+        """
+        self.iniciar_detector()
+        loop = asyncio.get_running_loop()
+        cola = asyncio.Queue()
+        suscriptor = (loop, cola)
+        with self._condicion:
+            self._suscriptores.add(suscriptor)
+            pendientes = self._pendientes(desde)
+        try:
+            for evento in pendientes:
+                yield evento
+            while True:
+                try:
+                    yield await asyncio.wait_for(cola.get(), timeout=latido)
+                except asyncio.TimeoutError:
+                    yield None
+        finally:
+            with self._condicion:
+                self._suscriptores.discard(suscriptor)
+
+    def esperar(self, desde, timeout=0):
+        """
+        Long-poll síncrono: eventos posteriores a ``desde`` y el cursor siguiente.
+
+        Con ``desde`` mayor que la última versión de este proceso (el cursor
+        viene de otro worker que detectó antes) se espera a alcanzarla y, si
+        vence el plazo, se devuelve el mismo cursor.
+        """
+        self.iniciar_detector()
+        if desde is None:
+            return [], self._version if self._version is not None else cache_datos.version_datos()
+        with self._condicion:
+            self._condicion.wait_for(
+                lambda: self._version is not None and self._version > desde, timeout=timeout
+            )
+            return self._pendientes(desde), max(desde, self._version or desde)
+
+    def notificar(self, **kwargs):
+        """Despertar al detector (conectado a ``cache_datos.datos_modificados``)"""
+        self._despertar.set()
+
+    def iniciar_detector(self):
+        if not getattr(settings, 'VEHICULOS_EVENTOS_DETECTOR', True):
+            return
+        with self._condicion:
+            if self._detector is None:
+                self._detector = threading.Thread(
+                    target=self._detectar, name='detector-cambios', daemon=True
+                )
+                self._detector.start()
+
+    def _detectar(self):
+        sondeo = getattr(settings, 'VEHICULOS_EVENTOS_SONDEO_SEGUNDOS', 5)
+        version = token = None
+        fallos = 0
+        while True:
+            try:
+                close_old_connections()
+                if token is None:
+                    # Punto de partida: solo interesan los cambios posteriores al arranque
+                    version = cache_datos.version_datos()
+                    token = obtener_cambios(desde=timezone.now(), limite=1, margen=0)['token']
+                    self._avanzar(version)
+                else:
+                    actual = cache_datos.version_datos()
+                    if actual != version:
+                        token = self._publicar_cambios(token, actual)
+                        version = actual
+                fallos = 0
+            except Exception:
+                # El detector no debe morir por un error puntual de la base de datos:
+                # se reintenta con una espera creciente (hasta un minuto)
+                fallos += 1
+            finally:
+                close_old_connections()
+            if fallos:
+                time.sleep(min(sondeo * 2 ** (fallos - 1), 60))
+                continue
+            self._despertar.wait(timeout=sondeo)
+            self._despertar.clear()
+
+    def _publicar_cambios(self, token, version):
+        """
+        Publicar como eventos ``cambios`` de ``version`` lo ocurrido desde ``token``.
+
+        El último lleva los KPIs del tablero sin filtros, calculados una vez
+        por detección. Devuelve el token nuevo.
+        """
+        from .views import obtener_stats  # views importa este módulo
+
+        hay_mas = True
+        pendiente = None
+        while hay_mas:
+            cambios = obtener_cambios(token=token, margen=0)
+            token, hay_mas = cambios['token'], cambios['hay_mas']
+            if cambios['vehiculos'] or cambios['eliminados']:
+                if pendiente is not None:
+                    self.publicar('cambios', pendiente, version)
+                pendiente = {'vehiculos': cambios['vehiculos'], 'eliminados': cambios['eliminados']}
+        if pendiente is not None:
+            filtros = obtener_filtros({})
+            pendiente['stats'] = obtener_stats(filtros, filtrar_vehiculos(filtros))
+            self.publicar('cambios', pendiente, version)
+        else:
+            self._avanzar(version)
+        return token
+
+
+difusor = Difusor()
+cache_datos.datos_modificados.connect(difusor.notificar, dispatch_uid='difusor_eventos')
@@ -0,0 +1,245 @@
+"""
+Motores de exportación de vehículos.
+
+Las filas se leen con ``values_list`` en lotes (``iterator(chunk_size=...)``)
+en lugar de instanciar cada ``Vehiculo``, de modo que la memoria usada no
+depende del número de filas exportadas.
+"""
+import csv
+import io
+import zlib
+from itertools import islice
+
+from django.conf import settings
+from django.utils import timezone
+from openpyxl import Workbook
+
+
+COLUMNAS_EXPORTACION = [
+    'Código', 'Placa', 'Tipo Vehículo', 'Fecha Inicio', 'Fecha Fin',
+    'Número Entregas', 'Facturación', 'Observación', 'Cliente', 'Validado',
+    'Duración (h)', 'Facturación por Entrega', 'Rendimiento'
+]
+CAMPOS_EXPORTACION = (
+    'codigo', 'placa', 'tipo_vehiculo', 'fecha_inicio', 'fecha_fin',
+    'numero_entregas', 'facturacion', 'observacion', 'cliente', 'validado',
+    'duracion_horas', 'facturacion_por_entrega', 'rendimiento'
+)
+# Filas de datos por hoja de Excel (1.048.576 menos el encabezado)
+FILAS_POR_HOJA = 1048575
+
+
+def tamano_lote():
+    return getattr(settings, 'VEHICULOS_EXPORT_LOTE', 2000)
+
+
+def iterar_lotes(queryset, campos=CAMPOS_EXPORTACION, tamano=None, progreso=None):
+    """
+    Recorrer el queryset como listas de tuplas de ``tamano`` filas.
+
+    Si se indica, ``progreso(n)`` se llama con el número de filas de cada
+    lote una vez procesado.
+    """
+    tamano = tamano or tamano_lote()
+    filas = queryset.values_list(*campos).iterator(chunk_size=tamano)
+    while True:
+        lote = list(islice(filas, tamano))
+        if not lote:
+            return
+        yield lote
+        if progreso:
+            progreso(len(lote))
+
+
+def _fecha(valor):
+    # str() de un datetime es 'AAAA-MM-DD HH:MM:SS[.ffffff][+HH:MM]'; mucho
+    # más barato que strftime('%Y-%m-%d %H:%M:%S') para el mismo resultado
+    return str(valor)[:19]
+
+
+def _fila_csv(fila):
+    (codigo, placa, tipo, inicio, fin, entregas, facturacion, observacion, cliente, validado,
+     duracion, por_entrega, rendimiento) = fila
+    return (
+        codigo, placa, tipo, _fecha(inicio), _fecha(fin), entregas,
+        str(facturacion), observacion or '', cliente, 'Sí' if validado else 'No',
+        str(duracion), str(por_entrega), str(rendimiento)
+    )
+
+
+def bloques_csv(queryset, tamano=None, progreso=None):
+    """Generar el CSV como bloques de texto, uno por lote de filas"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(COLUMNAS_EXPORTACION)
+
+    for lote in iterar_lotes(queryset, tamano=tamano, progreso=progreso):
+        writer.writerows(map(_fila_csv, lote))
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def comprimir_gzip(bloques, nivel=6):
+    """Comprimir al vuelo un iterable de bloques de texto en formato gzip"""
+    compresor = zlib.compressobj(nivel, zlib.DEFLATED, 31)
+    for bloque in bloques:
+        datos = compresor.compress(bloque.encode('utf-8'))
+        if datos:
+            yield datos
+    yield compresor.flush()
+
+
+def escribir_csv(queryset, destino, tamano=None, progreso=None):
+    """Escribir el CSV (UTF-8) en el archivo binario ``destino``"""
+    for bloque in bloques_csv(queryset, tamano=tamano, progreso=progreso):
+        destino.write(bloque.encode('utf-8'))
+
+
+def _fila_xlsx(fila):
+    (codigo, placa, tipo, inicio, fin, entregas, facturacion, observacion, cliente, validado,
+     duracion, por_entrega, rendimiento) = fila
+    # Excel no admite zonas horarias: se escribe la hora UTC, igual que en el CSV
+    return (
+        codigo, placa, tipo,
+        inicio.replace(tzinfo=None, microsecond=0), fin.replace(tzinfo=None, microsecond=0),
+        entregas, facturacion, observacion or '', cliente, 'Sí' if validado else 'No',
+        duracion, por_entrega, rendimiento
+    )
+
+
+def agregar_hojas(libro, encabezado, filas, filas_por_hoja=FILAS_POR_HOJA):
+    """
+    Añadir ``filas`` a un libro write-only en hojas 'Vehículos', 'Vehículos 2'...
+
+    Más de un millón de filas no caben en una hoja: cada hoja lleva el
+    encabezado y hasta ``filas_por_hoja`` filas. Sin filas queda una hoja
+    solo con el encabezado.
+    """
+    hoja = None
+    filas_hoja = filas_por_hoja
+    for fila in filas:
+        if filas_hoja == filas_por_hoja:
+            hoja = libro.create_sheet('Vehículos' if hoja is None else f'Vehículos {len(libro.worksheets) + 1}')
+            hoja.append(encabezado)
+            filas_hoja = 0
+        hoja.append(fila)
+        filas_hoja += 1
+    if hoja is None:
+        libro.create_sheet('Vehículos').append(encabezado)
+
+
+def escribir_xlsx(queryset, destino, tamano=None, progreso=None, filas_por_hoja=FILAS_POR_HOJA):
+    """
+    Escribir el XLSX en ``destino`` con openpyxl en modo write-only.
+
+    Las celdas se emiten fila a fila sin construir la hoja en memoria; las
+    fechas quedan como fechas de Excel y la facturación como número. Pasado
+    el límite de filas de Excel se continúa en otra hoja (``agregar_hojas``).
+    """
+    libro = Workbook(write_only=True)
+    filas = (
+        _fila_xlsx(fila)
+        for lote in iterar_lotes(queryset, tamano=tamano, progreso=progreso)
+        for fila in lote
+    )
+    agregar_hojas(libro, COLUMNAS_EXPORTACION, filas, filas_por_hoja)
+    libro.save(destino)
+
+
+def filas_por_grupo():
+    return getattr(settings, 'VEHICULOS_PARQUET_FILAS_POR_GRUPO', 65536)
+
+
+def esquema_arrow():
+    """Esquema columnar tipado de la exportación para Power BI"""
+    import pyarrow as pa
+
+    categoria = pa.dictionary(pa.int32(), pa.string())
+    return pa.schema([
+        ('Código', pa.string()),
+        ('Placa', pa.string()),
+        ('Tipo Vehículo', categoria),
+        ('Fecha Inicio', pa.timestamp('us', tz='UTC')),
+        ('Fecha Fin', pa.timestamp('us', tz='UTC')),
+        ('Número Entregas', pa.int32()),
+        ('Facturación', pa.decimal128(10, 2)),
+        ('Observación', pa.string()),
+        ('Cliente', categoria),
+        ('Validado', pa.bool_()),
+        ('Duración (h)', pa.decimal128(8, 2)),
+        ('Facturación por Entrega', pa.decimal128(12, 2)),
+        ('Rendimiento', pa.decimal128(10, 2)),
+        ('Día', pa.date32()),
+        ('Mes', categoria),
+        ('Año', pa.int16()),
+    ])
+
+
+def lotes_arrow(queryset, tamano=None, progreso=None):
+    """
+    Convertir el queryset en ``RecordBatch`` de Arrow, un lote por grupo de filas.
+
+    ``Día``/``Mes``/``Año`` se derivan de forma vectorizada a partir de
+    ``fecha_inicio`` en la zona horaria local, igual que el resumen diario.
+    """
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    esquema = esquema_arrow()
+    zona_local = pa.timestamp('us', tz=timezone.get_current_timezone_name())
+
+    for lote in iterar_lotes(queryset, tamano=tamano or filas_por_grupo(), progreso=progreso):
+        (codigos, placas, tipos, inicios, fines, entregas, facturaciones,
+         observaciones, clientes, validados, duraciones, por_entrega, rendimientos) = zip(*lote)
+
+        inicio = pa.array(inicios, type=esquema.field('Fecha Inicio').type)
+        inicio_local = pc.local_timestamp(inicio.cast(zona_local))
+
+        yield pa.record_batch([
+            pa.array(codigos, type=pa.string()),
+            pa.array(placas, type=pa.string()),
+            pa.array(tipos, type=pa.string()).dictionary_encode(),
+            inicio,
+            pa.array(fines, type=esquema.field('Fecha Fin').type),
+            pa.array(entregas, type=pa.int32()),
+            pa.array(facturaciones, type=esquema.field('Facturación').type),
+            pa.array(observaciones, type=pa.string()),
+            pa.array(clientes, type=pa.string()).dictionary_encode(),
+            pa.array(validados, type=pa.bool_()),
+            pa.array(duraciones, type=esquema.field('Duración (h)').type),
+            pa.array(por_entrega, type=esquema.field('Facturación por Entrega').type),
+            pa.array(rendimientos, type=esquema.field('Rendimiento').type),
+            inicio_local.cast(pa.date32()),
+            pc.strftime(inicio_local, format='%Y-%m').dictionary_encode(),
+            pc.year(inicio_local).cast(pa.int16()),
+        ], schema=esquema)
+
+
+def escribir_parquet(queryset, destino, tamano=None, progreso=None):
+    """Escribir un Parquet con un row group por lote leído de la base de datos"""
+    import pyarrow.parquet as pq
+
+    with pq.ParquetWriter(destino, esquema_arrow(), compression='zstd') as writer:
+        for lote in lotes_arrow(queryset, tamano=tamano, progreso=progreso):
+            writer.write_batch(lote)
+
+
+def escribir_arrow(queryset, destino, tamano=None, progreso=None):
+    """Escribir un stream IPC de Arrow (los diccionarios pueden variar por lote)"""
+    import pyarrow as pa
+
+    with pa.ipc.new_stream(destino, esquema_arrow()) as writer:
+        for lote in lotes_arrow(queryset, tamano=tamano, progreso=progreso):
+            writer.write_batch(lote)
+
+
+FORMATOS_ARCHIVO = {
+    'csv': (escribir_csv, 'csv', 'text/csv'),
+    'excel': (escribir_xlsx, 'xlsx', 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'),
+    'parquet': (escribir_parquet, 'parquet', 'application/vnd.apache.parquet'),
+    'arrow': (escribir_arrow, 'arrows', 'application/vnd.apache.arrow.stream'),
+}
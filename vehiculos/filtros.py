@@ -0,0 +1,109 @@
+"""
+Filtros compartidos por la vista principal, las exportaciones y las APIs
+
+Los filtros por día se traducen a rangos semiabiertos ``[inicio, fin)`` de
+datetimes con zona horaria en lugar de ``fecha_inicio__date``: el lookup
+``__date`` envuelve la columna en una conversión por fila y SQLite no puede
+usar el índice, mientras que una comparación directa es un range scan.
+"""
+from datetime import datetime, time, timedelta
+from decimal import Decimal, InvalidOperation
+
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from .busqueda import filtrar_texto
+from .models import Vehiculo
+from .placas import filtrar_por_placa
+
+
+PARAMETROS_FILTRO = (
+    'placa', 'q', 'fecha_inicio', 'fecha_fin', 'validado', 'rendimiento_min', 'rendimiento_max',
+)
+
+
+def obtener_filtros(params):
+    """Extraer los filtros conocidos de un QueryDict (o dict)"""
+    return {nombre: params.get(nombre, '') or '' for nombre in PARAMETROS_FILTRO}
+
+
+def rango_fechas(filtros):
+    """Fechas (``date``) desde/hasta de los filtros; ``None`` si no aplican"""
+    fecha_inicio = parse_date(filtros['fecha_inicio']) if filtros.get('fecha_inicio') else None
+    fecha_fin = parse_date(filtros['fecha_fin']) if filtros.get('fecha_fin') else None
+    return fecha_inicio, fecha_fin
+
+
+def inicio_dia(fecha):
+    """Medianoche local de ``fecha`` como datetime con zona horaria"""
+    return timezone.make_aware(datetime.combine(fecha, time.min))
+
+
+def q_rango_dias(desde=None, hasta=None, campo='fecha_inicio'):
+    """``Q`` para los días locales ``desde``..``hasta`` (ambos incluidos) como rango semiabierto"""
+    condiciones = {}
+    if desde:
+        condiciones[f'{campo}__gte'] = inicio_dia(desde)
+    if hasta:
+        condiciones[f'{campo}__lt'] = inicio_dia(hasta + timedelta(days=1))
+    return Q(**condiciones)
+
+
+def q_dias(dias, campo='fecha_inicio'):
+    """``Q`` para un conjunto de días locales, agrupando los consecutivos en un solo rango"""
+    condicion = Q()
+    rango = None
+    for dia in sorted(set(dias)):
+        if rango and dia == rango[1] + timedelta(days=1):
+            rango[1] = dia
+            continue
+        if rango:
+            condicion |= q_rango_dias(*rango, campo=campo)
+        rango = [dia, dia]
+    if rango:
+        condicion |= q_rango_dias(*rango, campo=campo)
+    return condicion
+
+
+def valor_validado(filtros):
+    """Filtro de validación como booleano; ``None`` si no aplica"""
+    return {'true': True, 'false': False}.get(filtros.get('validado'))
+
+
+def valor_decimal(valor):
+    """Número del filtro como ``Decimal``; ``None`` si está vacío o no es válido"""
+    try:
+        numero = Decimal(valor)
+    except (TypeError, InvalidOperation):
+        return None
+    return numero if numero.is_finite() else None
+
+
+def filtrar_vehiculos(filtros, queryset=None):
+    """Aplicar los filtros de búsqueda sobre un queryset de vehículos"""
+    if queryset is None:
+        queryset = Vehiculo.objects.all()
+    
+    if filtros.get('placa'):
+        queryset = filtrar_por_placa(queryset, filtros['placa'])
+    
+    if filtros.get('q'):
+        queryset = filtrar_texto(queryset, filtros['q'])
+    
+    fecha_inicio, fecha_fin = rango_fechas(filtros)
+    if fecha_inicio or fecha_fin:
+        queryset = queryset.filter(q_rango_dias(fecha_inicio, fecha_fin))
+    
+    validado = valor_validado(filtros)
+    if validado is not None:
+        queryset = queryset.filter(validado=validado)
+    
+    rendimiento_min = valor_decimal(filtros.get('rendimiento_min'))
+    if rendimiento_min is not None:
+        queryset = queryset.filter(rendimiento__gte=rendimiento_min)
+    rendimiento_max = valor_decimal(filtros.get('rendimiento_max'))
+    if rendimiento_max is not None:
+        queryset = queryset.filter(rendimiento__lte=rendimiento_max)
+    
+    return queryset
@@ -0,0 +1,348 @@
+"""
+Generador determinista de datos sintéticos para pruebas de carga.
+
+Las columnas de cada lote se generan vectorizadas con NumPy a partir de
+``(semilla, número de lote)``, de modo que el resultado es el mismo con
+cualquier número de procesos. Cada lote se inserta con un ``executemany``
+en su propia transacción. Sobre una tabla vacía los índices secundarios se
+crean al final, y el resumen diario se acumula con pandas a partir de las
+mismas columnas en lugar de reagregar la tabla.
+
+Las distribuciones son las del antiguo ``generar_datos_mejorados.py``:
+entregas y facturación dependen del tipo de vehículo, y prioridad, estado
+y validación siguen los mismos pesos. Cada placa de la flota tiene un tipo
+fijo y aparece en muchos viajes, como en producción. Los indicadores
+derivados (duración, facturación por entrega, rendimiento) se calculan de
+esas columnas como en ``vehiculos.indicadores``.
+"""
+import math
+import string
+from contextlib import contextmanager, nullcontext
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+from multiprocessing import Pool
+
+import numpy as np
+import pandas as pd
+from django.db import connection, connections, transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from . import cache_datos
+from .busqueda import fts_suspendido
+from .indicadores import indicadores_vectorizados
+from .models import PlacaTrigrama, ResumenDiario, Vehiculo
+from .placas import normalizar_placa, registrar_placas
+from .resumen import aplicar_deltas
+
+
+TIPOS = ('Turbo', 'Sencillo', 'Eléctrico')
+# Por tipo (mismo orden que TIPOS): (mínimo, máximo)
+ENTREGAS = np.array([(15, 50), (10, 30), (8, 25)])
+FACTURACION = np.array([(50000, 200000), (30000, 100000), (25000, 80000)])
+
+PRIORIDADES = np.array([1, 2, 3])
+PESOS_PRIORIDAD = [0.4, 0.4, 0.2]
+ESTADOS = ('activo', 'mantenimiento', 'inactivo')
+PESOS_ESTADO = [0.7, 0.2, 0.1]
+PROPORCION_VALIDADOS = 0.7
+
+CLIENTES = (
+    'Transportes Rápidos S.A.', 'Logística Express Ltda.', 'Mensajería Veloz C.A.',
+    'Distribuciones Central S.A.S.', 'Carga Segura Ltda.', 'Envíos Express C.A.',
+    'Transporte Nacional S.A.', 'Logística Global Ltda.', 'Mensajería Internacional C.A.',
+    'Distribuciones Rápidas S.A.S.',
+)
+OBSERVACIONES = (
+    'Entrega realizada exitosamente', 'Cliente solicitó entrega urgente',
+    'Vehículo en buen estado', 'Retraso por tráfico', 'Cliente muy satisfecho',
+    'Entrega en punto alternativo', 'Sin novedades durante el viaje',
+    'Cliente solicitó factura electrónica', 'Vehículo requiere mantenimiento',
+    'Entrega confirmada por teléfono', None,
+)
+
+_LETRAS = np.array(list(string.ascii_uppercase))
+_DIGITOS = np.array(list(string.digits))
+
+
+def generar_flota(semilla, cantidad):
+    """Placas (formato colombiano ``ABC123``) y tipo fijo de cada vehículo de la flota"""
+    rng = np.random.default_rng([semilla, 0xF107A])
+    letras = _LETRAS[rng.integers(0, 26, (cantidad, 3))]
+    digitos = _DIGITOS[rng.integers(0, 10, (cantidad, 3))]
+    placas = [''.join(fila) for fila in np.concatenate([letras, digitos], axis=1)]
+    return placas, rng.integers(0, len(TIPOS), cantidad)
+
+
+def referencia_por_defecto():
+    """Medianoche local de mañana: los viajes generados quedan en días ya iniciados"""
+    manana = timezone.localdate() + timedelta(days=1)
+    return timezone.make_aware(datetime.combine(manana, time.min))
+
+
+def _uniforme(rng, rangos, indices, decimales):
+    bajos, altos = rangos[indices, 0], rangos[indices, 1]
+    return np.round(bajos + (altos - bajos) * rng.random(len(indices)), decimales)
+
+
+def columnas_lote(semilla, numero, tamano, flota, dias, referencia):
+    """Columnas del lote ``numero`` como arrays de NumPy (una entrada por campo)"""
+    placas, tipos_flota = flota
+    rng = np.random.default_rng([semilla, numero])
+
+    vehiculo = rng.integers(0, len(placas), tamano)
+    tipo = tipos_flota[vehiculo]
+
+    # Inicio en horario laboral (06:00-18:59 local) dentro de los últimos ``dias``
+    dia = rng.integers(1, dias + 1, tamano)
+    segundo = rng.integers(6 * 3600, 19 * 3600, tamano)
+    inicio = referencia.timestamp() - dia * 86400 + segundo
+    duracion = rng.integers(4 * 3600, 24 * 3600 + 1, tamano)
+
+    return {
+        'placa': vehiculo,
+        'tipo': tipo,
+        'inicio': inicio.astype('int64'),
+        'fin': (inicio + duracion).astype('int64'),
+        'entregas': rng.integers(ENTREGAS[tipo, 0], ENTREGAS[tipo, 1] + 1),
+        'facturacion': _uniforme(rng, FACTURACION, tipo, 2),
+        'prioridad': rng.choice(PRIORIDADES, tamano, p=PESOS_PRIORIDAD),
+        'estado': rng.choice(len(ESTADOS), tamano, p=PESOS_ESTADO),
+        'validado': rng.random(tamano) < PROPORCION_VALIDADOS,
+        'cliente': rng.integers(0, len(CLIENTES), tamano),
+        'observacion': rng.integers(0, len(OBSERVACIONES), tamano),
+    }
+
+
+def _fechas(segundos):
+    # Mismo texto que guarda Django en SQLite ('AAAA-MM-DD HH:MM:SS', UTC), vectorizado
+    return np.char.replace(np.datetime_as_string(segundos.astype('datetime64[s]')), 'T', ' ').tolist()
+
+
+def _decimales(valores):
+    return np.char.mod('%.2f', valores).tolist()
+
+
+def indicadores_lote(columnas):
+    """Indicadores derivados del lote (arrays), como en ``vehiculos.indicadores``"""
+    horas = (columnas['fin'] - columnas['inicio']) / 3600
+    return indicadores_vectorizados(horas, columnas['entregas'], columnas['facturacion'])
+
+
+def filas_lote(columnas, indicadores, flota, primero, ahora):
+    """
+    Filas del lote listas para el INSERT, en el orden de ``campos_insercion()``.
+
+    Los valores se convierten a su forma de base de datos por columna (fechas
+    en texto UTC, decimales en texto) en lugar de pasar por la preparación
+    campo a campo del ORM, que es la mayor parte del costo de ``bulk_create``.
+    """
+    placas = np.array(flota[0])
+    c = columnas
+    tamano = len(c['placa'])
+    vacios = [None] * tamano
+    datos = {
+        'codigo': [f'V{indice:08d}' for indice in range(primero, primero + tamano)],
+        'placa': placas[c['placa']].tolist(),
+        'tipo_vehiculo': np.array(TIPOS)[c['tipo']].tolist(),
+        'fecha_inicio': _fechas(c['inicio']),
+        'fecha_fin': _fechas(c['fin']),
+        'numero_entregas': c['entregas'].tolist(),
+        'facturacion': _decimales(c['facturacion']),
+        'observacion': np.array(OBSERVACIONES, dtype=object)[c['observacion']].tolist(),
+        'cliente': np.array(CLIENTES)[c['cliente']].tolist(),
+        'validado': c['validado'].tolist(),
+        'created_at': [ahora] * tamano,
+        'updated_at': [ahora] * tamano,
+        'usuario_creacion_id': vacios,
+        'usuario_modificacion_id': vacios,
+        'prioridad': c['prioridad'].tolist(),
+        'estado': np.array(ESTADOS)[c['estado']].tolist(),
+        **{campo: _decimales(valores) for campo, valores in indicadores.items()},
+    }
+    # Las placas de la flota ya están normalizadas
+    datos['placa_normalizada'] = datos['placa']
+    return list(zip(*(datos[campo.attname] for campo in campos_insercion())))
+
+
+def resumen_lote(columnas, horas):
+    """
+    Totales del resumen diario del lote por (día local, tipo, validado, cliente,
+    estado, prioridad).
+
+    Facturación y horas se suman en centavos enteros para que los totales sean
+    exactos; tipo, cliente y estado quedan como índices de ``TIPOS``,
+    ``CLIENTES`` y ``ESTADOS``.
+    """
+    dia = (
+        pd.to_datetime(columnas['inicio'], unit='s', utc=True)
+        .tz_convert(timezone.get_current_timezone()).tz_localize(None).normalize()
+    )
+    return pd.DataFrame({
+        'dia': dia,
+        'tipo': columnas['tipo'],
+        'validado': columnas['validado'],
+        'cliente': columnas['cliente'],
+        'estado': columnas['estado'],
+        'prioridad': columnas['prioridad'],
+        'vehiculos': 1,
+        'entregas': columnas['entregas'],
+        'facturacion': np.round(columnas['facturacion'] * 100).astype('int64'),
+        'horas': np.round(horas * 100).astype('int64'),
+    }).groupby(['dia', 'tipo', 'validado', 'cliente', 'estado', 'prioridad'], sort=False).sum()
+
+
+def _combinar(totales):
+    totales = [parcial for parcial in totales if parcial is not None]
+    if not totales:
+        return None
+    return pd.concat(totales).groupby(level=list(range(6)), sort=False).sum()
+
+
+def deltas_resumen(totales):
+    """Totales de ``resumen_lote`` como deltas de ``resumen.aplicar_deltas``"""
+    if totales is None:
+        return {}
+    return {
+        (dia.date(), TIPOS[tipo], bool(validado), CLIENTES[cliente], ESTADOS[estado], int(prioridad)):
+            [int(vehiculos), int(entregas), Decimal(int(facturacion)) / 100, Decimal(int(horas)) / 100]
+        for (dia, tipo, validado, cliente, estado, prioridad), (vehiculos, entregas, facturacion, horas)
+        in zip(totales.index, totales.itertuples(index=False))
+    }
+
+
+def campos_insercion():
+    """Campos concretos de ``Vehiculo`` salvo la clave primaria"""
+    return [campo for campo in Vehiculo._meta.concrete_fields if not campo.primary_key]
+
+
+def sql_insercion():
+    columnas = ', '.join(connection.ops.quote_name(campo.column) for campo in campos_insercion())
+    marcadores = ', '.join(['%s'] * len(campos_insercion()))
+    return f'INSERT INTO {connection.ops.quote_name(Vehiculo._meta.db_table)} ({columnas}) VALUES ({marcadores})'
+
+
+@contextmanager
+def indices_suspendidos():
+    """
+    Retirar los índices de ``Vehiculo.Meta.indexes`` durante una carga masiva.
+
+    Sus claves (fechas, placas, rendimiento) llegan en orden aleatorio y cada
+    lote modifica páginas dispersas de todos los árboles; crearlos al final,
+    con los datos ya cargados, es un solo ordenamiento por índice. La
+    unicidad de ``codigo`` se sigue comprobando durante la carga. El SQL se
+    ejecuta directamente porque el schema editor de SQLite no admite
+    ejecutarse dentro de una transacción.
+    """
+    editor = connection.schema_editor()
+    indices = Vehiculo._meta.indexes
+    with connection.cursor() as cursor:
+        for indice in indices:
+            cursor.execute(str(indice.remove_sql(Vehiculo, editor)))
+    try:
+        yield
+    finally:
+        with connection.cursor() as cursor:
+            for indice in indices:
+                cursor.execute(str(indice.create_sql(Vehiculo, editor)))
+
+
+def insertar_lotes(numeros, total, tamano, semilla, placas, dias, referencia, desplazamiento=0):
+    """
+    Generar e insertar los lotes indicados, uno por transacción.
+
+    Los códigos se numeran a partir de ``desplazamiento + 1``. Devuelve las
+    filas insertadas y los totales del resumen diario (``resumen_lote``).
+    """
+    flota = generar_flota(semilla, placas)
+    sql = sql_insercion()
+    if connection.vendor == 'sqlite':
+        # Los índices reciben claves en orden aleatorio: con la caché por
+        # defecto (2 MB) cada lote relee las mismas páginas desde disco. Con
+        # varios procesos las escrituras se turnan: se espera el bloqueo
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA cache_size = -262144')
+            cursor.execute('PRAGMA busy_timeout = 120000')
+    insertadas = 0
+    totales = None
+    for numero in numeros:
+        primero = numero * tamano
+        cantidad = min(tamano, total - primero)
+        columnas = columnas_lote(semilla, numero, cantidad, flota, dias, referencia)
+        indicadores = indicadores_lote(columnas)
+        with transaction.atomic(), connection.cursor() as cursor:
+            # Sellado con el bloqueo de escritura ya tomado (ver VehiculoQuerySet.update)
+            ahora = connection.ops.adapt_datetimefield_value(timezone.now())
+            cursor.executemany(sql, filas_lote(columnas, indicadores, flota, desplazamiento + primero + 1, ahora))
+        insertadas += cantidad
+        # Se combinan a medida que llegan para no crecer con el número de lotes
+        totales = _combinar([totales, resumen_lote(columnas, indicadores['duracion_horas'])])
+    return insertadas, totales
+
+
+def finalizar_carga(semilla, placas, totales):
+    """Estructuras derivadas que la inserción directa no mantiene"""
+    registrar_placas(normalizar_placa(placa) for placa in generar_flota(semilla, placas)[0])
+    # Se suma al resumen existente: vale también al añadir a datos previos
+    aplicar_deltas(deltas_resumen(totales))
+    cache_datos.invalidar()
+    return ResumenDiario.objects.count()
+
+
+def _insertar_en_proceso(argumentos):
+    # Cada proceso abre su propia conexión
+    connections.close_all()
+    return insertar_lotes(*argumentos)
+
+
+def generar_vehiculos(total, semilla=42, tamano=20000, procesos=1, dias=365, placas=None, referencia=None):
+    """
+    Generar ``total`` vehículos y reconstruir las estructuras derivadas.
+
+    Devuelve ``(filas insertadas, filas del resumen diario)``.
+    """
+    referencia = referencia or referencia_por_defecto()
+    placas = placas or max(50, total // 250)
+    lotes = range(math.ceil(total / tamano))
+    # El código es único: al añadir a datos existentes se numera tras el mayor id
+    desplazamiento = Vehiculo.objects.aggregate(Max('id'))['id__max'] or 0
+    argumentos = [
+        (lotes[i::procesos], total, tamano, semilla, placas, dias, referencia, desplazamiento)
+        for i in range(max(1, min(procesos, len(lotes))))
+    ]
+    # Sobre datos existentes reconstruir los índices costaría más que mantenerlos
+    with fts_suspendido(), (nullcontext() if desplazamiento else indices_suspendidos()):
+        if len(argumentos) == 1:
+            resultados = [insertar_lotes(*argumentos[0])]
+        else:
+            connections.close_all()
+            with Pool(len(argumentos)) as pool:
+                resultados = pool.map(_insertar_en_proceso, argumentos)
+    insertadas = sum(insertadas for insertadas, _ in resultados)
+    return insertadas, finalizar_carga(semilla, placas, _combinar([totales for _, totales in resultados]))
+
+
+def vaciar_vehiculos():
+    """
+    Vaciar los vehículos y sus estructuras derivadas sin cargar ningún objeto.
+
+    ``delete()`` instancia cada fila para las señales; aquí se borra con SQL
+    directo y, sin los triggers FTS ni la comprobación de claves foráneas,
+    SQLite aplica su optimización de truncado. No se dejan marcas de
+    eliminación en el feed de cambios: es una operación de mantenimiento
+    para entornos de prueba.
+    """
+    tabla = connection.ops.quote_name(Vehiculo._meta.db_table)
+    with fts_suspendido():
+        if connection.vendor == 'sqlite':
+            # Con foreign_keys activado SQLite también descarta el truncado;
+            # ninguna tabla referencia a Vehiculo
+            with connection.constraint_checks_disabled(), connection.cursor() as cursor:
+                cursor.execute(f'DELETE FROM {tabla}')
+        else:
+            with connection.cursor() as cursor:
+                cursor.execute(f'TRUNCATE TABLE {tabla}')
+        with transaction.atomic():
+            ResumenDiario.objects.all().delete()
+            PlacaTrigrama.objects.all().delete()
+    cache_datos.invalidar()
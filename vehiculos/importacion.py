@@ -0,0 +1,380 @@
+"""
+Importación masiva de viajes desde los archivos CSV/XLSX del sistema de despacho.
+
+Los archivos usan los mismos encabezados que ``exportar_datos`` (también se
+aceptan los nombres de los campos). Se leen por trozos de ``tamano`` filas;
+cada trozo se valida y convierte de forma vectorizada con pandas y las filas
+válidas se insertan o actualizan por ``codigo`` con un ``INSERT ... ON
+CONFLICT DO UPDATE`` propio (``sql_upsert``) ejecutado con ``executemany``,
+en una transacción por trozo. Ese SQL no pasa por ``VehiculoQuerySet`` ni
+por las señales, así que ``guardar_trozo`` hace en la misma transacción lo
+que harían ellos: ajustar el resumen diario con las filas antes y después
+del upsert, registrar las placas e invalidar la caché. Las filas inválidas
+se informan (número de fila, campo y motivo) sin detener la importación.
+
+Las fechas sin zona horaria se interpretan en UTC, que es como las escribe
+la exportación. Las columnas derivadas (duración, facturación por entrega,
+rendimiento) se ignoran: se recalculan al guardar.
+"""
+from decimal import Decimal
+from pathlib import Path
+from zipfile import BadZipFile
+
+import numpy as np
+import pandas as pd
+from django.conf import settings
+from django.db import DatabaseError, connection, transaction
+from django.db.models.constants import OnConflict
+from django.utils import timezone
+
+from . import cache_datos, resumen
+from .exportacion import CAMPOS_EXPORTACION, COLUMNAS_EXPORTACION
+from .generador import campos_insercion, sql_insercion
+from .indicadores import indicadores_vectorizados
+from .models import Vehiculo
+from .placas import registrar_placas
+
+
+CAMPOS_OBLIGATORIOS = (
+    'codigo', 'placa', 'tipo_vehiculo', 'fecha_inicio', 'fecha_fin',
+    'numero_entregas', 'facturacion', 'cliente',
+)
+CAMPOS_OPCIONALES = ('observacion', 'validado', 'prioridad', 'estado')
+
+# Encabezado del archivo -> campo (encabezados de la exportación y nombres de campo)
+COLUMNAS = {
+    **dict(zip(COLUMNAS_EXPORTACION, CAMPOS_EXPORTACION)),
+    **{campo: campo for campo in CAMPOS_OBLIGATORIOS + CAMPOS_OPCIONALES},
+}
+
+VERDADEROS = {'sí', 'si', 'true', '1', 'x', 'yes'}
+FALSOS = {'no', 'false', '0', ''}
+
+# Campos que se sobrescriben cuando el código ya existe (además de los opcionales presentes)
+CAMPOS_ACTUALIZABLES = CAMPOS_OBLIGATORIOS[1:] + (
+    'placa_normalizada', 'duracion_horas', 'facturacion_por_entrega', 'rendimiento',
+    'updated_at', 'usuario_modificacion',
+)
+
+
+# Campos que cambian en cada escritura: no cuentan para decidir si la fila cambió
+CAMPOS_SEGUIMIENTO = ('updated_at', 'usuario_modificacion')
+# Comparación de filas para el WHERE del upsert (en otros motores se actualiza siempre)
+COMPARACION_CAMBIO = {'sqlite': 'IS NOT', 'postgresql': 'IS DISTINCT FROM'}
+
+
+class ErrorImportacion(ValueError):
+    """Archivo que no puede importarse (formato o columnas)"""
+
+
+def tamano_lote():
+    return getattr(settings, 'VEHICULOS_IMPORTACION_LOTE', 5000)
+
+
+def max_errores():
+    return getattr(settings, 'VEHICULOS_IMPORTACION_MAX_ERRORES', 1000)
+
+
+def _leer_csv(archivo, tamano, compresion=None):
+    yield from pd.read_csv(
+        archivo, dtype=str, keep_default_na=False, chunksize=tamano,
+        encoding='utf-8-sig', compression=compresion,
+    )
+
+
+def _leer_xlsx(archivo, tamano):
+    from openpyxl import load_workbook
+
+    libro = load_workbook(archivo, read_only=True, data_only=True)
+    try:
+        filas = libro.active.iter_rows(values_only=True)
+        encabezados = [str(valor).strip() if valor is not None else '' for valor in next(filas, ())]
+        inicio = 0
+        lote = []
+        for fila in filas:
+            lote.append(fila)
+            if len(lote) == tamano:
+                yield pd.DataFrame(lote, columns=encabezados, index=range(inicio, inicio + len(lote)))
+                inicio += len(lote)
+                lote = []
+        if lote:
+            yield pd.DataFrame(lote, columns=encabezados, index=range(inicio, inicio + len(lote)))
+    finally:
+        libro.close()
+
+
+def leer_trozos(archivo, nombre, tamano=None):
+    """DataFrames de ``tamano`` filas; el formato se deduce de la extensión de ``nombre``"""
+    tamano = tamano or tamano_lote()
+    nombre = nombre.lower()
+    if nombre.endswith('.csv'):
+        return _leer_csv(archivo, tamano)
+    if nombre.endswith('.csv.gz'):
+        return _leer_csv(archivo, tamano, compresion='gzip')
+    if nombre.endswith('.xlsx'):
+        return _leer_xlsx(archivo, tamano)
+    raise ErrorImportacion(f'Formato no soportado: {nombre} (se admiten .csv, .csv.gz y .xlsx)')
+
+
+def _texto(serie):
+    return serie.fillna('').astype(str).str.strip()
+
+
+def validar_trozo(trozo):
+    """
+    Convertir un trozo a los tipos del modelo.
+
+    Devuelve ``(validos, errores)``: un DataFrame con una columna por campo
+    (solo filas válidas, con el número de fila del archivo como índice) y la
+    lista de errores ``{'fila', 'campo', 'error'}``.
+    """
+    presentes = {columna: COLUMNAS[columna.strip()] for columna in trozo.columns if columna.strip() in COLUMNAS}
+    faltantes = set(CAMPOS_OBLIGATORIOS) - set(presentes.values())
+    if faltantes:
+        raise ErrorImportacion(f'Faltan columnas: {", ".join(sorted(faltantes))}')
+
+    datos = trozo[list(presentes)].rename(columns=presentes)
+    # Número de fila del archivo (la 1 es el encabezado)
+    datos.index = datos.index + 2
+    invalidas = pd.Series(False, index=datos.index)
+    errores = []
+
+    def marcar(mascara, campo, mensaje):
+        nonlocal invalidas
+        mascara = mascara.fillna(True) & ~invalidas
+        errores.extend({'fila': int(fila), 'campo': campo, 'error': mensaje} for fila in datos.index[mascara])
+        invalidas |= mascara
+
+    validos = pd.DataFrame(index=datos.index)
+    for campo in ('codigo', 'placa', 'tipo_vehiculo', 'cliente'):
+        validos[campo] = _texto(datos[campo])
+        marcar(validos[campo] == '', campo, 'Valor requerido')
+        maximo = Vehiculo._meta.get_field(campo).max_length
+        marcar(validos[campo].str.len() > maximo, campo, f'Más de {maximo} caracteres')
+    tipos = [valor for valor, _ in Vehiculo.TIPO_VEHICULO_CHOICES]
+    marcar(~validos['tipo_vehiculo'].isin(tipos), 'tipo_vehiculo', f'Debe ser uno de: {", ".join(tipos)}')
+
+    for campo in ('fecha_inicio', 'fecha_fin'):
+        validos[campo] = pd.to_datetime(datos[campo], utc=True, errors='coerce', format='ISO8601')
+        marcar(validos[campo].isna(), campo, 'Fecha inválida')
+    marcar(validos['fecha_fin'] < validos['fecha_inicio'], 'fecha_fin', 'Anterior a fecha_inicio')
+
+    entregas = pd.to_numeric(datos['numero_entregas'], errors='coerce')
+    marcar(entregas.isna() | (entregas < 0) | (entregas % 1 != 0), 'numero_entregas',
+           'Debe ser un entero no negativo')
+    validos['numero_entregas'] = entregas.fillna(0).astype('int64')
+
+    facturacion = pd.to_numeric(datos['facturacion'], errors='coerce')
+    marcar(facturacion.isna() | (facturacion < 0) | (facturacion >= 10 ** 8), 'facturacion',
+           'Debe ser un número entre 0 y 99999999.99')
+    validos['facturacion'] = facturacion.fillna(0).round(2)
+
+    if 'observacion' in datos:
+        observacion = _texto(datos['observacion'])
+        validos['observacion'] = observacion.where(observacion != '', None)
+    if 'validado' in datos:
+        validado = _texto(datos['validado']).str.lower()
+        marcar(~validado.isin(VERDADEROS | FALSOS), 'validado', 'Debe ser Sí/No')
+        validos['validado'] = validado.isin(VERDADEROS)
+    if 'prioridad' in datos:
+        prioridad = pd.to_numeric(datos['prioridad'].replace('', np.nan), errors='coerce').fillna(1)
+        marcar(~prioridad.isin([valor for valor, _ in Vehiculo.PRIORIDAD_CHOICES]), 'prioridad',
+               'Debe ser 1, 2 o 3')
+        validos['prioridad'] = prioridad.fillna(1).astype('int64')
+    if 'estado' in datos:
+        estado = _texto(datos['estado']).replace('', 'activo')
+        estados = [valor for valor, _ in Vehiculo.ESTADO_CHOICES]
+        marcar(~estado.isin(estados), 'estado', f'Debe ser uno de: {", ".join(estados)}')
+        validos['estado'] = estado
+
+    errores.sort(key=lambda error: error['fila'])
+    validos = validos[~invalidas]
+    # normalizar_placa, vectorizado
+    validos['placa_normalizada'] = (
+        validos['placa'].str.upper().str.replace(' ', '', regex=False).str.replace('-', '', regex=False)
+    )
+    # Un código repetido dentro del trozo: gana la última fila, como en el upsert
+    return validos[~validos['codigo'].duplicated(keep='last')], errores
+
+
+def _fechas(serie):
+    # Mismo texto que guarda Django ('AAAA-MM-DD HH:MM:SS[.ffffff]', UTC), vectorizado
+    texto = np.datetime_as_string(serie.dt.tz_convert(None).to_numpy().astype('datetime64[us]'))
+    return np.char.replace(np.char.replace(texto, 'T', ' '), '.000000', '').tolist()
+
+
+def _decimales(valores):
+    return np.char.mod('%.2f', np.asarray(valores, dtype=float)).tolist()
+
+
+def filas_trozo(validos, usuario, ahora):
+    """
+    Filas del trozo listas para el upsert, en el orden de ``campos_insercion()``.
+
+    Como en el generador, los valores se convierten a su forma de base de
+    datos por columna en lugar de pasar por la preparación campo a campo del
+    ORM; los indicadores que ``bulk_create`` calcularía se calculan aquí
+    vectorizados.
+    """
+    horas = (validos['fecha_fin'] - validos['fecha_inicio']).dt.total_seconds() / 3600
+    indicadores = indicadores_vectorizados(horas, validos['numero_entregas'], validos['facturacion'])
+    cantidad = len(validos)
+    datos = {
+        campo: validos[campo].tolist() if campo in validos.columns
+        else [Vehiculo._meta.get_field(campo).get_default()] * cantidad
+        for campo in (
+            'codigo', 'placa', 'placa_normalizada', 'tipo_vehiculo', 'numero_entregas', 'cliente',
+            *CAMPOS_OPCIONALES,
+        )
+    }
+    datos.update({
+        'fecha_inicio': _fechas(validos['fecha_inicio']),
+        'fecha_fin': _fechas(validos['fecha_fin']),
+        'facturacion': _decimales(validos['facturacion']),
+        'created_at': [ahora] * cantidad,
+        'updated_at': [ahora] * cantidad,
+        'usuario_creacion_id': [usuario.pk if usuario else None] * cantidad,
+        'usuario_modificacion_id': [usuario.pk if usuario else None] * cantidad,
+        **{campo: _decimales(valores) for campo, valores in indicadores.items()},
+    })
+    return list(zip(*(datos[campo.attname] for campo in campos_insercion())))
+
+
+def sql_upsert(actualizables):
+    """
+    INSERT de todas las columnas que, si el código ya existe, actualiza ``actualizables``.
+
+    Donde el motor lo permite, la actualización solo se aplica si algún
+    valor cambia: reimportar el mismo archivo no modifica ``updated_at`` ni
+    hace aparecer las filas en el feed de cambios.
+    """
+    tabla = connection.ops.quote_name(Vehiculo._meta.db_table)
+    columnas = [Vehiculo._meta.get_field(campo).column for campo in actualizables]
+    sufijo = connection.ops.on_conflict_suffix_sql(
+        campos_insercion(), OnConflict.UPDATE, columnas, [Vehiculo._meta.get_field('codigo').column],
+    )
+    sql = f'{sql_insercion()} {sufijo}'
+    comparacion = COMPARACION_CAMBIO.get(connection.vendor)
+    if comparacion:
+        datos = [
+            connection.ops.quote_name(Vehiculo._meta.get_field(campo).column)
+            for campo in actualizables if campo not in CAMPOS_SEGUIMIENTO
+        ]
+        actuales = ', '.join(f'{tabla}.{columna}' for columna in datos)
+        nuevos = ', '.join(f'EXCLUDED.{columna}' for columna in datos)
+        sql += f' WHERE ({actuales}) {comparacion} ({nuevos})'
+    return sql
+
+
+def _leer_resumen(codigos):
+    """
+    Campos del resumen diario de los vehículos con esos códigos, como DataFrame.
+
+    Se lee con el cursor y se convierte por columna: los conversores del ORM
+    (fechas, decimales) fila a fila cuestan más que la propia consulta.
+    """
+    lote = getattr(settings, 'VEHICULOS_VALIDACION_LOTE', 900)
+    filas = []
+    with connection.cursor() as cursor:
+        for i in range(0, len(codigos), lote):
+            consulta = Vehiculo.objects.filter(codigo__in=codigos[i:i + lote]).values_list(*resumen.CAMPOS_VEHICULO)
+            cursor.execute(*consulta.query.sql_with_params())
+            filas.extend(cursor.fetchall())
+    tabla = pd.DataFrame(filas, columns=resumen.CAMPOS_VEHICULO)
+    return tabla.assign(
+        fecha_inicio=pd.to_datetime(tabla['fecha_inicio'], utc=True, format='ISO8601'),
+        validado=tabla['validado'].astype(bool),
+        facturacion=tabla['facturacion'].astype(float),
+        duracion_horas=tabla['duracion_horas'].fillna(0).astype(float),
+    )
+
+
+def _acumular_deltas(tabla, signo, deltas):
+    """``resumen.acumular_deltas`` agrupando con pandas"""
+    if tabla.empty:
+        return deltas
+    dia = tabla['fecha_inicio'].dt.tz_convert(timezone.get_current_timezone()).dt.date
+    grupos = (
+        tabla.assign(dia=dia, vehiculos=1)
+        .groupby(list(resumen.CAMPOS_CLAVE), sort=False)[
+            ['vehiculos', 'numero_entregas', 'facturacion', 'duracion_horas']
+        ]
+        .sum()
+    )
+    for clave, (vehiculos, entregas, facturacion, horas) in zip(grupos.index, grupos.itertuples(index=False)):
+        delta = deltas.setdefault(clave, [0, 0, Decimal('0'), Decimal('0')])
+        delta[0] += signo * int(vehiculos)
+        delta[1] += signo * int(entregas)
+        delta[2] += signo * Decimal(f'{facturacion:.2f}')
+        delta[3] += signo * Decimal(f'{horas:.2f}')
+    return deltas
+
+
+def guardar_trozo(validos, usuario=None):
+    """
+    Insertar o actualizar por ``codigo`` las filas válidas en una transacción.
+
+    El upsert no pasa por el ORM ni emite señales: el resumen diario se
+    ajusta con la diferencia entre las filas antes y después de escribir, y
+    se registran las placas para la búsqueda por trigramas.
+    Devuelve ``(creados, actualizados, sin_cambios)``.
+    """
+    codigos = validos['codigo'].tolist()
+    opcionales = [campo for campo in CAMPOS_OPCIONALES if campo in validos.columns]
+
+    with transaction.atomic():
+        # Sellado con el bloqueo de escritura ya tomado (ver VehiculoQuerySet.update)
+        filas = filas_trozo(validos, usuario, connection.ops.adapt_datetimefield_value(timezone.now()))
+        previos = _leer_resumen(codigos)
+        with connection.cursor() as cursor:
+            cursor.executemany(sql_upsert([*CAMPOS_ACTUALIZABLES, *opcionales]), filas)
+            escritas = cursor.rowcount
+        if escritas:
+            deltas = _acumular_deltas(previos, -1, {})
+            resumen.aplicar_deltas(_acumular_deltas(_leer_resumen(codigos), 1, deltas))
+        registrar_placas(validos['placa_normalizada'].unique())
+        cache_datos.invalidar()
+    creados = len(codigos) - len(previos)
+    actualizados = escritas - creados if connection.vendor in COMPARACION_CAMBIO else len(previos)
+    return creados, actualizados, len(previos) - actualizados
+
+
+def importar(archivo, nombre, usuario=None, tamano=None):
+    """
+    Importar un archivo completo; ``nombre`` determina el formato.
+
+    Devuelve los conteos ``filas``, ``creados``, ``actualizados``,
+    ``sin_cambios`` y ``total_errores``, y la lista ``errores`` limitada a
+    ``VEHICULOS_IMPORTACION_MAX_ERRORES`` entradas. Lanza ``ErrorImportacion``
+    si el formato o las columnas no son válidos.
+    """
+    resultado = {
+        'filas': 0, 'creados': 0, 'actualizados': 0, 'sin_cambios': 0, 'total_errores': 0, 'errores': [],
+    }
+    limite = max_errores()
+
+    def registrar_errores(errores):
+        resultado['total_errores'] += len(errores)
+        resultado['errores'].extend(errores[:max(0, limite - len(resultado['errores']))])
+
+    try:
+        for trozo in leer_trozos(archivo, nombre, tamano):
+            resultado['filas'] += len(trozo)
+            validos, errores = validar_trozo(trozo)
+            registrar_errores(errores)
+            if validos.empty:
+                continue
+            try:
+                conteos = guardar_trozo(validos, usuario)
+            except DatabaseError as e:
+                # El trozo se revierte completo; el resto del archivo continúa
+                registrar_errores([
+                    {'fila': int(fila), 'campo': None, 'error': f'Error de base de datos: {e}'}
+                    for fila in validos.index
+                ])
+                continue
+            for clave, cantidad in zip(('creados', 'actualizados', 'sin_cambios'), conteos):
+                resultado[clave] += cantidad
+    except (pd.errors.ParserError, pd.errors.EmptyDataError, UnicodeDecodeError, BadZipFile) as e:
+        raise ErrorImportacion(f'No se pudo leer {Path(nombre).name}: {e}')
+    return resultado
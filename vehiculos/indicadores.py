@@ -0,0 +1,121 @@
+"""
+Indicadores derivados de cada viaje, guardados como columnas.
+
+``duracion_horas``, ``facturacion_por_entrega`` y ``rendimiento``
+(entregas/hora) se calculan a partir de las fechas, las entregas y la
+facturación, y se guardan en ``Vehiculo`` para poder filtrar, ordenar y
+agregar sobre ellos con índices (Django 4.2 no tiene columnas generadas).
+
+Se mantienen en todos los caminos de escritura: ``save()`` y
+``bulk_create()``/``bulk_update()`` los calculan en Python, y ``update()``
+usa las expresiones SQL equivalentes de ``expresiones_indicadores``.
+"""
+from decimal import Decimal
+
+import numpy as np
+from django.db.models import Case, DecimalField, F, FloatField, Func, Value, When
+from django.db.models.functions import Cast, Round
+from django.db.models.lookups import GreaterThan
+
+
+CAMPOS_ORIGEN = ('fecha_inicio', 'fecha_fin', 'numero_entregas', 'facturacion')
+CAMPOS_INDICADORES = ('duracion_horas', 'facturacion_por_entrega', 'rendimiento')
+
+_CERO = Decimal('0.00')
+
+
+def _redondear(valor):
+    return Decimal(f'{round(valor, 2):.2f}')
+
+
+def calcular_indicadores(fecha_inicio, fecha_fin, numero_entregas, facturacion):
+    """Indicadores de un viaje como ``{campo: Decimal}``"""
+    horas = (fecha_fin - fecha_inicio).total_seconds() / 3600 if fecha_inicio and fecha_fin else 0
+    entregas = numero_entregas or 0
+    return {
+        'duracion_horas': _redondear(horas),
+        'facturacion_por_entrega': _redondear(float(facturacion or 0) / entregas) if entregas > 0 else _CERO,
+        'rendimiento': _redondear(entregas / horas) if horas > 0 else _CERO,
+    }
+
+
+def indicadores_vectorizados(horas, entregas, facturacion):
+    """``calcular_indicadores`` sobre arrays de NumPy (floats redondeados a 2 decimales)"""
+    horas = np.asarray(horas, dtype=float)
+    entregas = np.asarray(entregas, dtype=float)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return {
+            'duracion_horas': np.round(horas, 2),
+            'facturacion_por_entrega': np.where(entregas > 0, np.round(facturacion / entregas, 2), 0.0),
+            'rendimiento': np.where(horas > 0, np.round(entregas / horas, 2), 0.0),
+        }
+
+
+class HorasEntre(Func):
+    """Horas (con decimales) entre dos datetimes: ``HorasEntre(inicio, fin)``"""
+    arity = 2
+    output_field = FloatField()
+
+    plantillas = {
+        'sqlite': '((julianday({fin}) - julianday({inicio})) * 24)',
+        'mysql': '(TIMESTAMPDIFF(MICROSECOND, {inicio}, {fin}) / 3600000000)',
+    }
+    plantilla_estandar = '(EXTRACT(EPOCH FROM ({fin} - {inicio})) / 3600)'
+
+    def as_sql(self, compiler, connection, **extra_context):
+        inicio, fin = self.get_source_expressions()
+        sql_inicio, params_inicio = compiler.compile(inicio)
+        sql_fin, params_fin = compiler.compile(fin)
+        plantilla = self.plantillas.get(connection.vendor, self.plantilla_estandar)
+        # Los parámetros siguen el orden en que aparecen en la plantilla
+        if plantilla.index('{inicio}') < plantilla.index('{fin}'):
+            params = (*params_inicio, *params_fin)
+        else:
+            params = (*params_fin, *params_inicio)
+        return plantilla.format(inicio=sql_inicio, fin=sql_fin), params
+
+
+def expresiones_indicadores(valores=None):
+    """
+    Expresiones SQL de los indicadores para un ``update()``.
+
+    En un UPDATE las columnas del lado derecho valen lo que valían antes de
+    la sentencia, así que los campos de origen que se están modificando se
+    pasan en ``valores`` (valor o expresión) y sustituyen a ``F(campo)``.
+    """
+    from .models import Vehiculo
+
+    valores = valores or {}
+
+    def origen(campo):
+        valor = valores.get(campo, F(campo))
+        if hasattr(valor, 'resolve_expression'):
+            return valor
+        return Value(valor, output_field=Vehiculo._meta.get_field(campo))
+
+    horas = HorasEntre(origen('fecha_inicio'), origen('fecha_fin'))
+    entregas = origen('numero_entregas')
+    decimal = DecimalField(max_digits=12, decimal_places=2)
+    return {
+        'duracion_horas': Round(horas, 2),
+        'facturacion_por_entrega': Case(
+            # CAST evita la división entera de SQLite cuando la facturación no tiene decimales
+            When(GreaterThan(entregas, 0), then=Round(Cast(origen('facturacion'), FloatField()) / entregas, 2)),
+            default=Value(_CERO),
+            output_field=decimal,
+        ),
+        'rendimiento': Case(
+            When(GreaterThan(horas, 0), then=Round(Cast(entregas, FloatField()) / horas, 2)),
+            default=Value(_CERO),
+            output_field=decimal,
+        ),
+    }
+
+
+def recalcular_indicadores(queryset=None):
+    """Recalcular en SQL los indicadores de ``queryset`` (todos los vehículos por defecto)"""
+    from .models import Vehiculo
+
+    if queryset is None:
+        queryset = Vehiculo.objects.all()
+    return queryset.update(**expresiones_indicadores())
@@ -0,0 +1,84 @@
+"""
+Listado columnar de vehículos para tablas virtualizadas en el cliente.
+
+Cada página se devuelve como un array por campo en lugar de un objeto por
+fila, y ``tipo_vehiculo``/``estado``/``cliente`` se codifican con un
+diccionario por página (la columna lleva índices enteros y los valores
+aparecen una sola vez). Las filas se leen con ``values()`` sin instanciar
+``Vehiculo`` y la paginación es por cursor (``PaginadorKeyset``).
+"""
+import datetime
+import decimal
+
+from .paginacion import PaginadorKeyset
+
+
+CAMPOS_LISTADO = (
+    'id', 'codigo', 'placa', 'tipo_vehiculo', 'fecha_inicio', 'fecha_fin', 'numero_entregas',
+    'facturacion', 'observacion', 'cliente', 'validado', 'estado', 'prioridad',
+    'duracion_horas', 'facturacion_por_entrega', 'rendimiento',
+)
+CAMPOS_DICCIONARIO = ('tipo_vehiculo', 'estado', 'cliente')
+# Solo campos con índice, para que cada página sea un range scan
+ORDENES = ('fecha_inicio', 'rendimiento', 'codigo')
+
+
+def campos(texto):
+    """Validar ``campos`` (separados por comas; vacío = todos); ``id`` siempre se incluye"""
+    nombres = [nombre.strip() for nombre in (texto or '').split(',') if nombre.strip()]
+    invalidos = [nombre for nombre in nombres if nombre not in CAMPOS_LISTADO]
+    if invalidos:
+        raise ValueError(f'Campos no válidos: {", ".join(invalidos)}')
+    if not nombres:
+        return list(CAMPOS_LISTADO)
+    return ['id'] + [nombre for nombre in CAMPOS_LISTADO if nombre in nombres and nombre != 'id']
+
+
+def orden(texto):
+    """``(campo, descendente)`` a partir de ``orden`` (``campo`` o ``-campo``; por defecto ``-fecha_inicio``)"""
+    texto = (texto or '-fecha_inicio').strip()
+    campo = texto.lstrip('-')
+    if campo not in ORDENES:
+        raise ValueError(f'Orden no válido: {texto} (se admiten {", ".join(ORDENES)})')
+    return campo, texto.startswith('-')
+
+
+def _valor(valor):
+    if isinstance(valor, datetime.datetime):
+        return valor.isoformat()
+    if isinstance(valor, decimal.Decimal):
+        return float(valor)
+    return valor
+
+
+def columnas_pagina(filas, nombres):
+    """Columnas (un array por campo) y diccionarios de una lista de filas ``values()``"""
+    columnas = {}
+    diccionarios = {}
+    for nombre in nombres:
+        valores = [fila[nombre] for fila in filas]
+        if nombre in CAMPOS_DICCIONARIO:
+            indices = {}
+            columnas[nombre] = [indices.setdefault(valor, len(indices)) for valor in valores]
+            diccionarios[nombre] = list(indices)
+        else:
+            columnas[nombre] = [_valor(valor) for valor in valores]
+    return columnas, diccionarios
+
+
+def listar(queryset, nombres, campo='fecha_inicio', descendente=True, tamano=None, cursor=None):
+    """Página de ``queryset`` en formato columnar con los cursores anterior/siguiente"""
+    # El campo de orden se lee aunque no se pida: lo necesitan los cursores
+    leidos = nombres if campo in nombres else nombres + [campo]
+    paginador = PaginadorKeyset(queryset.values(*leidos), campo=campo, descendente=descendente, tamano=tamano)
+    pagina = paginador.pagina(cursor)
+    columnas, diccionarios = columnas_pagina(pagina.objetos, nombres)
+    return {
+        'campos': nombres,
+        'filas': len(pagina),
+        'columnas': columnas,
+        'diccionarios': diccionarios,
+        'cursor_siguiente': pagina.cursor_siguiente,
+        'cursor_anterior': pagina.cursor_anterior,
+        'tamano': pagina.tamano,
+    }
@@ -0,0 +1,79 @@
+import json
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from vehiculos.benchmark import CASOS, base_de_datos_temporal, comparar, ejecutar_casos, entorno
+from vehiculos.generador import generar_vehiculos, vaciar_vehiculos
+
+
+class Command(BaseCommand):
+    help = (
+        'Mide tiempo, consultas y memoria de las vistas, estadísticas y exportaciones '
+        'sobre datos sintéticos en una base de datos temporal'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tamanos', default='10000,100000,1000000',
+                            help='Tamaños de los datasets separados por comas')
+        parser.add_argument('--repeticiones', type=int, default=3)
+        parser.add_argument('--casos', help='Solo estos casos (separados por comas)')
+        parser.add_argument('--semilla', type=int, default=42)
+        parser.add_argument('--salida', default=str(settings.BASE_DIR / 'benchmark_resultados.json'),
+                            help='Archivo JSON de resultados')
+        parser.add_argument('--base', help='Resultados guardados con los que comparar')
+        parser.add_argument('--tolerancia', type=float, default=0.25,
+                            help='Aumento de tiempo admitido frente a la base (fracción)')
+
+    def handle(self, *args, **options):
+        try:
+            tamanos = [int(valor) for valor in options['tamanos'].split(',') if valor]
+        except ValueError:
+            raise CommandError('--tamanos debe ser una lista de enteros')
+        nombres = set(options['casos'].split(',')) if options['casos'] else None
+        desconocidos = (nombres or set()) - {caso.nombre for caso in CASOS}
+        if desconocidos:
+            raise CommandError(f'Casos desconocidos: {", ".join(sorted(desconocidos))}')
+        base = None
+        if options['base']:
+            base = json.loads(Path(options['base']).read_text(encoding='utf-8'))
+
+        resultados = {
+            'fecha': timezone.now().isoformat(),
+            'entorno': entorno(),
+            'repeticiones': options['repeticiones'],
+            'resultados': {},
+        }
+
+        with base_de_datos_temporal():
+            usuario = User.objects.create_user('benchmark', password=None)
+            for tamano in tamanos:
+                self.stdout.write(f'Generando {tamano} vehículos…')
+                vaciar_vehiculos()
+                generar_vehiculos(tamano, semilla=options['semilla'])
+                resultados['resultados'][str(tamano)] = ejecutar_casos(
+                    usuario, options['repeticiones'], nombres, progreso=self.mostrar
+                )
+
+        Path(options['salida']).write_text(json.dumps(resultados, indent=2, ensure_ascii=False), encoding='utf-8')
+        self.stdout.write(self.style.SUCCESS(f'Resultados guardados en {options["salida"]}'))
+
+        if base is not None:
+            regresiones = comparar(resultados, base, options['tolerancia'])
+            for regresion in regresiones:
+                self.stdout.write(self.style.ERROR(f'  Regresión {regresion}'))
+            if regresiones:
+                raise CommandError(f'{len(regresiones)} regresiones frente a {options["base"]}')
+            self.stdout.write(self.style.SUCCESS('Sin regresiones frente a la base'))
+
+    def mostrar(self, nombre, medida):
+        presupuesto = medida['max_consultas']
+        exceso = presupuesto is not None and medida['consultas'] > presupuesto
+        linea = (
+            f'  {nombre:<30} {medida["tiempo_ms"]:>10.1f} ms {medida["consultas"]:>4} consultas '
+            f'{medida["memoria_pico_kb"]:>10.0f} KB {medida["bytes"]:>12} bytes'
+        )
+        self.stdout.write(self.style.WARNING(linea) if exceso else linea)
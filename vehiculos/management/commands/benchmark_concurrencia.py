@@ -0,0 +1,70 @@
+import json
+from pathlib import Path
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from vehiculos.benchmark import (
+    OPERACIONES, PERFILES_CONEXION, base_de_datos_temporal, carga_concurrente, entorno, perfil_conexion,
+)
+from vehiculos.generador import generar_vehiculos
+
+
+class Command(BaseCommand):
+    help = (
+        'Mide throughput, latencia y bloqueos de validaciones concurrentes con exportaciones '
+        'y estadísticas, con el perfil de conexión por defecto de Django y con el de settings'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--vehiculos', type=int, default=20000)
+        parser.add_argument('--segundos', type=float, default=10)
+        parser.add_argument('--validar', type=int, default=4, help='Hilos que validan/invalidan')
+        parser.add_argument('--exportar', type=int, default=2, help='Hilos que exportan CSV')
+        parser.add_argument('--stats', type=int, default=2, help='Hilos que piden estadísticas')
+        parser.add_argument('--perfiles', default='antes,despues',
+                            help=f'Perfiles a comparar: {", ".join(PERFILES_CONEXION)}')
+        parser.add_argument('--semilla', type=int, default=42)
+        parser.add_argument('--salida', help='Archivo JSON de resultados')
+
+    def handle(self, *args, **options):
+        perfiles = [nombre for nombre in options['perfiles'].split(',') if nombre]
+        desconocidos = set(perfiles) - set(PERFILES_CONEXION)
+        if desconocidos:
+            raise CommandError(f'Perfiles desconocidos: {", ".join(sorted(desconocidos))}')
+        hilos = {nombre: options[nombre] for nombre in OPERACIONES if options[nombre] > 0}
+
+        resultados = {
+            'fecha': timezone.now().isoformat(),
+            'entorno': entorno(),
+            'vehiculos': options['vehiculos'],
+            'segundos': options['segundos'],
+            'hilos': hilos,
+            'resultados': {},
+        }
+        with base_de_datos_temporal():
+            self.stdout.write(f'Generando {options["vehiculos"]} vehículos…')
+            generar_vehiculos(options['vehiculos'], semilla=options['semilla'])
+            usuario = User.objects.create_user('benchmark', password=None)
+            for nombre in perfiles:
+                with perfil_conexion(nombre) as perfil:
+                    self.stdout.write(f'Perfil {nombre}: {perfil}')
+                    medidas = carga_concurrente(usuario, hilos, options['segundos'], options['semilla'])
+                resultados['resultados'][nombre] = medidas
+                for operacion, medida in medidas.items():
+                    self.mostrar(operacion, medida)
+
+        if options['salida']:
+            Path(options['salida']).write_text(
+                json.dumps(resultados, indent=2, ensure_ascii=False), encoding='utf-8'
+            )
+            self.stdout.write(self.style.SUCCESS(f'Resultados guardados en {options["salida"]}'))
+
+    def mostrar(self, operacion, medida):
+        linea = (
+            f'  {operacion:<10} {medida["por_segundo"]:>8.1f} op/s  p50 {medida["p50_ms"]:>8.1f} ms  '
+            f'p95 {medida["p95_ms"]:>8.1f} ms  máx {medida["max_ms"]:>8.1f} ms  '
+            f'{medida["errores"]:>4} errores ({medida["bloqueos"]} bloqueos)'
+        )
+        self.stdout.write(self.style.WARNING(linea) if medida['errores'] else linea)
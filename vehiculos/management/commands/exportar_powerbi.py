@@ -0,0 +1,44 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from vehiculos.powerbi import ESCRITORES, exportar, formato_de
+
+
+class Command(BaseCommand):
+    help = 'Exporta todos los vehículos por trozos a CSV/XLSX/Parquet para Power BI, con Día/Mes/Año'
+
+    def add_arguments(self, parser):
+        parser.add_argument('destino', nargs='?',
+                            help='Archivo de salida; por defecto vehiculos_powerbi_AAAAMMDD_HHMMSS.<formato>')
+        parser.add_argument('--formato', choices=sorted(ESCRITORES),
+                            help='Formato de salida (por defecto según la extensión del destino, o xlsx)')
+        parser.add_argument('--lote', type=int, default=None,
+                            help='Filas por trozo (por defecto VEHICULOS_POWERBI_LOTE)')
+
+    def handle(self, *args, **options):
+        destino = options['destino']
+        formato = options['formato'] or (destino and formato_de(destino)) or 'xlsx'
+        if destino is None:
+            destino = f'vehiculos_powerbi_{timezone.localtime():%Y%m%d_%H%M%S}.{formato}'
+        if options['lote'] is not None and options['lote'] <= 0:
+            raise CommandError('--lote debe ser positivo')
+
+        inicio = time.perf_counter()
+        resumen = exportar(destino, formato=formato, tamano=options['lote'])
+        segundos = time.perf_counter() - inicio
+
+        total = resumen['total']
+        self.stdout.write(self.style.SUCCESS(f'{total} registros exportados a {destino} en {segundos:.1f} s'))
+        if not total:
+            return
+        self.stdout.write(f'Total entregas: {resumen["entregas"]:,}')
+        self.stdout.write(f'Total facturación: ${resumen["facturacion"]:,.2f}')
+        self.stdout.write(f'Validados: {resumen["validados"]}/{total} ({resumen["validados"] / total * 100:.1f}%)')
+        self.stdout.write('Por tipo:')
+        for tipo, viajes in resumen['por_tipo'].items():
+            self.stdout.write(f'  {tipo}: {viajes}')
+        self.stdout.write(f'Últimos {len(resumen["ultimos_dias"])} días:')
+        for dia, viajes in resumen['ultimos_dias'].items():
+            self.stdout.write(f'  {dia:%d/%m/%Y}: {viajes}')
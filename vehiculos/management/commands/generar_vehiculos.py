@@ -0,0 +1,52 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+
+from vehiculos.filtros import inicio_dia
+from vehiculos.generador import generar_vehiculos, vaciar_vehiculos
+
+
+class Command(BaseCommand):
+    help = 'Genera N vehículos sintéticos deterministas (vectorizados con NumPy) para pruebas de carga'
+
+    def add_arguments(self, parser):
+        parser.add_argument('cantidad', type=int, help='Número de vehículos a generar')
+        parser.add_argument('--semilla', type=int, default=42)
+        parser.add_argument('--lote', type=int, default=20000, help='Filas por lote y transacción')
+        parser.add_argument('--procesos', type=int, default=1, help='Procesos que generan e insertan lotes')
+        parser.add_argument('--dias', type=int, default=365, help='Días de historia hacia atrás')
+        parser.add_argument('--placas', type=int, help='Tamaño de la flota (por defecto cantidad/250, mínimo 50)')
+        parser.add_argument('--referencia', help='Fecha (AAAA-MM-DD) en la que termina la historia; por defecto hoy')
+        parser.add_argument('--vaciar', action='store_true', help='Vaciar los vehículos existentes antes de generar')
+
+    def handle(self, *args, **options):
+        if options['cantidad'] <= 0 or options['lote'] <= 0:
+            raise CommandError('cantidad y --lote deben ser positivos')
+
+        referencia = None
+        if options['referencia']:
+            fecha = parse_date(options['referencia'])
+            if fecha is None:
+                raise CommandError('--referencia debe tener el formato AAAA-MM-DD')
+            referencia = inicio_dia(fecha)
+
+        inicio = time.perf_counter()
+        if options['vaciar']:
+            vaciar_vehiculos()
+            self.stdout.write('Vehículos existentes eliminados')
+
+        insertadas, filas_resumen = generar_vehiculos(
+            options['cantidad'],
+            semilla=options['semilla'],
+            tamano=options['lote'],
+            procesos=max(1, options['procesos']),
+            dias=options['dias'],
+            placas=options['placas'],
+            referencia=referencia,
+        )
+        duracion = time.perf_counter() - inicio
+        self.stdout.write(self.style.SUCCESS(
+            f'{insertadas} vehículos generados en {duracion:.1f} s ({insertadas / duracion:,.0f} filas/s, '
+            f'incluye resumen diario e índices); resumen diario: {filas_resumen} filas'
+        ))
@@ -0,0 +1,56 @@
+import csv
+import time
+from pathlib import Path
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from vehiculos.importacion import ErrorImportacion, importar
+
+
+class Command(BaseCommand):
+    help = 'Importa viajes desde un archivo CSV/XLSX con los encabezados de la exportación (upsert por código)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('archivo', help='Ruta del archivo .csv, .csv.gz o .xlsx')
+        parser.add_argument('--lote', type=int, default=None,
+                            help='Filas por trozo/transacción (por defecto VEHICULOS_IMPORTACION_LOTE)')
+        parser.add_argument('--usuario', default=None,
+                            help='Usuario registrado como creador/modificador')
+        parser.add_argument('--errores', default=None,
+                            help='Guardar los errores de fila en este CSV')
+
+    def handle(self, *args, **options):
+        ruta = Path(options['archivo'])
+        if not ruta.is_file():
+            raise CommandError(f'No existe el archivo {ruta}')
+
+        usuario = None
+        if options['usuario']:
+            usuario = User.objects.filter(username=options['usuario']).first()
+            if usuario is None:
+                raise CommandError(f'No existe el usuario {options["usuario"]}')
+
+        inicio = time.perf_counter()
+        try:
+            with ruta.open('rb') as archivo:
+                resultado = importar(archivo, ruta.name, usuario=usuario, tamano=options['lote'])
+        except ErrorImportacion as e:
+            raise CommandError(str(e))
+        segundos = time.perf_counter() - inicio
+
+        for error in resultado['errores'][:20]:
+            self.stdout.write(self.style.WARNING(
+                f'  fila {error["fila"]}: {error["campo"] or "-"}: {error["error"]}'
+            ))
+        if options['errores'] and resultado['errores']:
+            with open(options['errores'], 'w', newline='', encoding='utf-8') as salida:
+                escritor = csv.DictWriter(salida, fieldnames=['fila', 'campo', 'error'])
+                escritor.writeheader()
+                escritor.writerows(resultado['errores'])
+
+        self.stdout.write(self.style.SUCCESS(
+            f'{resultado["filas"]} filas en {segundos:.1f} s: {resultado["creados"]} creados, '
+            f'{resultado["actualizados"]} actualizados, {resultado["sin_cambios"]} sin cambios, '
+            f'{resultado["total_errores"]} con errores'
+        ))
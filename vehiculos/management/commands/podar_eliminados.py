@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from vehiculos.cambios import podar_eliminados
+
+
+class Command(BaseCommand):
+    help = 'Borra las marcas de eliminación del feed de cambios más antiguas que VEHICULOS_CAMBIOS_RETENCION_DIAS'
+
+    def handle(self, *args, **options):
+        borradas = podar_eliminados()
+        self.stdout.write(self.style.SUCCESS(f'Marcas de eliminación borradas: {borradas}'))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from vehiculos.indicadores import recalcular_indicadores
+
+
+class Command(BaseCommand):
+    help = 'Recalcula duración, facturación por entrega y rendimiento (p. ej. tras cargas con SQL directo)'
+
+    def handle(self, *args, **options):
+        filas = recalcular_indicadores()
+        self.stdout.write(self.style.SUCCESS(f'Indicadores recalculados: {filas} vehículos'))
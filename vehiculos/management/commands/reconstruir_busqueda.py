@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from vehiculos.busqueda import reconstruir_fts
+
+
+class Command(BaseCommand):
+    help = 'Reconstruye y optimiza el índice FTS5 de cliente y observación'
+
+    def handle(self, *args, **options):
+        if not reconstruir_fts():
+            raise CommandError('La búsqueda FTS5 solo está disponible con SQLite')
+        self.stdout.write(self.style.SUCCESS('Índice de búsqueda reconstruido'))
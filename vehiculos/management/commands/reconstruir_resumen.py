@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from vehiculos.resumen import reconstruir_resumen
+
+
+class Command(BaseCommand):
+    help = 'Reconstruye desde cero el resumen diario de KPIs a partir de Vehiculo'
+
+    def handle(self, *args, **options):
+        filas = reconstruir_resumen()
+        self.stdout.write(self.style.SUCCESS(f'Resumen diario reconstruido: {filas} filas'))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from vehiculos.placas import reconstruir_trigramas
+
+
+class Command(BaseCommand):
+    help = 'Reconstruye el índice de trigramas de placas (elimina placas que ya no existen)'
+
+    def handle(self, *args, **options):
+        filas = reconstruir_trigramas()
+        self.stdout.write(self.style.SUCCESS(f'Índice de trigramas reconstruido: {filas} filas'))
@@ -0,0 +1,253 @@
+"""
+Métricas por vista en formato de texto de Prometheus (``/metrics``).
+
+``MetricasMiddleware`` mide cada petición: latencia, consultas SQL, tiempo
+en base de datos y bytes de la respuesta, etiquetados por el nombre de la
+ruta (``exportar_datos``, ``api_real_time_stats``...). Las consultas se
+cuentan con un ``execute_wrapper`` que se instala en cada conexión al
+crearla y que solo actúa mientras el hilo está atendiendo una petición.
+
+Los contadores viven en memoria del proceso y se comparten entre hilos bajo
+un lock; con varios procesos (gunicorn) cada uno expone los suyos y
+Prometheus los agrega.
+
+Las respuestas en streaming (exportaciones) se miden al terminar de enviarse,
+no al devolver la cabecera, para que la latencia y las consultas incluyan la
+generación del archivo.
+
+Con ``VEHICULOS_METRICAS_LENTO_MS`` se registra en el logger
+``vehiculos.metricas`` cada petición más lenta que ese umbral, con su SQL.
+"""
+import logging
+import threading
+import time
+from bisect import bisect_left
+from collections import defaultdict
+
+from django.conf import settings
+
+from .cache_datos import estadisticas_cache
+
+
+logger = logging.getLogger(__name__)
+
+# Límites superiores de los buckets de los histogramas
+BUCKETS_LATENCIA = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+BUCKETS_CONSULTAS = (1, 2, 3, 5, 10, 20, 50, 100, 500)
+BUCKETS_BYTES = (1024, 10 * 1024, 100 * 1024, 1024 ** 2, 10 * 1024 ** 2, 100 * 1024 ** 2)
+
+# Consultas guardadas por petición para el log de peticiones lentas
+MAX_SQL_LENTO = 50
+
+_local = threading.local()
+
+
+class Histograma:
+    __slots__ = ('limites', 'cuentas', 'suma', 'total')
+
+    def __init__(self, limites):
+        self.limites = limites
+        self.cuentas = [0] * len(limites)
+        self.suma = 0
+        self.total = 0
+
+    def observar(self, valor):
+        indice = bisect_left(self.limites, valor)
+        if indice < len(self.cuentas):
+            self.cuentas[indice] += 1
+        self.suma += valor
+        self.total += 1
+
+
+class Registro:
+    """Contadores de todas las vistas del proceso"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reiniciar()
+
+    def reiniciar(self):
+        with self._lock:
+            self.peticiones = defaultdict(int)
+            self.latencia = defaultdict(lambda: Histograma(BUCKETS_LATENCIA))
+            self.consultas = defaultdict(lambda: Histograma(BUCKETS_CONSULTAS))
+            self.bytes = defaultdict(lambda: Histograma(BUCKETS_BYTES))
+            self.segundos_db = defaultdict(float)
+
+    def registrar(self, vista, metodo, codigo, medicion):
+        with self._lock:
+            self.peticiones[(vista, metodo, str(codigo))] += 1
+            self.latencia[(vista,)].observar(medicion.duracion)
+            self.consultas[(vista,)].observar(medicion.consultas)
+            self.bytes[(vista,)].observar(medicion.bytes)
+            self.segundos_db[(vista,)] += medicion.segundos_db
+
+    def exposicion(self):
+        """Texto de exposición de Prometheus con el estado actual"""
+        lineas = []
+        with self._lock:
+            _contador(lineas, 'vehiculos_peticiones_total', 'Peticiones atendidas',
+                      ('vista', 'metodo', 'codigo'), self.peticiones)
+            _histograma(lineas, 'vehiculos_peticion_duracion_segundos',
+                        'Latencia de la petición (hasta el último byte)', self.latencia)
+            _histograma(lineas, 'vehiculos_peticion_consultas',
+                        'Consultas SQL por petición', self.consultas)
+            _histograma(lineas, 'vehiculos_respuesta_bytes',
+                        'Tamaño del cuerpo de la respuesta', self.bytes)
+            _contador(lineas, 'vehiculos_db_segundos_total',
+                      'Tiempo acumulado en consultas SQL', ('vista',), self.segundos_db)
+
+        cache = estadisticas_cache()
+        _contador(lineas, 'vehiculos_cache_aciertos_total', 'Aciertos de la caché de resultados',
+                  (), {(): cache['aciertos']})
+        _contador(lineas, 'vehiculos_cache_fallos_total', 'Fallos de la caché de resultados',
+                  (), {(): cache['fallos']})
+        lineas.append('# HELP vehiculos_cache_tasa_aciertos Tasa de aciertos de la caché de resultados')
+        lineas.append('# TYPE vehiculos_cache_tasa_aciertos gauge')
+        lineas.append(f'vehiculos_cache_tasa_aciertos {cache["tasa_aciertos"]}')
+        return '\n'.join(lineas) + '\n'
+
+
+registro = Registro()
+
+
+def _escapar(valor):
+    return str(valor).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _etiquetas(nombres, valores, extra=''):
+    pares = [f'{nombre}="{_escapar(valor)}"' for nombre, valor in zip(nombres, valores)]
+    if extra:
+        pares.append(extra)
+    return '{' + ','.join(pares) + '}' if pares else ''
+
+
+def _contador(lineas, nombre, ayuda, etiquetas, valores):
+    lineas.append(f'# HELP {nombre} {ayuda}')
+    lineas.append(f'# TYPE {nombre} counter')
+    for clave, valor in sorted(valores.items()):
+        lineas.append(f'{nombre}{_etiquetas(etiquetas, clave)} {valor}')
+
+
+def _histograma(lineas, nombre, ayuda, histogramas):
+    lineas.append(f'# HELP {nombre} {ayuda}')
+    lineas.append(f'# TYPE {nombre} histogram')
+    for clave, histograma in sorted(histogramas.items()):
+        acumulado = 0
+        for limite, cuenta in zip(histograma.limites, histograma.cuentas):
+            acumulado += cuenta
+            bucket = _etiquetas(('vista',), clave, 'le="%s"' % limite)
+            lineas.append(f'{nombre}_bucket{bucket} {acumulado}')
+        bucket = _etiquetas(('vista',), clave, 'le="+Inf"')
+        lineas.append(f'{nombre}_bucket{bucket} {histograma.total}')
+        lineas.append(f'{nombre}_sum{_etiquetas(("vista",), clave)} {histograma.suma}')
+        lineas.append(f'{nombre}_count{_etiquetas(("vista",), clave)} {histograma.total}')
+
+
+class Medicion:
+    """Datos de una petición en curso"""
+    __slots__ = ('inicio', 'duracion', 'consultas', 'segundos_db', 'bytes', 'sql')
+
+    def __init__(self, capturar_sql=False):
+        self.inicio = time.perf_counter()
+        self.duracion = 0
+        self.consultas = 0
+        self.segundos_db = 0.0
+        self.bytes = 0
+        self.sql = [] if capturar_sql else None
+
+
+def contar_consulta(execute, sql, params, many, context):
+    """``execute_wrapper`` que suma la consulta a la medición activa del hilo"""
+    medicion = getattr(_local, 'medicion', None)
+    if medicion is None:
+        return execute(sql, params, many, context)
+    inicio = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        duracion = time.perf_counter() - inicio
+        medicion.consultas += 1
+        medicion.segundos_db += duracion
+        if medicion.sql is not None and len(medicion.sql) < MAX_SQL_LENTO:
+            medicion.sql.append((duracion, sql))
+
+
+def instalar_contador(sender, connection, **kwargs):
+    """Receptor de ``connection_created``: añade el contador a la nueva conexión"""
+    if contar_consulta not in connection.execute_wrappers:
+        connection.execute_wrappers.append(contar_consulta)
+
+
+def umbral_lento():
+    """Umbral del log de peticiones lentas en segundos, o None si está desactivado"""
+    umbral = getattr(settings, 'VEHICULOS_METRICAS_LENTO_MS', None)
+    return umbral / 1000 if umbral is not None else None
+
+
+class MetricasMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        umbral = umbral_lento()
+        medicion = Medicion(capturar_sql=umbral is not None)
+        _local.medicion = medicion
+        try:
+            response = self.get_response(request)
+        finally:
+            _local.medicion = None
+
+        # Los eventos SSE no terminan: se miden hasta la cabecera
+        if (response.streaming and not response.has_header('Content-Length')
+                and response.get('Content-Type') != 'text/event-stream'):
+            medir = self._medir_flujo_asincrono if response.is_async else self._medir_flujo
+            response.streaming_content = medir(request, response, medicion, umbral, response.streaming_content)
+        else:
+            if not response.streaming:
+                medicion.bytes = len(response.content)
+            elif response.has_header('Content-Length'):
+                # Archivos ya generados (FileResponse): se conserva el envío directo del servidor
+                medicion.bytes = int(response['Content-Length'])
+            self._finalizar(request, response, medicion, umbral)
+        return response
+
+    def _medir_flujo(self, request, response, medicion, umbral, contenido):
+        # Los bloques se generan (y consultan) en el hilo que envía la respuesta
+        iterador = iter(contenido)
+        try:
+            while True:
+                _local.medicion = medicion
+                try:
+                    bloque = next(iterador)
+                except StopIteration:
+                    break
+                finally:
+                    _local.medicion = None
+                medicion.bytes += len(bloque)
+                yield bloque
+        finally:
+            self._finalizar(request, response, medicion, umbral)
+
+    async def _medir_flujo_asincrono(self, request, response, medicion, umbral, contenido):
+        # Bajo ASGI los bloques se generan en otro hilo: se miden bytes y
+        # duración, pero las consultas solo cuentan hasta la cabecera
+        try:
+            async for bloque in contenido:
+                medicion.bytes += len(bloque)
+                yield bloque
+        finally:
+            self._finalizar(request, response, medicion, umbral)
+
+    def _finalizar(self, request, response, medicion, umbral):
+        medicion.duracion = time.perf_counter() - medicion.inicio
+        coincidencia = request.resolver_match
+        vista = coincidencia.view_name if coincidencia else 'sin_ruta'
+        registro.registrar(vista, request.method, response.status_code, medicion)
+        if umbral is not None and medicion.duracion >= umbral:
+            logger.warning(
+                'Petición lenta %s %s (%s): %.3f s, %d consultas, %.3f s en base de datos\n%s',
+                request.method, request.path, vista, medicion.duracion, medicion.consultas,
+                medicion.segundos_db,
+                '\n'.join(f'  {duracion * 1000:.1f} ms  {sql}' for duracion, sql in medicion.sql),
+            )
@@ -0,0 +1,74 @@
+# Generated by Django 4.2.7 on 2026-10-18 10:28
+
+from django.db import migrations, models
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncDate
+
+
+def poblar_resumen(apps, schema_editor):
+    """Construir el resumen diario a partir de los vehículos existentes"""
+    Vehiculo = apps.get_model('vehiculos', 'Vehiculo')
+    ResumenDiario = apps.get_model('vehiculos', 'ResumenDiario')
+    grupos = (
+        Vehiculo.objects.order_by()
+        .annotate(dia=TruncDate('fecha_inicio'))
+        .values('dia', 'tipo_vehiculo', 'validado', 'cliente')
+        .annotate(
+            total_vehiculos=Count('pk'),
+            total_entregas=Sum('numero_entregas'),
+            total_facturacion=Sum('facturacion'),
+        )
+    )
+    ResumenDiario.objects.bulk_create(
+        (ResumenDiario(**grupo) for grupo in grupos.iterator()),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vehiculos', '0003_add_full_stack_fields'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResumenDiario',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('dia', models.DateField(help_text='Día local de fecha_inicio')),
+                ('tipo_vehiculo', models.CharField(choices=[('Turbo', 'Turbo'), ('Sencillo', 'Sencillo'), ('Eléctrico', 'Eléctrico')], max_length=20)),
+                ('validado', models.BooleanField()),
+                ('cliente', models.CharField(max_length=100)),
+                ('total_vehiculos', models.IntegerField(default=0)),
+                ('total_entregas', models.BigIntegerField(default=0)),
+                ('total_facturacion', models.DecimalField(decimal_places=2, default=0, max_digits=16)),
+            ],
+            options={
+                'verbose_name': 'Resumen Diario',
+                'verbose_name_plural': 'Resúmenes Diarios',
+                'ordering': ['-dia'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='vehiculo',
+            index=models.Index(fields=['placa'], name='vehiculos_v_placa_4999e1_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='vehiculo',
+            index=models.Index(fields=['fecha_inicio'], name='vehiculos_v_fecha_i_ebb243_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='vehiculo',
+            index=models.Index(fields=['validado'], name='vehiculos_v_validad_b06e51_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='vehiculo',
+            index=models.Index(fields=['tipo_vehiculo'], name='vehiculos_v_tipo_ve_b61faa_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='resumendiario',
+            constraint=models.UniqueConstraint(fields=('dia', 'tipo_vehiculo', 'validado', 'cliente'), name='resumen_diario_unico'),
+        ),
+        migrations.RunPython(poblar_resumen, migrations.RunPython.noop),
+    ]
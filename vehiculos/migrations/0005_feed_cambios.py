@@ -0,0 +1,31 @@
+# Generated by Django 4.2.7 on 2026-10-18 10:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vehiculos', '0004_resumen_diario'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VehiculoEliminado',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('vehiculo_id', models.BigIntegerField()),
+                ('codigo', models.CharField(max_length=50)),
+                ('eliminado_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name': 'Vehículo Eliminado',
+                'verbose_name_plural': 'Vehículos Eliminados',
+                'ordering': ['id'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='vehiculo',
+            index=models.Index(fields=['updated_at', 'id'], name='vehiculos_v_updated_34b829_idx'),
+        ),
+    ]
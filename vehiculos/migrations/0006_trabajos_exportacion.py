@@ -0,0 +1,39 @@
+# Generated by Django 4.2.7 on 2026-10-18 10:32
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('vehiculos', '0005_feed_cambios'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TrabajoExportacion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('formato', models.CharField(choices=[('csv', 'CSV'), ('excel', 'Excel'), ('parquet', 'Parquet'), ('arrow', 'Arrow IPC')], max_length=10)),
+                ('filtros', models.JSONField(blank=True, default=dict)),
+                ('estado', models.CharField(choices=[('pendiente', 'Pendiente'), ('en_proceso', 'En Proceso'), ('completado', 'Completado'), ('error', 'Error')], default='pendiente', max_length=20)),
+                ('total_filas', models.IntegerField(blank=True, null=True)),
+                ('filas_procesadas', models.IntegerField(default=0)),
+                ('archivo', models.CharField(blank=True, max_length=255)),
+                ('error', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('iniciado_at', models.DateTimeField(blank=True, null=True)),
+                ('finalizado_at', models.DateTimeField(blank=True, null=True)),
+                ('usuario', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='trabajos_exportacion', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Trabajo de Exportación',
+                'verbose_name_plural': 'Trabajos de Exportación',
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['usuario', 'estado'], name='vehiculos_t_usuario_16d400_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 4.2.7 on 2026-10-18 10:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vehiculos', '0006_trabajos_exportacion'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='vehiculo',
+            name='vehiculos_v_validad_b06e51_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='vehiculo',
+            name='vehiculos_v_tipo_ve_b61faa_idx',
+        ),
+        migrations.AddIndex(
+            model_name='vehiculo',
+            index=models.Index(fields=['validado', 'fecha_inicio'], name='vehiculos_v_validad_7a1a83_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='vehiculo',
+            index=models.Index(fields=['tipo_vehiculo', 'fecha_inicio'], name='vehiculos_v_tipo_ve_31db1c_idx'),
+        ),
+    ]
@@ -0,0 +1,62 @@
+# Generated by Django 4.2.7 on 2026-10-18 10:40
+
+from django.db import migrations, models
+from django.db.models import F
+
+from vehiculos.placas import normalizar_placa_sql, trigramas
+
+
+def poblar_placas(apps, schema_editor):
+    """Normalizar las placas existentes en un UPDATE y llenar el índice de trigramas"""
+    Vehiculo = apps.get_model('vehiculos', 'Vehiculo')
+    PlacaTrigrama = apps.get_model('vehiculos', 'PlacaTrigrama')
+    Vehiculo.objects.update(placa_normalizada=normalizar_placa_sql(F('placa')))
+    placas = Vehiculo.objects.order_by().values_list('placa_normalizada', flat=True).distinct()
+    PlacaTrigrama.objects.bulk_create(
+        (
+            PlacaTrigrama(trigrama=trigrama, placa=placa)
+            for placa in placas.iterator()
+            for trigrama in trigramas(placa)
+        ),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vehiculos', '0007_indices_compuestos'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PlacaTrigrama',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('trigrama', models.CharField(max_length=3)),
+                ('placa', models.CharField(max_length=20)),
+            ],
+            options={
+                'verbose_name': 'Trigrama de Placa',
+                'verbose_name_plural': 'Trigramas de Placas',
+            },
+        ),
+        migrations.RemoveIndex(
+            model_name='vehiculo',
+            name='vehiculos_v_placa_4999e1_idx',
+        ),
+        migrations.AddField(
+            model_name='vehiculo',
+            name='placa_normalizada',
+            field=models.CharField(default='', editable=False, max_length=20),
+        ),
+        migrations.RunPython(poblar_placas, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='vehiculo',
+            index=models.Index(fields=['placa_normalizada'], name='vehiculos_v_placa_n_4550a2_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='placatrigrama',
+            constraint=models.UniqueConstraint(fields=('trigrama', 'placa'), name='placa_trigrama_unico'),
+        ),
+    ]
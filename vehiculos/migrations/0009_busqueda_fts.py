@@ -0,0 +1,66 @@
+# Generated by Django 4.2.7 on 2026-10-18 10:45
+
+from django.db import migrations
+
+
+TABLA = 'vehiculos_vehiculo_fts'
+
+SQL_CREAR = [
+    f"""
+    CREATE VIRTUAL TABLE {TABLA} USING fts5(
+        observacion, cliente,
+        content='vehiculos_vehiculo', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+    )
+    """,
+    f"INSERT INTO {TABLA}({TABLA}, rank) VALUES ('rank', 'bm25(1.0, 2.0)')",
+    f"""
+    CREATE TRIGGER vehiculos_vehiculo_fts_ai AFTER INSERT ON vehiculos_vehiculo BEGIN
+        INSERT INTO {TABLA}(rowid, observacion, cliente)
+        VALUES (new.id, new.observacion, new.cliente);
+    END
+    """,
+    f"""
+    CREATE TRIGGER vehiculos_vehiculo_fts_ad AFTER DELETE ON vehiculos_vehiculo BEGIN
+        INSERT INTO {TABLA}({TABLA}, rowid, observacion, cliente)
+        VALUES ('delete', old.id, old.observacion, old.cliente);
+    END
+    """,
+    f"""
+    CREATE TRIGGER vehiculos_vehiculo_fts_au AFTER UPDATE OF observacion, cliente ON vehiculos_vehiculo BEGIN
+        INSERT INTO {TABLA}({TABLA}, rowid, observacion, cliente)
+        VALUES ('delete', old.id, old.observacion, old.cliente);
+        INSERT INTO {TABLA}(rowid, observacion, cliente)
+        VALUES (new.id, new.observacion, new.cliente);
+    END
+    """,
+    f"INSERT INTO {TABLA}({TABLA}) VALUES ('rebuild')",
+]
+
+SQL_ELIMINAR = [
+    'DROP TRIGGER IF EXISTS vehiculos_vehiculo_fts_ai',
+    'DROP TRIGGER IF EXISTS vehiculos_vehiculo_fts_ad',
+    'DROP TRIGGER IF EXISTS vehiculos_vehiculo_fts_au',
+    f'DROP TABLE IF EXISTS {TABLA}',
+]
+
+
+def ejecutar(sentencias):
+    """Ejecutar las sentencias solo en SQLite; en otros motores se usa icontains"""
+    def operacion(apps, schema_editor):
+        if schema_editor.connection.vendor != 'sqlite':
+            return
+        for sql in sentencias:
+            schema_editor.execute(sql)
+    return operacion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vehiculos', '0008_placa_normalizada'),
+    ]
+
+    operations = [
+        migrations.RunPython(ejecutar(SQL_CREAR), ejecutar(SQL_ELIMINAR)),
+    ]
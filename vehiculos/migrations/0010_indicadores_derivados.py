@@ -0,0 +1,62 @@
+# Generated by Django 4.2.7 on 2026-10-18 11:07
+
+from django.db import migrations, models
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncDate
+
+from vehiculos.indicadores import expresiones_indicadores
+
+
+def poblar_indicadores(apps, schema_editor):
+    """Calcular los indicadores existentes en un UPDATE y las horas del resumen diario"""
+    Vehiculo = apps.get_model('vehiculos', 'Vehiculo')
+    ResumenDiario = apps.get_model('vehiculos', 'ResumenDiario')
+    Vehiculo.objects.update(**expresiones_indicadores())
+    grupos = (
+        Vehiculo.objects.order_by()
+        .annotate(dia=TruncDate('fecha_inicio'))
+        .values('dia', 'tipo_vehiculo', 'validado', 'cliente')
+        .annotate(
+            total_vehiculos=Count('pk'),
+            total_entregas=Sum('numero_entregas'),
+            total_facturacion=Sum('facturacion'),
+            total_horas=Sum('duracion_horas'),
+        )
+    )
+    ResumenDiario.objects.all().delete()
+    ResumenDiario.objects.bulk_create((ResumenDiario(**grupo) for grupo in grupos.iterator()), batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vehiculos', '0009_busqueda_fts'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='resumendiario',
+            name='total_horas',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=14),
+        ),
+        migrations.AddField(
+            model_name='vehiculo',
+            name='duracion_horas',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, help_text='Duración del viaje en horas', max_digits=8),
+        ),
+        migrations.AddField(
+            model_name='vehiculo',
+            name='facturacion_por_entrega',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, help_text='Facturación por entrega', max_digits=12),
+        ),
+        migrations.AlterField(
+            model_name='vehiculo',
+            name='rendimiento',
+            field=models.DecimalField(decimal_places=2, default=0.0, editable=False, help_text='Índice de rendimiento (entregas/hora)', max_digits=10),
+        ),
+        migrations.AddIndex(
+            model_name='vehiculo',
+            index=models.Index(fields=['rendimiento', 'fecha_inicio'], name='vehiculos_v_rendimi_4d3f67_idx'),
+        ),
+        migrations.RunPython(poblar_indicadores, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,64 @@
+# Generated by Django 4.2.7 on 2026-10-18 11:13
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+TRIGGER_ANTERIOR = """
+    CREATE TRIGGER vehiculos_vehiculo_fts_au AFTER UPDATE OF observacion, cliente ON vehiculos_vehiculo BEGIN
+        INSERT INTO vehiculos_vehiculo_fts(vehiculos_vehiculo_fts, rowid, observacion, cliente)
+        VALUES ('delete', old.id, old.observacion, old.cliente);
+        INSERT INTO vehiculos_vehiculo_fts(rowid, observacion, cliente)
+        VALUES (new.id, new.observacion, new.cliente);
+    END
+"""
+# Solo reindexar cuando el texto cambia: los upserts de la importación
+# reescriben observacion y cliente aunque sean iguales
+TRIGGER_NUEVO = """
+    CREATE TRIGGER vehiculos_vehiculo_fts_au AFTER UPDATE OF observacion, cliente ON vehiculos_vehiculo
+    WHEN old.observacion IS NOT new.observacion OR old.cliente IS NOT new.cliente BEGIN
+        INSERT INTO vehiculos_vehiculo_fts(vehiculos_vehiculo_fts, rowid, observacion, cliente)
+        VALUES ('delete', old.id, old.observacion, old.cliente);
+        INSERT INTO vehiculos_vehiculo_fts(rowid, observacion, cliente)
+        VALUES (new.id, new.observacion, new.cliente);
+    END
+"""
+
+
+def renombrar_duplicados(apps, schema_editor):
+    """Conservar el código del vehículo más antiguo y añadir el id a los repetidos"""
+    Vehiculo = apps.get_model('vehiculos', 'Vehiculo')
+    repetidos = (
+        Vehiculo.objects.order_by().values('codigo')
+        .annotate(total=Count('id')).filter(total__gt=1).values_list('codigo', flat=True)
+    )
+    for codigo in list(repetidos):
+        ids = Vehiculo.objects.filter(codigo=codigo).order_by('id').values_list('id', flat=True)
+        for vehiculo_id in list(ids)[1:]:
+            Vehiculo.objects.filter(id=vehiculo_id).update(codigo=f'{codigo[:38]}-{vehiculo_id}')
+
+
+def reemplazar_trigger(sql):
+    """Recrear el trigger FTS de UPDATE (solo SQLite; ``post_migrate`` restaura el resto)"""
+    def operacion(apps, schema_editor):
+        if schema_editor.connection.vendor != 'sqlite':
+            return
+        schema_editor.execute('DROP TRIGGER IF EXISTS vehiculos_vehiculo_fts_au')
+        schema_editor.execute(sql)
+    return operacion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vehiculos', '0010_indicadores_derivados'),
+    ]
+
+    operations = [
+        migrations.RunPython(renombrar_duplicados, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='vehiculo',
+            constraint=models.UniqueConstraint(fields=('codigo',), name='vehiculo_codigo_unico'),
+        ),
+        migrations.RunPython(reemplazar_trigger(TRIGGER_NUEVO), reemplazar_trigger(TRIGGER_ANTERIOR)),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 4.2.7 on 2026-10-18 12:24
+
+import time
+
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def crear_fila(apps, schema_editor):
+    """Fila única del contador; basada en el reloj para superar las versiones ya usadas en caché"""
+    VersionDatos = apps.get_model('vehiculos', 'VersionDatos')
+    VersionDatos.objects.get_or_create(pk=1, defaults={
+        'version': time.time_ns() // 1000,
+        'modificacion': timezone.now().replace(microsecond=0),
+    })
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vehiculos', '0011_importacion'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VersionDatos',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('version', models.BigIntegerField()),
+                ('modificacion', models.DateTimeField()),
+            ],
+            options={
+                'verbose_name': 'Versión de Datos',
+                'verbose_name_plural': 'Versión de Datos',
+            },
+        ),
+        migrations.RunPython(crear_fila, migrations.RunPython.noop),
+    ]
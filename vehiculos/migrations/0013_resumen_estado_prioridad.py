@@ -0,0 +1,53 @@
+# Generated by Django 4.2.7 on 2026-10-18 12:46
+
+from django.db import migrations, models
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncDate
+
+
+def reconstruir_resumen(apps, schema_editor):
+    """Repartir el resumen diario existente por estado y prioridad"""
+    Vehiculo = apps.get_model('vehiculos', 'Vehiculo')
+    ResumenDiario = apps.get_model('vehiculos', 'ResumenDiario')
+    grupos = (
+        Vehiculo.objects.order_by()
+        .annotate(dia=TruncDate('fecha_inicio'))
+        .values('dia', 'tipo_vehiculo', 'validado', 'cliente', 'estado', 'prioridad')
+        .annotate(
+            total_vehiculos=Count('pk'),
+            total_entregas=Sum('numero_entregas'),
+            total_facturacion=Sum('facturacion'),
+            total_horas=Sum('duracion_horas'),
+        )
+    )
+    ResumenDiario.objects.all().delete()
+    ResumenDiario.objects.bulk_create((ResumenDiario(**grupo) for grupo in grupos.iterator()), batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vehiculos', '0012_version_datos'),
+    ]
+
+    operations = [
+        migrations.RemoveConstraint(
+            model_name='resumendiario',
+            name='resumen_diario_unico',
+        ),
+        migrations.AddField(
+            model_name='resumendiario',
+            name='estado',
+            field=models.CharField(choices=[('activo', 'Activo'), ('mantenimiento', 'En Mantenimiento'), ('inactivo', 'Inactivo')], default='activo', max_length=20),
+        ),
+        migrations.AddField(
+            model_name='resumendiario',
+            name='prioridad',
+            field=models.IntegerField(choices=[(1, 'Baja'), (2, 'Media'), (3, 'Alta')], default=1),
+        ),
+        migrations.RunPython(reconstruir_resumen, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='resumendiario',
+            constraint=models.UniqueConstraint(fields=('dia', 'tipo_vehiculo', 'validado', 'cliente', 'estado', 'prioridad'), name='resumen_diario_unico'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.7 on 2026-10-18 12:53
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vehiculos', '0013_resumen_estado_prioridad'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='versiondatos',
+            name='modificacion',
+        ),
+    ]
@@ -1,7 +1,75 @@
-from django.db import models
+from django.db import models, transaction
 from django.core.validators import MaxLengthValidator
 from django.utils import timezone
 
+from . import cache_datos
+from .indicadores import CAMPOS_INDICADORES, CAMPOS_ORIGEN, calcular_indicadores, expresiones_indicadores
+from .placas import normalizar_placa, normalizar_placa_sql, registrar_placas
+
+
+class VehiculoQuerySet(models.QuerySet):
+    def update(self, **kwargs):
+        """UPDATE masivo que además mantiene el resumen diario e invalida la caché de resultados"""
+        from . import resumen  # resumen importa este módulo
+
+        placa = kwargs.get('placa')
+        if placa is not None:
+            # La placa normalizada se mantiene en la misma sentencia
+            kwargs['placa_normalizada'] = (
+                normalizar_placa(placa) if isinstance(placa, str) else normalizar_placa_sql(placa)
+            )
+        origen = {campo: kwargs[campo] for campo in CAMPOS_ORIGEN if campo in kwargs}
+        if origen:
+            # Indicadores derivados recalculados en la misma sentencia
+            kwargs.update(expresiones_indicadores(origen))
+        with transaction.atomic(using=self.db):
+            # auto_now solo actúa en save(): sin esto el feed de cambios no vería el
+            # UPDATE. Se sella con el bloqueo de escritura ya tomado (BEGIN IMMEDIATE):
+            # la espera del busy_timeout no debe quedar por detrás del margen del feed
+            kwargs.setdefault('updated_at', timezone.now())
+            actualizar_resumen = resumen.preparar_actualizacion(self, kwargs)
+            filas = super().update(**kwargs)
+            actualizar_resumen()
+        if isinstance(placa, str):
+            registrar_placas([kwargs['placa_normalizada']])
+        cache_datos.invalidar()
+        return filas
+    
+    def bulk_create(self, objs, *args, **kwargs):
+        from . import resumen
+
+        objs = list(objs)
+        for obj in objs:
+            obj.placa_normalizada = normalizar_placa(obj.placa)
+            obj.calcular_indicadores()
+        conflictos = kwargs.get('ignore_conflicts') or kwargs.get('update_conflicts')
+        with transaction.atomic(using=self.db):
+            actualizar_resumen = resumen.preparar_insercion(self, objs, conflictos)
+            creados = super().bulk_create(objs, *args, **kwargs)
+            actualizar_resumen()
+        registrar_placas(obj.placa_normalizada for obj in objs)
+        cache_datos.invalidar()
+        return creados
+    
+    def bulk_update(self, objs, fields, *args, **kwargs):
+        objs = list(objs)
+        fields = list(fields)
+        if 'placa' in fields:
+            for obj in objs:
+                obj.placa_normalizada = normalizar_placa(obj.placa)
+            if 'placa_normalizada' not in fields:
+                fields.append('placa_normalizada')
+        if set(fields) & set(CAMPOS_ORIGEN):
+            for obj in objs:
+                obj.calcular_indicadores()
+            fields += [campo for campo in CAMPOS_INDICADORES if campo not in fields]
+        # El resumen lo mantiene el update() con el que Django aplica cada lote
+        filas = super().bulk_update(objs, fields, *args, **kwargs)
+        if 'placa' in fields:
+            registrar_placas(obj.placa_normalizada for obj in objs)
+        cache_datos.invalidar()
+        return filas
+
 
 class Vehiculo(models.Model):
     TIPO_VEHICULO_CHOICES = [
@@ -9,9 +77,20 @@ class Vehiculo(models.Model):
         ('Sencillo', 'Sencillo'),
         ('Eléctrico', 'Eléctrico'),
     ]
+    PRIORIDAD_CHOICES = [
+        (1, 'Baja'),
+        (2, 'Media'),
+        (3, 'Alta'),
+    ]
+    ESTADO_CHOICES = [
+        ('activo', 'Activo'),
+        ('mantenimiento', 'En Mantenimiento'),
+        ('inactivo', 'Inactivo'),
+    ]
     
     codigo = models.CharField(max_length=50)
     placa = models.CharField(max_length=20)
+    placa_normalizada = models.CharField(max_length=20, editable=False, default='')
     tipo_vehiculo = models.CharField(max_length=20, choices=TIPO_VEHICULO_CHOICES)
     fecha_inicio = models.DateTimeField()
     fecha_fin = models.DateTimeField()
@@ -40,63 +119,221 @@ class Vehiculo(models.Model):
     )
     prioridad = models.IntegerField(
         default=1,
-        choices=[
-            (1, 'Baja'),
-            (2, 'Media'),
-            (3, 'Alta'),
-        ],
+        choices=PRIORIDAD_CHOICES,
         help_text='Prioridad del vehículo para procesamiento'
     )
     estado = models.CharField(
         max_length=20,
-        choices=[
-            ('activo', 'Activo'),
-            ('mantenimiento', 'En Mantenimiento'),
-            ('inactivo', 'Inactivo'),
-        ],
+        choices=ESTADO_CHOICES,
         default='activo',
         help_text='Estado actual del vehículo'
     )
+    # Indicadores derivados (ver vehiculos.indicadores), calculados al guardar
+    duracion_horas = models.DecimalField(
+        max_digits=8,
+        decimal_places=2,
+        default=0,
+        editable=False,
+        help_text='Duración del viaje en horas'
+    )
+    facturacion_por_entrega = models.DecimalField(
+        max_digits=12,
+        decimal_places=2,
+        default=0,
+        editable=False,
+        help_text='Facturación por entrega'
+    )
     rendimiento = models.DecimalField(
-        max_digits=5,
+        max_digits=10,
         decimal_places=2,
         default=0.00,
+        editable=False,
         help_text='Índice de rendimiento (entregas/hora)'
     )
     
+    objects = VehiculoQuerySet.as_manager()
+    
     class Meta:
         ordering = ['-fecha_inicio']
         verbose_name = 'Vehículo'
         verbose_name_plural = 'Vehículos'
         indexes = [
-            models.Index(fields=['placa']),
+            models.Index(fields=['placa_normalizada']),
             models.Index(fields=['fecha_inicio']),
-            models.Index(fields=['validado']),
-            models.Index(fields=['tipo_vehiculo']),
+            # Combinaciones reales de filtros: igualdad + rango de fechas.
+            # También cubren los filtros solo por validado / tipo_vehiculo.
+            models.Index(fields=['validado', 'fecha_inicio']),
+            models.Index(fields=['tipo_vehiculo', 'fecha_inicio']),
+            models.Index(fields=['updated_at', 'id']),
+            # Rankings de rendimiento (peores/mejores viajes de un periodo)
+            models.Index(fields=['rendimiento', 'fecha_inicio']),
+        ]
+        constraints = [
+            # Clave natural de los archivos de despacho (upsert en la importación)
+            models.UniqueConstraint(fields=['codigo'], name='vehiculo_codigo_unico'),
         ]
     
     def __str__(self):
         return f"{self.placa} - {self.codigo}"
     
-    @property
-    def duracion_horas(self):
-        """Calcular duración en horas"""
-        if self.fecha_fin and self.fecha_inicio:
-            delta = self.fecha_fin - self.fecha_inicio
-            return round(delta.total_seconds() / 3600, 2)
-        return 0
+    def save(self, *args, **kwargs):
+        normalizada = normalizar_placa(self.placa)
+        self._placa_nueva = self._state.adding or normalizada != self.placa_normalizada
+        self.placa_normalizada = normalizada
+        self.calcular_indicadores()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            update_fields = set(update_fields)
+            if 'placa' in update_fields:
+                update_fields.add('placa_normalizada')
+            if update_fields & set(CAMPOS_ORIGEN):
+                update_fields.update(CAMPOS_INDICADORES)
+            kwargs['update_fields'] = update_fields
+        super().save(*args, **kwargs)
+    
+    def calcular_indicadores(self):
+        """Actualizar duración, facturación por entrega y rendimiento"""
+        indicadores = calcular_indicadores(
+            self.fecha_inicio, self.fecha_fin, self.numero_entregas, self.facturacion
+        )
+        for campo, valor in indicadores.items():
+            setattr(self, campo, valor)
     
     @property
     def eficiencia(self):
-        """Calcular eficiencia (entregas/hora)"""
-        duracion = self.duracion_horas
-        if duracion > 0:
-            return round(self.numero_entregas / duracion, 2)
-        return 0
+        """Entregas por hora (alias de ``rendimiento``)"""
+        return self.rendimiento
+
+
+class VehiculoEliminado(models.Model):
+    """Marca (tombstone) de un vehículo eliminado para el feed de cambios"""
+    vehiculo_id = models.BigIntegerField()
+    codigo = models.CharField(max_length=50)
+    eliminado_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        ordering = ['id']
+        verbose_name = 'Vehículo Eliminado'
+        verbose_name_plural = 'Vehículos Eliminados'
+    
+    def __str__(self):
+        return f"{self.codigo} ({self.vehiculo_id})"
+
+
+class VersionDatos(models.Model):
+    """
+    Contador global de versión de los datos (una sola fila, ver ``vehiculos.cache_datos``).
+
+    Vive en la base de datos para que todos los procesos compartan la misma
+    versión; la caché solo guarda una copia para leerla sin consultas.
+    """
+    version = models.BigIntegerField()
+    
+    class Meta:
+        verbose_name = 'Versión de Datos'
+        verbose_name_plural = 'Versión de Datos'
+    
+    def __str__(self):
+        return f"v{self.version}"
+
+
+class ResumenDiario(models.Model):
+    """
+    Acumulado diario de KPIs por tipo de vehículo, validación, cliente, estado
+    y prioridad.
+
+    Se mantiene de forma incremental (ver ``vehiculos.resumen``) para que las
+    estadísticas del tablero cuesten O(días) en lugar de O(filas).
+    """
+    dia = models.DateField(help_text='Día local de fecha_inicio')
+    tipo_vehiculo = models.CharField(max_length=20, choices=Vehiculo.TIPO_VEHICULO_CHOICES)
+    validado = models.BooleanField()
+    cliente = models.CharField(max_length=100)
+    estado = models.CharField(max_length=20, choices=Vehiculo.ESTADO_CHOICES, default='activo')
+    prioridad = models.IntegerField(choices=Vehiculo.PRIORIDAD_CHOICES, default=1)
+    total_vehiculos = models.IntegerField(default=0)
+    total_entregas = models.BigIntegerField(default=0)
+    total_facturacion = models.DecimalField(max_digits=16, decimal_places=2, default=0)
+    total_horas = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    
+    class Meta:
+        ordering = ['-dia']
+        verbose_name = 'Resumen Diario'
+        verbose_name_plural = 'Resúmenes Diarios'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['dia', 'tipo_vehiculo', 'validado', 'cliente', 'estado', 'prioridad'],
+                name='resumen_diario_unico',
+            ),
+        ]
+    
+    def __str__(self):
+        return f"{self.dia} - {self.tipo_vehiculo} - {self.cliente}"
+
+
+class TrabajoExportacion(models.Model):
+    """Exportación ejecutada en segundo plano fuera del ciclo de la petición"""
+    FORMATO_CHOICES = [
+        ('csv', 'CSV'),
+        ('excel', 'Excel'),
+        ('parquet', 'Parquet'),
+        ('arrow', 'Arrow IPC'),
+    ]
+    ESTADO_CHOICES = [
+        ('pendiente', 'Pendiente'),
+        ('en_proceso', 'En Proceso'),
+        ('completado', 'Completado'),
+        ('error', 'Error'),
+    ]
+    
+    usuario = models.ForeignKey(
+        'auth.User',
+        on_delete=models.CASCADE,
+        related_name='trabajos_exportacion'
+    )
+    formato = models.CharField(max_length=10, choices=FORMATO_CHOICES)
+    filtros = models.JSONField(default=dict, blank=True)
+    estado = models.CharField(max_length=20, choices=ESTADO_CHOICES, default='pendiente')
+    total_filas = models.IntegerField(null=True, blank=True)
+    filas_procesadas = models.IntegerField(default=0)
+    archivo = models.CharField(max_length=255, blank=True)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    iniciado_at = models.DateTimeField(null=True, blank=True)
+    finalizado_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        ordering = ['-created_at']
+        verbose_name = 'Trabajo de Exportación'
+        verbose_name_plural = 'Trabajos de Exportación'
+        indexes = [
+            models.Index(fields=['usuario', 'estado']),
+        ]
+    
+    def __str__(self):
+        return f"{self.get_formato_display()} #{self.pk} - {self.estado}"
     
     @property
-    def facturacion_por_entrega(self):
-        """Calcular facturación por entrega"""
-        if self.numero_entregas > 0:
-            return round(float(self.facturacion) / self.numero_entregas, 2)
+    def progreso(self):
+        """Porcentaje de avance de la exportación"""
+        if self.estado == 'completado':
+            return 100
+        if self.total_filas:
+            return round(self.filas_procesadas / self.total_filas * 100, 1)
         return 0
+
+
+class PlacaTrigrama(models.Model):
+    """Índice de trigramas de las placas distintas para búsquedas por contenido"""
+    trigrama = models.CharField(max_length=3)
+    placa = models.CharField(max_length=20)
+    
+    class Meta:
+        verbose_name = 'Trigrama de Placa'
+        verbose_name_plural = 'Trigramas de Placas'
+        constraints = [
+            models.UniqueConstraint(fields=['trigrama', 'placa'], name='placa_trigrama_unico'),
+        ]
+    
+    def __str__(self):
+        return f"{self.trigrama} → {self.placa}"
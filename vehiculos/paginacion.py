@@ -0,0 +1,184 @@
+"""
+Paginación por cursor (keyset) para listados de vehículos.
+
+En lugar de OFFSET, cada página se obtiene con una condición sobre la
+última fila vista ``(campo, id)``, por lo que el costo de una página no
+depende de su profundidad. El cursor viaja en la URL como un token opaco.
+"""
+import base64
+import datetime
+import decimal
+import json
+
+from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db.models import Q
+
+
+SIGUIENTE = 'n'
+ANTERIOR = 'p'
+
+
+class CursorInvalido(ValueError):
+    pass
+
+
+def tamano_pagina(valor=None):
+    """Normalizar el tamaño de página solicitado según la configuración"""
+    por_defecto = getattr(settings, 'VEHICULOS_PAGINA_TAMANO', 50)
+    maximo = getattr(settings, 'VEHICULOS_PAGINA_MAXIMO', 500)
+    try:
+        tamano = int(valor) if valor else por_defecto
+    except (TypeError, ValueError):
+        tamano = por_defecto
+    return max(1, min(tamano, maximo))
+
+
+def _serializar_valor(valor):
+    # isoformat conserva los microsegundos; DjangoJSONEncoder los trunca
+    if isinstance(valor, (datetime.datetime, datetime.date)):
+        return valor.isoformat()
+    if isinstance(valor, decimal.Decimal):
+        return str(valor)
+    raise TypeError(f'Tipo de cursor no soportado: {type(valor).__name__}')
+
+
+def codificar_token(datos):
+    """Serializar una estructura JSON como token opaco seguro para URL"""
+    crudo = json.dumps(datos, default=_serializar_valor, separators=(',', ':'))
+    return base64.urlsafe_b64encode(crudo.encode()).decode().rstrip('=')
+
+
+def decodificar_token(token):
+    """Inverso de ``codificar_token``; lanza ``ValueError`` si el token es inválido"""
+    relleno = '=' * (-len(token) % 4)
+    return json.loads(base64.urlsafe_b64decode(token + relleno))
+
+
+def codificar_cursor(direccion, orden, valor, pk):
+    """Serializar una posición ``(valor, pk)`` del orden ``orden`` (p. ej. ``-fecha_inicio``) como token"""
+    return codificar_token([direccion, orden, valor, pk])
+
+
+def decodificar_cursor(token, campo, orden):
+    """
+    Recuperar ``(direccion, valor, pk)`` de un token; ``None`` si no hay token.
+
+    Un token alterado o emitido para otro campo o sentido de orden lanza
+    ``CursorInvalido`` en lugar de volver en silencio a la primera página o
+    saltarse filas.
+    """
+    if not token:
+        return None
+    try:
+        direccion, orden_token, valor, pk = decodificar_token(token)
+        if direccion not in (SIGUIENTE, ANTERIOR) or valor is None:
+            raise ValueError(f'dirección {direccion!r}')
+        if orden_token != orden:
+            raise ValueError(f'emitido para el orden {orden_token!r}, no {orden!r}')
+        return direccion, campo.to_python(valor), int(pk)
+    except (ValueError, TypeError, ValidationError) as e:
+        raise CursorInvalido(f'Cursor no válido: {e}')
+
+
+class Pagina:
+    """Resultado de una consulta paginada por cursor"""
+
+    def __init__(self, objetos, cursor_siguiente, cursor_anterior, tamano):
+        self.objetos = objetos
+        self.cursor_siguiente = cursor_siguiente
+        self.cursor_anterior = cursor_anterior
+        self.tamano = tamano
+
+    def __iter__(self):
+        return iter(self.objetos)
+
+    def __len__(self):
+        return len(self.objetos)
+
+    @property
+    def tiene_siguiente(self):
+        return self.cursor_siguiente is not None
+
+    @property
+    def tiene_anterior(self):
+        return self.cursor_anterior is not None
+
+
+class PaginadorKeyset:
+    """
+    Paginador por cursor sobre el orden ``(campo, id)``.
+
+    El ``id`` desempata filas con el mismo valor de ``campo`` para que el
+    orden sea total y los cursores sean estables aunque lleguen filas nuevas.
+    """
+
+    def __init__(self, queryset, campo='fecha_inicio', descendente=True, tamano=None):
+        self.queryset = queryset
+        self.campo = campo
+        self.descendente = descendente
+        self.tamano = tamano_pagina(tamano)
+        try:
+            self.field = queryset.model._meta.get_field(campo)
+        except FieldDoesNotExist:
+            raise ValueError(f'Campo de paginación no válido: {campo}')
+
+    @property
+    def orden(self):
+        """Orden en la notación de ``order_by`` (``-campo`` si es descendente)"""
+        return f'-{self.campo}' if self.descendente else self.campo
+
+    def _orden(self, invertido=False):
+        descendente = self.descendente != invertido
+        prefijo = '-' if descendente else ''
+        return [f'{prefijo}{self.campo}', f'{prefijo}pk']
+
+    def _despues_de(self, valor, pk, invertido=False):
+        """Condición para las filas que siguen a ``(valor, pk)`` en el orden dado"""
+        operador = 'lt' if self.descendente != invertido else 'gt'
+        return (
+            Q(**{f'{self.campo}__{operador}': valor})
+            | Q(**{self.campo: valor, f'pk__{operador}': pk})
+        )
+
+    def _cursor(self, direccion, objeto):
+        # Las filas pueden ser instancias o diccionarios de ``values()`` que incluyan campo e id
+        if isinstance(objeto, dict):
+            return codificar_cursor(direccion, self.orden, objeto[self.campo], objeto['id'])
+        return codificar_cursor(direccion, self.orden, getattr(objeto, self.campo), objeto.pk)
+
+    def pagina(self, token=None):
+        """Obtener la página indicada por ``token`` (o la primera)"""
+        cursor = decodificar_cursor(token, self.field, self.orden)
+
+        if cursor is None:
+            filas = list(self.queryset.order_by(*self._orden())[:self.tamano + 1])
+            hay_mas = len(filas) > self.tamano
+            filas = filas[:self.tamano]
+            siguiente = self._cursor(SIGUIENTE, filas[-1]) if hay_mas else None
+            return Pagina(filas, siguiente, None, self.tamano)
+
+        direccion, valor, pk = cursor
+
+        if direccion == SIGUIENTE:
+            filas = list(
+                self.queryset.filter(self._despues_de(valor, pk))
+                .order_by(*self._orden())[:self.tamano + 1]
+            )
+            hay_mas = len(filas) > self.tamano
+            filas = filas[:self.tamano]
+            siguiente = self._cursor(SIGUIENTE, filas[-1]) if hay_mas else None
+            anterior = self._cursor(ANTERIOR, filas[0]) if filas else None
+            return Pagina(filas, siguiente, anterior, self.tamano)
+
+        # Hacia atrás: se recorre en orden inverso y se restaura el orden al final
+        filas = list(
+            self.queryset.filter(self._despues_de(valor, pk, invertido=True))
+            .order_by(*self._orden(invertido=True))[:self.tamano + 1]
+        )
+        hay_mas = len(filas) > self.tamano
+        filas = filas[:self.tamano]
+        filas.reverse()
+        anterior = self._cursor(ANTERIOR, filas[0]) if hay_mas else None
+        siguiente = self._cursor(SIGUIENTE, filas[-1]) if filas else None
+        return Pagina(filas, siguiente, anterior, self.tamano)
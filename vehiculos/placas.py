@@ -0,0 +1,110 @@
+"""
+Búsqueda indexada de placas.
+
+``placa__icontains`` compila a ``LIKE '%...%'`` y obliga a recorrer toda la
+tabla. En su lugar se busca sobre ``placa_normalizada`` (mayúsculas, sin
+espacios ni guiones), que tiene índice propio:
+
+* Prefijo: un rango ``[texto, sucesor(texto))`` sobre el índice. Se usa
+  solo cuando el texto tiene forma de comienzo de placa colombiana (tres
+  letras, luego hasta dos dígitos y un último carácter: ``ABC``, ``ABC1``,
+  ``ABC12D``): en las placas de la flota (``ABC123``, ``ABC12D``)
+  esas letras solo pueden aparecer al inicio, así que equivale a buscar por
+  contenido.
+* Trigramas: para cualquier otro texto de tres o más caracteres, la tabla
+  ``PlacaTrigrama`` (trigrama -> placa distinta) reduce la búsqueda a las
+  placas que contienen todos los trigramas del texto. Así las placas en
+  otros formatos (no se validan al escribirse) se encuentran por contenido.
+* Con textos más cortos, o con los trigramas desactivados, se recurre a
+  ``contains`` sobre la columna normalizada.
+"""
+import re
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Value
+from django.db.models.functions import Replace, Upper
+
+
+# Comienzo de una placa colombiana normalizada (automóviles ABC123, motocicletas ABC12D)
+PATRON_PREFIJO = re.compile(r'^[A-Z]{3}(?:[0-9](?:[0-9][0-9A-Z]?)?)?$')
+
+
+def normalizar_placa(valor):
+    """Placa en mayúsculas y sin espacios ni guiones"""
+    return (valor or '').upper().replace(' ', '').replace('-', '')
+
+
+def normalizar_placa_sql(expresion):
+    """Expresión SQL equivalente a ``normalizar_placa`` (para UPDATEs masivos)"""
+    return Upper(Replace(Replace(expresion, Value(' '), Value('')), Value('-'), Value('')))
+
+
+def trigramas_activos():
+    return getattr(settings, 'VEHICULOS_PLACA_TRIGRAMAS', True)
+
+
+def trigramas(placa):
+    """Trigramas de una placa ya normalizada"""
+    return {placa[i:i + 3] for i in range(len(placa) - 2)}
+
+
+def sucesor(prefijo):
+    """Menor cadena mayor que todas las que empiezan por ``prefijo``"""
+    return prefijo[:-1] + chr(ord(prefijo[-1]) + 1)
+
+
+def registrar_placas(placas):
+    """Añadir al índice de trigramas las placas normalizadas indicadas"""
+    if not trigramas_activos():
+        return
+    from .models import PlacaTrigrama
+
+    filas = [
+        PlacaTrigrama(trigrama=trigrama, placa=placa)
+        for placa in set(placas)
+        for trigrama in trigramas(placa)
+    ]
+    PlacaTrigrama.objects.bulk_create(filas, batch_size=500, ignore_conflicts=True)
+
+
+def reconstruir_trigramas():
+    """Recalcular el índice de trigramas a partir de las placas existentes"""
+    from .models import PlacaTrigrama, Vehiculo
+
+    with transaction.atomic():
+        PlacaTrigrama.objects.all().delete()
+        placas = (
+            Vehiculo.objects.order_by()
+            .values_list('placa_normalizada', flat=True)
+            .distinct()
+            .iterator(chunk_size=2000)
+        )
+        registrar_placas(placas)
+    return PlacaTrigrama.objects.count()
+
+
+def filtrar_por_placa(queryset, texto):
+    """Filtrar por placa eligiendo el camino indexado que admita el texto"""
+    from .models import PlacaTrigrama
+
+    texto = normalizar_placa(texto)
+    if not texto:
+        return queryset
+
+    if PATRON_PREFIJO.match(texto):
+        return queryset.filter(placa_normalizada__gte=texto, placa_normalizada__lt=sucesor(texto))
+
+    if len(texto) >= 3 and trigramas_activos():
+        buscados = trigramas(texto)
+        candidatas = (
+            PlacaTrigrama.objects.filter(trigrama__in=buscados)
+            .values('placa')
+            .annotate(coincidencias=Count('trigrama'))
+            .filter(coincidencias=len(buscados))
+            .values('placa')
+        )
+        # Los trigramas solo preseleccionan; contains confirma sobre pocas filas
+        return queryset.filter(placa_normalizada__in=candidatas, placa_normalizada__contains=texto)
+
+    return queryset.filter(placa_normalizada__contains=texto)
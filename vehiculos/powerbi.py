@@ -0,0 +1,169 @@
+"""
+Volcado completo de vehículos para Power BI (comando ``exportar_powerbi``).
+
+La tabla se lee por trozos de ``VEHICULOS_POWERBI_LOTE`` filas como columnas
+de pandas (``analitica.trozos_columnas``). ``Día``/``Mes``/``Año`` se derivan
+de forma vectorizada en hora local y cada trozo se escribe al archivo de
+destino antes de leer el siguiente, así que la memoria no depende del número
+de filas. Las estadísticas del resumen se acumulan con un ``groupby`` por
+trozo.
+"""
+import os
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from django.conf import settings
+from django.utils import timezone
+from openpyxl import Workbook
+
+from .analitica import trozos_columnas
+from .exportacion import CAMPOS_EXPORTACION, COLUMNAS_EXPORTACION, agregar_hojas, esquema_arrow
+from .models import Vehiculo
+
+
+COLUMNAS_POWERBI = COLUMNAS_EXPORTACION + ['Día', 'Mes', 'Año']
+COLUMNAS_DECIMALES = ['Facturación', 'Duración (h)', 'Facturación por Entrega', 'Rendimiento']
+
+EXTENSIONES = {'.csv': 'csv', '.xlsx': 'xlsx', '.parquet': 'parquet'}
+
+
+def tamano_lote():
+    return getattr(settings, 'VEHICULOS_POWERBI_LOTE', 50000)
+
+
+def trozos(queryset, tamano=None):
+    """DataFrames con las columnas de ``COLUMNAS_POWERBI``; fechas en UTC y decimales como float"""
+    zona = timezone.get_current_timezone()
+    for tabla in trozos_columnas(queryset, list(CAMPOS_EXPORTACION), tamano or tamano_lote()):
+        tabla.columns = COLUMNAS_EXPORTACION
+        tabla['Fecha Inicio'] = tabla['Fecha Inicio'].dt.floor('s')
+        tabla['Fecha Fin'] = tabla['Fecha Fin'].dt.floor('s')
+        local = tabla['Fecha Inicio'].dt.tz_convert(zona).dt.tz_localize(None).to_numpy()
+        tabla['Día'] = local.astype('datetime64[D]')
+        tabla['Mes'] = np.datetime_as_string(local.astype('datetime64[M]'))
+        tabla['Año'] = tabla['Día'].dt.year
+        yield tabla
+
+
+def _escribir_csv(tablas, ruta):
+    with open(ruta, 'w', newline='', encoding='utf-8') as archivo:
+        for numero, tabla in enumerate(tablas):
+            # Mismo formato que la exportación CSV de la aplicación: hora UTC sin zona, Sí/No.
+            # Los decimales se redondean en lugar de usar float_format, que formatea valor a valor
+            tabla = tabla.assign(**{
+                'Fecha Inicio': tabla['Fecha Inicio'].dt.tz_localize(None),
+                'Fecha Fin': tabla['Fecha Fin'].dt.tz_localize(None),
+                'Validado': np.where(tabla['Validado'], 'Sí', 'No'),
+                **{columna: tabla[columna].round(2) for columna in COLUMNAS_DECIMALES},
+            })
+            tabla.to_csv(archivo, header=numero == 0, index=False, lineterminator='\r\n')
+
+
+def _filas_xlsx(tablas):
+    for tabla in tablas:
+        columnas = [tabla[columna] for columna in COLUMNAS_POWERBI]
+        for i, columna in enumerate(columnas):
+            if columna.dtype.kind == 'M':
+                # Excel no admite zonas horarias: se escribe la hora UTC, igual que en el CSV
+                if columna.dt.tz is not None:
+                    columna = columna.dt.tz_localize(None)
+                unidad = 'D' if COLUMNAS_POWERBI[i] == 'Día' else 'us'
+                columnas[i] = columna.to_numpy().astype(f'datetime64[{unidad}]').tolist()
+            elif COLUMNAS_POWERBI[i] == 'Validado':
+                columnas[i] = np.where(columna, 'Sí', 'No').tolist()
+            else:
+                columnas[i] = columna.tolist()
+        yield from zip(*columnas)
+
+
+def _escribir_xlsx(tablas, ruta):
+    libro = Workbook(write_only=True)
+    agregar_hojas(libro, COLUMNAS_POWERBI, _filas_xlsx(tablas))
+    libro.save(ruta)
+
+
+def _escribir_parquet(tablas, ruta):
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.parquet as pq
+
+    esquema = esquema_arrow()
+    with pq.ParquetWriter(ruta, esquema, compression='zstd') as writer:
+        for tabla in tablas:
+            arrays = []
+            for campo in esquema:
+                array = pa.array(tabla[campo.name], from_pandas=True)
+                if campo.name in COLUMNAS_DECIMALES:
+                    array = pc.round(array, 2).cast(campo.type, safe=False)
+                elif pa.types.is_dictionary(campo.type):
+                    array = array.dictionary_encode()
+                else:
+                    array = array.cast(campo.type)
+                arrays.append(array)
+            writer.write_batch(pa.record_batch(arrays, schema=esquema))
+
+
+ESCRITORES = {
+    'csv': _escribir_csv,
+    'xlsx': _escribir_xlsx,
+    'parquet': _escribir_parquet,
+}
+
+
+def formato_de(ruta):
+    """Formato según la extensión de ``ruta`` (None si no se reconoce)"""
+    return EXTENSIONES.get(Path(ruta).suffix.lower())
+
+
+def _acumular(tablas, parciales):
+    for tabla in tablas:
+        parciales.append(tabla.groupby(['Día', 'Tipo Vehículo', 'Validado']).agg(
+            viajes=('Código', 'size'),
+            entregas=('Número Entregas', 'sum'),
+            facturacion=('Facturación', 'sum'),
+        ))
+        # Los parciales se combinan a medida que llegan para no crecer con el número de trozos
+        if len(parciales) > 1:
+            parciales[:] = [pd.concat(parciales).groupby(level=[0, 1, 2]).sum()]
+        yield tabla
+
+
+def _resumen(parciales, dias=10):
+    if not parciales:
+        return {'total': 0, 'validados': 0, 'entregas': 0, 'facturacion': 0.0, 'por_tipo': {}, 'ultimos_dias': {}}
+    agregado = parciales[0]
+    total = int(agregado['viajes'].sum())
+    por_dia = agregado['viajes'].groupby(level='Día').sum().sort_index().tail(dias)
+    return {
+        'total': total,
+        'validados': int(agregado['viajes'][agregado.index.get_level_values('Validado')].sum()),
+        'entregas': int(agregado['entregas'].sum()),
+        'facturacion': round(float(agregado['facturacion'].sum()), 2),
+        'por_tipo': {tipo: int(n) for tipo, n in agregado['viajes'].groupby(level='Tipo Vehículo').sum().items()},
+        'ultimos_dias': {dia.date(): int(n) for dia, n in por_dia.items()},
+    }
+
+
+def exportar(destino, formato=None, queryset=None, tamano=None):
+    """
+    Escribir todos los vehículos (o ``queryset``) en ``destino`` y devolver el resumen.
+
+    El archivo se genera como ``<destino>.parcial`` y se renombra al terminar,
+    de modo que un volcado interrumpido nunca deja un archivo a medias con el
+    nombre final.
+    """
+    formato = formato or formato_de(destino)
+    if formato not in ESCRITORES:
+        raise ValueError(f'Formato no soportado: {formato} (se admiten {", ".join(ESCRITORES)})')
+    if queryset is None:
+        queryset = Vehiculo.objects.all()
+
+    parcial = Path(f'{destino}.parcial')
+    parciales = []
+    try:
+        ESCRITORES[formato](_acumular(trozos(queryset.order_by('id'), tamano), parciales), parcial)
+        os.replace(parcial, destino)
+    finally:
+        parcial.unlink(missing_ok=True)
+    return _resumen(parciales)
@@ -0,0 +1,370 @@
+"""
+Mantenimiento incremental del resumen diario (``ResumenDiario``).
+
+Cada vehículo aporta a una sola fila del resumen, identificada por
+``(día local de fecha_inicio, tipo_vehiculo, validado, cliente, estado,
+prioridad)``. Las
+altas, bajas y modificaciones se traducen en deltas sobre esa fila:
+``save()``/``delete()`` por señales y ``update()``/``bulk_create()``
+desde ``VehiculoQuerySet`` (``bulk_update()`` pasa por ``update()``). Las
+escrituras con SQL directo deben usar ``registrar_vehiculos``/
+``aplicar_deltas`` o, en último caso, ``reconstruir_resumen``.
+"""
+from collections import defaultdict
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .filtros import q_dias, q_rango_dias
+from .models import ResumenDiario, Vehiculo
+
+
+CAMPOS_CLAVE = ('dia', 'tipo_vehiculo', 'validado', 'cliente', 'estado', 'prioridad')
+CAMPOS_TOTALES = ('total_vehiculos', 'total_entregas', 'total_facturacion', 'total_horas')
+CAMPOS_VEHICULO = ('fecha_inicio', 'tipo_vehiculo', 'validado', 'cliente', 'estado', 'prioridad',
+                   'numero_entregas', 'facturacion', 'duracion_horas')
+# Campos de la clave que un UPDATE puede cambiar sin alterar los totales del grupo
+CAMPOS_TRASLADO = ('tipo_vehiculo', 'validado', 'cliente', 'estado', 'prioridad')
+
+
+def clave_resumen(datos):
+    """Clave del resumen para un vehículo expresado como dict de ``CAMPOS_VEHICULO``"""
+    return (
+        timezone.localdate(datos['fecha_inicio']),
+        datos['tipo_vehiculo'],
+        bool(datos['validado']),
+        datos['cliente'],
+        datos['estado'],
+        int(datos['prioridad']),
+    )
+
+
+def datos_vehiculo(vehiculo):
+    """Extraer de una instancia los campos que afectan al resumen"""
+    return {campo: getattr(vehiculo, campo) for campo in CAMPOS_VEHICULO}
+
+
+def aplicar_delta(clave, vehiculos, entregas, facturacion, horas=0):
+    """Sumar (o restar) los valores indicados a la fila del resumen ``clave``"""
+    if not vehiculos and not entregas and not facturacion and not horas:
+        return
+
+    filtro = dict(zip(CAMPOS_CLAVE, clave))
+    facturacion = Decimal(str(facturacion))
+    horas = Decimal(str(horas))
+
+    with transaction.atomic():
+        actualizadas = ResumenDiario.objects.filter(**filtro).update(
+            total_vehiculos=F('total_vehiculos') + vehiculos,
+            total_entregas=F('total_entregas') + entregas,
+            total_facturacion=F('total_facturacion') + facturacion,
+            total_horas=F('total_horas') + horas,
+        )
+        if actualizadas:
+            if vehiculos < 0:
+                ResumenDiario.objects.filter(**filtro, total_vehiculos__lte=0).delete()
+            return
+        if vehiculos <= 0:
+            return
+        try:
+            with transaction.atomic():
+                ResumenDiario.objects.create(
+                    total_vehiculos=vehiculos,
+                    total_entregas=entregas,
+                    total_facturacion=facturacion,
+                    total_horas=horas,
+                    **filtro,
+                )
+        except IntegrityError:
+            # Otro proceso creó la fila entre el UPDATE y el INSERT
+            ResumenDiario.objects.filter(**filtro).update(
+                total_vehiculos=F('total_vehiculos') + vehiculos,
+                total_entregas=F('total_entregas') + entregas,
+                total_facturacion=F('total_facturacion') + facturacion,
+                total_horas=F('total_horas') + horas,
+            )
+
+
+def acumular_deltas(vehiculos, signo=1, deltas=None):
+    """Sumar a ``deltas`` (clave -> [vehículos, entregas, facturación, horas]) los de un lote"""
+    if deltas is None:
+        deltas = defaultdict(lambda: [0, 0, Decimal('0'), Decimal('0')])
+    for vehiculo in vehiculos:
+        datos = vehiculo if isinstance(vehiculo, dict) else datos_vehiculo(vehiculo)
+        delta = deltas[clave_resumen(datos)]
+        delta[0] += signo
+        delta[1] += signo * int(datos['numero_entregas'])
+        delta[2] += signo * Decimal(str(datos['facturacion']))
+        delta[3] += signo * Decimal(str(datos['duracion_horas'] or 0))
+    return deltas
+
+
+def _sql_sumar():
+    """Upsert que suma los deltas a la fila de la clave (o la crea)"""
+    tabla = connection.ops.quote_name(ResumenDiario._meta.db_table)
+    claves = ', '.join(map(connection.ops.quote_name, CAMPOS_CLAVE))
+    totales = [connection.ops.quote_name(campo) for campo in CAMPOS_TOTALES]
+    sumas = ', '.join(f'{total} = {tabla}.{total} + EXCLUDED.{total}' for total in totales)
+    return (
+        f'INSERT INTO {tabla} ({claves}, {", ".join(totales)}) '
+        f'VALUES ({", ".join(["%s"] * (len(CAMPOS_CLAVE) + len(totales)))}) '
+        f'ON CONFLICT ({claves}) DO UPDATE SET {sumas}'
+    )
+
+
+def aplicar_deltas(deltas):
+    """
+    Aplicar varios deltas; los nulos se omiten.
+
+    Un único upsert que suma cada delta a su fila, sin leerlas, y un DELETE
+    de las filas que quedaron vacías: el número de consultas no depende del
+    número de claves. Sin ``ON CONFLICT`` se usa ``aplicar_delta`` por clave.
+    """
+    deltas = {clave: delta for clave, delta in deltas.items() if any(delta)}
+    if not deltas:
+        return
+    with transaction.atomic():
+        if connection.vendor not in ('sqlite', 'postgresql'):
+            for clave, delta in deltas.items():
+                aplicar_delta(clave, *delta)
+            return
+
+        with connection.cursor() as cursor:
+            # Fechas y decimales como texto: los adaptadores de Django por valor son lentos aquí
+            cursor.executemany(_sql_sumar(), [
+                (dia.isoformat(), *resto, vehiculos, entregas, str(facturacion), str(horas))
+                for (dia, *resto), (vehiculos, entregas, facturacion, horas) in deltas.items()
+            ])
+        dias = sorted({clave[0] for clave in deltas})
+        for i in range(0, len(dias), 500):
+            ResumenDiario.objects.filter(dia__in=dias[i:i + 500], total_vehiculos__lte=0).delete()
+
+
+def registrar_vehiculos(vehiculos, signo=1):
+    """
+    Registrar en el resumen un lote de vehículos (instancias o dicts).
+
+    Pensado para ``bulk_create``/borrados masivos: agrupa por clave y aplica
+    un solo delta por fila del resumen. Usar ``signo=-1`` para bajas.
+    """
+    aplicar_deltas(acumular_deltas(vehiculos, signo))
+
+
+def _agrupar(queryset):
+    """Agregar un queryset de vehículos por la clave del resumen (día local)"""
+    return (
+        queryset.order_by()
+        .annotate(dia=TruncDate('fecha_inicio'))
+        .values(*CAMPOS_CLAVE)
+        .annotate(
+            total_vehiculos=Count('pk'),
+            total_entregas=Sum('numero_entregas'),
+            total_facturacion=Sum('facturacion'),
+            total_horas=Sum('duracion_horas'),
+        )
+    )
+
+
+def _dias(queryset):
+    """Días locales (``fecha_inicio``) con vehículos en ``queryset``"""
+    return set(
+        queryset.order_by().annotate(dia=TruncDate('fecha_inicio'))
+        .values_list('dia', flat=True).distinct()
+    )
+
+
+def _leer(ids):
+    """Campos del resumen de los vehículos ``ids``, en lotes"""
+    for i in range(0, len(ids), 500):
+        yield from Vehiculo.objects.filter(pk__in=ids[i:i + 500]).values(*CAMPOS_VEHICULO)
+
+
+def deltas_traslado(queryset, valores):
+    """
+    Deltas de ``queryset.update(**valores)`` cuando solo cambian campos de ``CAMPOS_TRASLADO``.
+
+    Cada grupo se resta de su fila y se suma a la fila con los valores nuevos,
+    sin releer los vehículos. Debe llamarse antes del UPDATE y dentro de la
+    misma transacción, ya que lee el estado actual de las filas.
+    """
+    valores = dict(valores)
+    if 'validado' in valores:
+        valores['validado'] = bool(valores['validado'])
+    if 'prioridad' in valores:
+        valores['prioridad'] = int(valores['prioridad'])
+    deltas = defaultdict(lambda: [0, 0, Decimal('0'), Decimal('0')])
+    for grupo in _agrupar(queryset):
+        clave = tuple(grupo[campo] for campo in CAMPOS_CLAVE)
+        nueva = tuple(valores.get(campo, grupo[campo]) for campo in CAMPOS_CLAVE)
+        for destino, signo in ((clave, -1), (nueva, 1)):
+            delta = deltas[destino]
+            delta[0] += signo * grupo['total_vehiculos']
+            delta[1] += signo * (grupo['total_entregas'] or 0)
+            delta[2] += signo * (grupo['total_facturacion'] or 0)
+            delta[3] += signo * (grupo['total_horas'] or 0)
+    return deltas
+
+
+def preparar_actualizacion(queryset, valores):
+    """
+    Mantener el resumen ante ``queryset.update(**valores)``.
+
+    Se llama antes del UPDATE, en su misma transacción, y devuelve la función
+    que hay que llamar después de ejecutarlo:
+
+    - Si solo cambian campos de ``CAMPOS_TRASLADO`` a valores constantes
+      (p. ej. ``validado=True``), cada grupo se traslada con deltas.
+    - Si cambian otros campos del resumen se reconstruyen los días afectados
+      (todos si el queryset no tiene filtros).
+    - Si ``fecha_inicio`` cambia con una expresión (p. ej. ``bulk_update()``,
+      que actualiza con ``Case``) no se conocen los días de destino: se restan
+      los vehículos antes del UPDATE y se suman releídos después.
+    """
+    campos = set(valores) & set(CAMPOS_VEHICULO)
+    if not campos:
+        return lambda: None
+    constantes = {
+        campo: valor for campo, valor in valores.items() if not hasattr(valor, 'resolve_expression')
+    }
+    if campos <= set(CAMPOS_TRASLADO) and campos <= set(constantes):
+        deltas = deltas_traslado(queryset, constantes)
+        return lambda: aplicar_deltas(deltas)
+
+    if not queryset.query.has_filters():
+        return reconstruir_resumen
+    if 'fecha_inicio' in campos and 'fecha_inicio' not in constantes:
+        ids = list(queryset.values_list('pk', flat=True))
+        deltas = acumular_deltas(_leer(ids), signo=-1)
+        return lambda: aplicar_deltas(acumular_deltas(_leer(ids), deltas=deltas))
+    dias = _dias(queryset)
+    if 'fecha_inicio' in campos:
+        dias.add(timezone.localdate(constantes['fecha_inicio']))
+    return lambda: reconstruir_resumen(dias)
+
+
+def preparar_insercion(queryset, vehiculos, conflictos=False):
+    """
+    Mantener el resumen ante ``queryset.bulk_create(vehiculos)``.
+
+    Sin conflictos, los vehículos nuevos se suman después del INSERT. Con
+    ``ignore_conflicts``/``update_conflicts`` no se sabe qué filas se
+    insertaron, así que se reconstruyen sus días y los de las filas existentes
+    con el mismo código.
+    """
+    if not conflictos:
+        return lambda: registrar_vehiculos(vehiculos)
+    dias = {timezone.localdate(vehiculo.fecha_inicio) for vehiculo in vehiculos}
+    codigos = [vehiculo.codigo for vehiculo in vehiculos]
+    for i in range(0, len(codigos), 500):
+        dias |= _dias(queryset.filter(codigo__in=codigos[i:i + 500]))
+    return lambda: reconstruir_resumen(dias)
+
+
+def reconstruir_resumen(dias=None):
+    """Recalcular el resumen completo, o solo los ``dias`` indicados"""
+    queryset = Vehiculo.objects.all()
+    resumen = ResumenDiario.objects.all()
+    if dias is not None:
+        dias = sorted(set(dias))
+        if not dias:
+            return 0
+        queryset = queryset.filter(q_dias(dias))
+        resumen = resumen.filter(dia__in=dias)
+
+    with transaction.atomic():
+        resumen.delete()
+        filas = ResumenDiario.objects.bulk_create(
+            (ResumenDiario(**grupo) for grupo in _agrupar(queryset).iterator()),
+            batch_size=1000,
+        )
+    return len(filas)
+
+
+def indicadores_stats(total, total_entregas, total_horas):
+    """Duración media y rendimiento global (entregas por hora de viaje)"""
+    return {
+        'total_horas': total_horas,
+        'promedio_duracion_horas': round(total_horas / total, 2) if total > 0 else 0,
+        'rendimiento_promedio': round(total_entregas / total_horas, 2) if total_horas > 0 else 0,
+    }
+
+
+def admite_filtros(filtros):
+    """Indicar si los filtros pueden resolverse solo con el resumen"""
+    return not any(filtros.get(nombre) for nombre in ('placa', 'q', 'rendimiento_min', 'rendimiento_max'))
+
+
+def stats_desde_resumen(fecha_desde=None, fecha_hasta=None, validado=None):
+    """
+    Estadísticas del tablero calculadas sobre el resumen diario.
+
+    Devuelve las mismas claves que ``calculate_real_time_stats``, incluidos
+    los desgloses por tipo, estado y prioridad.
+    """
+    hoy = timezone.localdate()
+
+    resumen = ResumenDiario.objects.all()
+    vehiculos = Vehiculo.objects.all()
+    if fecha_desde:
+        resumen = resumen.filter(dia__gte=fecha_desde)
+    if fecha_hasta:
+        resumen = resumen.filter(dia__lte=fecha_hasta)
+    vehiculos = vehiculos.filter(q_rango_dias(fecha_desde, fecha_hasta))
+    if validado is not None:
+        resumen = resumen.filter(validado=validado)
+        vehiculos = vehiculos.filter(validado=validado)
+
+    agregados = {
+        'total': Sum('total_vehiculos'),
+        'validados': Sum('total_vehiculos', filter=Q(validado=True)),
+        'total_entregas': Sum('total_entregas'),
+        'total_facturacion': Sum('total_facturacion'),
+        'total_horas': Sum('total_horas'),
+        'vehiculos_hoy': Sum('total_vehiculos', filter=Q(dia=hoy)),
+        'vehiculos_ultima_semana': Sum('total_vehiculos', filter=Q(dia__gte=hoy - timedelta(days=7))),
+    }
+    desgloses = {
+        'stats_tipo': ('tipo_vehiculo', Vehiculo.TIPO_VEHICULO_CHOICES),
+        'stats_estado': ('estado', Vehiculo.ESTADO_CHOICES),
+        'stats_prioridad': ('prioridad', Vehiculo.PRIORIDAD_CHOICES),
+    }
+    for nombre, (campo, choices) in desgloses.items():
+        for indice, (valor, _) in enumerate(choices):
+            agregados[f'{nombre}_{indice}'] = Sum('total_vehiculos', filter=Q(**{campo: valor}))
+
+    resultado = resumen.aggregate(**agregados)
+
+    total = resultado['total'] or 0
+    validados = resultado['validados'] or 0
+    total_entregas = resultado['total_entregas'] or 0
+    total_facturacion = resultado['total_facturacion'] or 0
+    total_horas = resultado['total_horas'] or 0
+
+    # El máximo de fecha_inicio sale del índice sin recorrer la tabla
+    ultima = vehiculos.order_by('-fecha_inicio').values_list('fecha_inicio', flat=True).first()
+
+    return {
+        'total_vehiculos': total,
+        'vehiculos_validados': validados,
+        'vehiculos_no_validados': total - validados,
+        'porcentaje_validacion': round((validados / total * 100), 2) if total > 0 else 0,
+        'total_entregas': total_entregas,
+        'total_facturacion': total_facturacion,
+        'promedio_entregas': round(total_entregas / total, 2) if total > 0 else 0,
+        'promedio_facturacion': round(total_facturacion / total, 2) if total > 0 else 0,
+        **indicadores_stats(total, total_entregas, total_horas),
+        'ultima_actualizacion': ultima,
+        'vehiculos_hoy': resultado['vehiculos_hoy'] or 0,
+        'vehiculos_ultima_semana': resultado['vehiculos_ultima_semana'] or 0,
+        **{
+            nombre: {
+                (str(etiqueta) if campo == 'prioridad' else str(valor)).lower(): resultado[f'{nombre}_{indice}'] or 0
+                for indice, (valor, etiqueta) in enumerate(choices)
+            }
+            for nombre, (campo, choices) in desgloses.items()
+        },
+    }
@@ -0,0 +1,62 @@
+"""
+Señales que mantienen sincronizadas las estructuras derivadas de ``Vehiculo``
+"""
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from . import cache_datos, placas, resumen
+from .models import Vehiculo, VehiculoEliminado
+
+
+@receiver(pre_save, sender=Vehiculo)
+def capturar_estado_previo(sender, instance, raw=False, **kwargs):
+    """Guardar los valores previos que afectan al resumen antes de un UPDATE"""
+    instance._resumen_previo = None
+    if raw or instance.pk is None:
+        return
+    instance._resumen_previo = (
+        Vehiculo.objects.filter(pk=instance.pk)
+        .values(*resumen.CAMPOS_VEHICULO)
+        .first()
+    )
+
+
+@receiver(post_save, sender=Vehiculo)
+def actualizar_resumen(sender, instance, created, raw=False, **kwargs):
+    """Aplicar al resumen diario el cambio de un vehículo guardado"""
+    if raw:
+        return
+    nuevo = resumen.datos_vehiculo(instance)
+    previo = getattr(instance, '_resumen_previo', None)
+    if previo == nuevo:
+        return
+    if previo:
+        resumen.registrar_vehiculos([previo], signo=-1)
+    resumen.registrar_vehiculos([nuevo])
+
+
+@receiver(post_save, sender=Vehiculo)
+def indexar_placa(sender, instance, raw=False, **kwargs):
+    """Registrar los trigramas de una placa nueva o modificada"""
+    if raw or not getattr(instance, '_placa_nueva', False):
+        return
+    placas.registrar_placas([instance.placa_normalizada])
+
+
+@receiver(post_delete, sender=Vehiculo)
+def descontar_resumen(sender, instance, **kwargs):
+    """Descontar del resumen diario un vehículo eliminado"""
+    resumen.registrar_vehiculos([instance], signo=-1)
+
+
+@receiver(post_delete, sender=Vehiculo)
+def registrar_eliminacion(sender, instance, **kwargs):
+    """Dejar una marca para que el feed de cambios informe la eliminación"""
+    VehiculoEliminado.objects.create(vehiculo_id=instance.pk, codigo=instance.codigo)
+
+
+@receiver(post_save, sender=Vehiculo)
+@receiver(post_delete, sender=Vehiculo)
+def invalidar_cache(sender, **kwargs):
+    """Incrementar la versión de datos para que la caché no sirva resultados viejos"""
+    cache_datos.invalidar()
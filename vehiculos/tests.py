@@ -1,3 +1,1219 @@
-from django.test import TestCase
+import asyncio
+import csv
+import gzip
+import json
+import os
+import threading
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+from io import BytesIO, StringIO
+from itertools import count
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from time import sleep
 
-# Create your tests here.
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from asgiref.sync import sync_to_async
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.db.models import F
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from django.utils.http import http_date
+from openpyxl import load_workbook
+
+from .backends.sqlite3.base import pragmas
+from .benchmark import CASOS, CONSULTAS_SESION, ejecutar_casos
+from .cache_datos import version_datos
+from .cambios import obtener_cambios
+from .cache_exportaciones import _flujos, desalojar, flujo, obtener
+from .eventos import Difusor, difusor
+from .exportacion import COLUMNAS_EXPORTACION, bloques_csv, escribir_xlsx, esquema_arrow
+from .filtros import filtrar_vehiculos, inicio_dia, obtener_filtros
+from .generador import generar_vehiculos
+from .indicadores import recalcular_indicadores
+from .metricas import registro as registro_metricas
+from .models import ResumenDiario, TrabajoExportacion, Vehiculo, VehiculoEliminado, VersionDatos
+from .paginacion import SIGUIENTE, codificar_cursor
+from .powerbi import COLUMNAS_POWERBI
+from .resumen import reconstruir_resumen, stats_desde_resumen
+from .trabajos import ejecutar_trabajo
+from .views import calculate_real_time_stats
+
+
+_codigos = count(1)
+
+
+def cache_exportaciones_temporal(test):
+    """Apuntar la caché de exportaciones a un directorio temporal durante el test"""
+    directorio = TemporaryDirectory()
+    test.addCleanup(directorio.cleanup)
+    ajustes = override_settings(VEHICULOS_EXPORT_CACHE_DIR=directorio.name)
+    ajustes.enable()
+    test.addCleanup(ajustes.disable)
+    return Path(directorio.name)
+
+
+def crear_vehiculo(**kwargs):
+    """Crear un vehículo de prueba con valores por defecto razonables"""
+    inicio = kwargs.pop('fecha_inicio', timezone.now())
+    datos = {
+        'codigo': f'AUTO{next(_codigos):05d}',
+        'placa': 'ABC123',
+        'tipo_vehiculo': 'Turbo',
+        'fecha_inicio': inicio,
+        'fecha_fin': inicio + timedelta(hours=8),
+        'numero_entregas': 10,
+        'facturacion': Decimal('1000.00'),
+        'cliente': 'Transportes Rápidos S.A.',
+    }
+    datos.update(kwargs)
+    return Vehiculo.objects.create(**datos)
+
+
+class PaginacionKeysetTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(User.objects.create_user('lector', password='x'))
+        self.ahora = timezone.now()
+        # De dos en dos con la misma fecha de inicio: el primer corte cae entre un empate
+        for i in range(7):
+            crear_vehiculo(codigo=f'K{i}', fecha_inicio=self.ahora - timedelta(hours=i // 2))
+
+    def pagina(self, cursor=None):
+        respuesta = self.client.get('/', {'por_pagina': 3, **({'cursor': cursor} if cursor else {})})
+        self.assertEqual(respuesta.status_code, 200)
+        return respuesta.context['pagina']
+
+    def codigos(self, pagina):
+        return [vehiculo.codigo for vehiculo in pagina]
+
+    def test_siguiente_anterior_y_empates_estables(self):
+        esperado = list(Vehiculo.objects.order_by('-fecha_inicio', '-id').values_list('codigo', flat=True))
+        paginas = [self.pagina()]
+        while paginas[-1].tiene_siguiente:
+            paginas.append(self.pagina(paginas[-1].cursor_siguiente))
+        self.assertEqual([len(pagina) for pagina in paginas], [3, 3, 1])
+        self.assertEqual(sum((self.codigos(pagina) for pagina in paginas), []), esperado)
+        self.assertFalse(paginas[0].tiene_anterior)
+
+        anterior = self.pagina(paginas[2].cursor_anterior)
+        self.assertEqual(self.codigos(anterior), self.codigos(paginas[1]))
+        primera = self.pagina(anterior.cursor_anterior)
+        self.assertEqual(self.codigos(primera), self.codigos(paginas[0]))
+        self.assertFalse(primera.tiene_anterior)
+
+        # Las filas nuevas no desplazan las páginas ya recorridas
+        with self.captureOnCommitCallbacks(execute=True):
+            crear_vehiculo(codigo='NUEVO', fecha_inicio=self.ahora + timedelta(hours=1))
+        self.assertEqual(self.codigos(self.pagina(paginas[0].cursor_siguiente)), self.codigos(paginas[1]))
+        self.assertEqual(self.codigos(self.pagina())[0], 'NUEVO')
+
+    def test_cursor_alterado(self):
+        cursor = self.pagina().cursor_siguiente
+        alterados = [
+            cursor[:-4] + 'AAAA',
+            'no-es-un-cursor',
+            codificar_cursor('x', '-fecha_inicio', self.ahora, 1),
+            codificar_cursor(SIGUIENTE, '-fecha_inicio', 'ayer', 1),
+            # Otro campo u otro sentido de orden
+            codificar_cursor(SIGUIENTE, 'fecha_inicio', self.ahora, 1),
+            codificar_cursor(SIGUIENTE, '-rendimiento', '1.50', 1),
+        ]
+        for alterado in alterados:
+            with self.subTest(alterado):
+                self.assertEqual(self.client.get('/', {'cursor': alterado}).status_code, 400)
+                respuesta = self.client.get('/api/vehiculos/', {'cursor': alterado})
+                self.assertEqual(respuesta.status_code, 400)
+                self.assertFalse(respuesta.json()['success'])
+
+
+class RealTimeStatsTests(TestCase):
+    def setUp(self):
+        ahora = timezone.now()
+        crear_vehiculo(tipo_vehiculo='Turbo', validado=True, numero_entregas=20,
+                       facturacion=Decimal('2000.00'), estado='activo', prioridad=3)
+        crear_vehiculo(tipo_vehiculo='Sencillo', numero_entregas=10,
+                       estado='mantenimiento', fecha_inicio=ahora - timedelta(days=3))
+        crear_vehiculo(tipo_vehiculo='Eléctrico', numero_entregas=6, facturacion=Decimal('500.50'),
+                       estado='inactivo', prioridad=2, fecha_inicio=ahora - timedelta(days=30))
+
+    def test_una_sola_consulta(self):
+        with self.assertNumQueries(1):
+            calculate_real_time_stats(Vehiculo.objects.all())
+
+    def test_valores(self):
+        stats = calculate_real_time_stats(Vehiculo.objects.all())
+        self.assertEqual(stats['total_vehiculos'], 3)
+        self.assertEqual(stats['vehiculos_validados'], 1)
+        self.assertEqual(stats['vehiculos_no_validados'], 2)
+        self.assertEqual(stats['stats_tipo'], {'turbo': 1, 'sencillo': 1, 'eléctrico': 1})
+        self.assertEqual(stats['stats_estado'], {'activo': 1, 'mantenimiento': 1, 'inactivo': 1})
+        self.assertEqual(stats['stats_prioridad'], {'baja': 1, 'media': 1, 'alta': 1})
+        self.assertEqual(stats['total_entregas'], 36)
+        self.assertEqual(stats['total_facturacion'], Decimal('3500.50'))
+        self.assertEqual(stats['promedio_entregas'], 12)
+        self.assertEqual(stats['vehiculos_hoy'], 1)
+        self.assertEqual(stats['vehiculos_ultima_semana'], 2)
+        self.assertEqual(stats['ultima_actualizacion'], Vehiculo.objects.first().fecha_inicio)
+
+    def test_queryset_vacio(self):
+        stats = calculate_real_time_stats(Vehiculo.objects.none())
+        self.assertEqual(stats['total_vehiculos'], 0)
+        self.assertEqual(stats['porcentaje_validacion'], 0)
+        self.assertIsNone(stats['ultima_actualizacion'])
+
+
+class ResumenDiarioTests(TestCase):
+    def assertResumenCoincide(self):
+        esperado = calculate_real_time_stats(Vehiculo.objects.all())
+        obtenido = stats_desde_resumen()
+        for clave in ('total_vehiculos', 'vehiculos_validados', 'total_entregas', 'total_facturacion',
+                      'stats_tipo', 'stats_estado', 'stats_prioridad', 'vehiculos_hoy'):
+            self.assertEqual(obtenido[clave], esperado[clave], clave)
+
+    def test_altas_cambios_y_bajas(self):
+        turbo = crear_vehiculo(tipo_vehiculo='Turbo', numero_entregas=12)
+        crear_vehiculo(tipo_vehiculo='Sencillo', validado=True, cliente='Carga Segura Ltda.')
+        self.assertResumenCoincide()
+
+        turbo.validado = True
+        turbo.facturacion = Decimal('1500.25')
+        turbo.save()
+        self.assertResumenCoincide()
+
+        turbo.delete()
+        self.assertResumenCoincide()
+        self.assertEqual(ResumenDiario.objects.count(), 1)
+
+    def test_update_y_reconstruir(self):
+        for _ in range(3):
+            crear_vehiculo()
+        Vehiculo.objects.update(validado=True)
+        self.assertResumenCoincide()
+
+        Vehiculo.objects.filter(pk=Vehiculo.objects.first().pk).update(
+            numero_entregas=F('numero_entregas') + 5, fecha_inicio=timezone.now() - timedelta(days=2),
+        )
+        self.assertResumenCoincide()
+
+        ResumenDiario.objects.all().delete()
+        reconstruir_resumen()
+        self.assertResumenCoincide()
+
+    def test_estado_y_prioridad(self):
+        crear_vehiculo(estado='mantenimiento', prioridad=3)
+        crear_vehiculo(estado='inactivo')
+        self.assertResumenCoincide()
+
+        Vehiculo.objects.filter(estado='inactivo').update(estado='activo', prioridad=2)
+        self.assertResumenCoincide()
+        self.assertEqual(stats_desde_resumen()['stats_prioridad'], {'baja': 0, 'media': 1, 'alta': 1})
+
+    def test_mismas_claves_con_y_sin_resumen(self):
+        crear_vehiculo(estado='mantenimiento', prioridad=2)
+        self.client.force_login(User.objects.create_user('tablero', password='x'))
+        respuestas = {}
+        for desde_resumen in (False, True):
+            cache.clear()
+            with override_settings(VEHICULOS_STATS_DESDE_RESUMEN=desde_resumen):
+                respuestas[desde_resumen] = self.client.get('/api/real-time-stats/').json()
+        self.assertEqual(respuestas[True].keys(), respuestas[False].keys())
+        for nombre in ('stats_tipo', 'stats_estado', 'stats_prioridad'):
+            self.assertEqual(respuestas[True][nombre], respuestas[False][nombre], nombre)
+
+
+    def test_bulk_create_y_bulk_update(self):
+        existente = crear_vehiculo(codigo='V001')
+        nuevos = Vehiculo.objects.bulk_create([
+            Vehiculo(codigo=f'V{i:03d}', placa=f'XYZ{i:03d}', tipo_vehiculo='Turbo',
+                     fecha_inicio=timezone.now() - timedelta(days=i),
+                     fecha_fin=timezone.now() - timedelta(days=i, hours=-3), numero_entregas=i,
+                     facturacion=Decimal('100.00'), cliente='Cliente B')
+            for i in range(2, 5)
+        ])
+        self.assertResumenCoincide()
+
+        for vehiculo in nuevos:
+            vehiculo.validado = True
+            vehiculo.numero_entregas += 1
+            vehiculo.fecha_inicio -= timedelta(days=1)
+        Vehiculo.objects.bulk_update(nuevos, ['validado', 'numero_entregas', 'fecha_inicio'])
+        self.assertResumenCoincide()
+
+        existente.numero_entregas = 40
+        Vehiculo.objects.bulk_create(
+            [existente], update_conflicts=True, unique_fields=['codigo'], update_fields=['numero_entregas'],
+        )
+        self.assertResumenCoincide()
+
+
+class ExportacionCSVTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        cache_exportaciones_temporal(self)
+        self.client.force_login(User.objects.create_user('exportador', password='x'))
+        ahora = timezone.now()
+        crear_vehiculo(observacion='Con "comillas", comas\ny salto de línea', fecha_inicio=ahora)
+        crear_vehiculo(validado=True, facturacion=Decimal('99.5'), fecha_inicio=ahora - timedelta(days=1))
+        for i in range(3):
+            crear_vehiculo(cliente=f'Cliente {i}', fecha_inicio=ahora - timedelta(hours=i + 1))
+
+    def csv_anterior(self):
+        """El CSV que generaba la vista antes del streaming (instancia a instancia)"""
+        buffer = StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(COLUMNAS_EXPORTACION[:10])
+        for vehiculo in Vehiculo.objects.order_by('-fecha_inicio'):
+            writer.writerow([
+                vehiculo.codigo, vehiculo.placa, vehiculo.tipo_vehiculo,
+                vehiculo.fecha_inicio.strftime('%Y-%m-%d %H:%M:%S'),
+                vehiculo.fecha_fin.strftime('%Y-%m-%d %H:%M:%S'),
+                vehiculo.numero_entregas, str(vehiculo.facturacion), vehiculo.observacion or '',
+                vehiculo.cliente, 'Sí' if vehiculo.validado else 'No',
+            ])
+        return list(csv.reader(StringIO(buffer.getvalue())))
+
+    @override_settings(VEHICULOS_EXPORT_LOTE=2)
+    def test_streaming_igual_al_csv_anterior(self):
+        respuesta = self.client.get('/exportar/', {'type': 'csv'})
+        self.assertTrue(respuesta.streaming)
+        self.assertEqual(respuesta['Content-Type'], 'text/csv')
+        bloques = list(respuesta.streaming_content)
+        # Encabezado y un bloque por lote de 2 filas
+        self.assertEqual(len(bloques), 3)
+        filas = list(csv.reader(StringIO(b''.join(bloques).decode('utf-8'))))
+        self.assertEqual(filas[0], COLUMNAS_EXPORTACION)
+        self.assertEqual([fila[:10] for fila in filas], self.csv_anterior())
+
+        comprimida = self.client.get('/exportar/', {'type': 'csv', 'gzip': '1'})
+        self.assertEqual(comprimida['Content-Type'], 'application/gzip')
+        self.assertFalse(comprimida.has_header('Content-Encoding'))
+        self.assertRegex(comprimida['Content-Disposition'], r'\.csv\.gz"$')
+        self.assertEqual(gzip.decompress(b''.join(comprimida.streaming_content)), b''.join(bloques))
+
+    @override_settings(VEHICULOS_EXPORT_LOTE=2)
+    async def test_asgi_por_bloques(self):
+        await sync_to_async(self.async_client.force_login)(await User.objects.aget(username='exportador'))
+        esperado = await sync_to_async(
+            lambda: ''.join(bloques_csv(Vehiculo.objects.order_by('-fecha_inicio'))).encode('utf-8')
+        )()
+        # Primero se genera en streaming; después se sirve el archivo de la caché
+        for tipo_respuesta in ('StreamingHttpResponse', 'FileResponse'):
+            respuesta = await self.async_client.get('/exportar/', {'type': 'csv'})
+            self.assertEqual(type(respuesta).__name__, tipo_respuesta)
+            # Iterador asíncrono: Django no lo lee entero con list() antes de enviarlo
+            self.assertTrue(respuesta.is_async)
+            self.assertEqual(b''.join([bloque async for bloque in respuesta.streaming_content]), esperado)
+
+    def test_filtros_de_la_vista_principal(self):
+        respuesta = self.client.get('/exportar/', {'type': 'csv', 'validado': 'true'})
+        filas = list(csv.reader(StringIO(b''.join(respuesta.streaming_content).decode('utf-8'))))
+        self.assertEqual([fila[6] for fila in filas[1:]], ['99.50'])
+
+
+class ExportacionXLSXTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        cache_exportaciones_temporal(self)
+        self.client.force_login(User.objects.create_user('exportador', password='x'))
+        ahora = timezone.now()
+        for i in range(5):
+            crear_vehiculo(validado=i % 2 == 0, facturacion=Decimal('1000.25') + i,
+                           fecha_inicio=ahora - timedelta(hours=i))
+
+    @override_settings(VEHICULOS_EXPORT_LOTE=2)
+    def test_libro_legible_con_tipos(self):
+        respuesta = self.client.get('/exportar/', {'type': 'excel'})
+        self.assertRegex(respuesta['Content-Disposition'], r'\.xlsx"$')
+        libro = load_workbook(BytesIO(b''.join(respuesta.streaming_content)), read_only=True)
+        self.assertEqual(libro.sheetnames, ['Vehículos'])
+        filas = list(libro['Vehículos'].iter_rows(values_only=True))
+        self.assertEqual(list(filas[0]), COLUMNAS_EXPORTACION)
+        self.assertEqual(len(filas), 6)
+
+        vehiculo = Vehiculo.objects.order_by('-fecha_inicio').first()
+        fila = dict(zip(COLUMNAS_EXPORTACION, filas[1]))
+        self.assertEqual(fila['Código'], vehiculo.codigo)
+        # Hora UTC sin zona, como en el CSV; los importes quedan como números
+        self.assertEqual(fila['Fecha Inicio'], vehiculo.fecha_inicio.replace(tzinfo=None, microsecond=0))
+        self.assertEqual(fila['Facturación'], 1000.25)
+        self.assertEqual(fila['Número Entregas'], 10)
+        self.assertEqual([fila[9] for fila in filas[1:]], ['Sí', 'No', 'Sí', 'No', 'Sí'])
+
+    def test_hojas_adicionales_al_superar_el_limite(self):
+        destino = BytesIO()
+        escribir_xlsx(Vehiculo.objects.order_by('-fecha_inicio'), destino, tamano=3, filas_por_hoja=2)
+        libro = load_workbook(destino, read_only=True)
+        self.assertEqual(libro.sheetnames, ['Vehículos', 'Vehículos 2', 'Vehículos 3'])
+        hojas = [list(libro[nombre].iter_rows(values_only=True)) for nombre in libro.sheetnames]
+        self.assertEqual([len(filas) for filas in hojas], [3, 3, 2])
+        self.assertTrue(all(list(filas[0]) == COLUMNAS_EXPORTACION for filas in hojas))
+        codigos = [fila[0] for filas in hojas for fila in filas[1:]]
+        self.assertEqual(codigos, list(Vehiculo.objects.order_by('-fecha_inicio').values_list('codigo', flat=True)))
+
+
+class ExportacionColumnarTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        cache_exportaciones_temporal(self)
+        self.client.force_login(User.objects.create_user('exportador', password='x'))
+        # 23:30 en Bogotá ya es el día siguiente en UTC
+        self.inicio = timezone.make_aware(datetime(2024, 3, 9, 23, 30))
+        for i in range(5):
+            crear_vehiculo(cliente=f'Cliente {i % 2}', fecha_inicio=self.inicio - timedelta(days=i))
+
+    def descargar(self, tipo):
+        return b''.join(self.client.get('/exportar/', {'type': tipo}).streaming_content)
+
+    @override_settings(VEHICULOS_PARQUET_FILAS_POR_GRUPO=2)
+    def test_parquet_y_arrow_con_esquema_tipado(self):
+        archivo = pq.ParquetFile(BytesIO(self.descargar('parquet')))
+        self.assertEqual(archivo.metadata.num_rows, 5)
+        self.assertEqual(archivo.metadata.num_row_groups, 3)
+        parquet = archivo.read()
+
+        arrow = pa.ipc.open_stream(self.descargar('arrow')).read_all()
+        self.assertEqual(arrow.num_rows, 5)
+
+        for tabla in (parquet, arrow):
+            self.assertTrue(tabla.schema.equals(esquema_arrow()), tabla.schema)
+            primera = tabla.slice(0, 1).to_pylist()[0]
+            self.assertEqual(primera['Día'], date(2024, 3, 9))
+            self.assertEqual(primera['Mes'], '2024-03')
+            self.assertEqual(primera['Año'], 2024)
+            self.assertEqual(primera['Facturación'], Decimal('1000.00'))
+            self.assertEqual(sorted(set(tabla.column('Cliente').to_pylist())), ['Cliente 0', 'Cliente 1'])
+
+
+class CambiosFeedTests(TestCase):
+    def setUp(self):
+        self.client.force_login(User.objects.create_user('powerbi', password='x'))
+        self.vehiculos = [crear_vehiculo(codigo=f'F{i}') for i in range(3)]
+        # Fuera del margen de transacciones en curso
+        Vehiculo.objects.update(updated_at=timezone.now() - timedelta(minutes=1))
+
+    def cambios(self, **params):
+        respuesta = self.client.get('/api/cambios/', params)
+        self.assertEqual(respuesta.status_code, 200)
+        return respuesta.json()
+
+    def codigos(self, datos):
+        return [fila['codigo'] for fila in datos['vehiculos']]
+
+    def test_token_paginas_y_eliminaciones(self):
+        primera = self.cambios(limite=2)
+        self.assertEqual(self.codigos(primera), ['F0', 'F1'])
+        self.assertTrue(primera['hay_mas'])
+        segunda = self.cambios(limite=2, token=primera['token'])
+        self.assertEqual(self.codigos(segunda), ['F2'])
+        self.assertFalse(segunda['hay_mas'])
+        vacia = self.cambios(token=segunda['token'])
+        self.assertEqual((vacia['vehiculos'], vacia['eliminados']), ([], []))
+
+        # Los cambios recientes esperan al margen; update() también mueve updated_at
+        eliminado = self.vehiculos[0].pk
+        self.vehiculos[0].delete()
+        Vehiculo.objects.filter(codigo='F1').update(numero_entregas=3)
+        pendiente = self.cambios(token=vacia['token'])
+        self.assertEqual(pendiente['vehiculos'], [])
+        self.assertEqual(pendiente['eliminados'], [eliminado])
+        with override_settings(VEHICULOS_CAMBIOS_MARGEN_SEGUNDOS=0):
+            nuevos = self.cambios(token=pendiente['token'])
+        self.assertEqual(self.codigos(nuevos), ['F1'])
+        self.assertEqual(nuevos['vehiculos'][0]['numero_entregas'], 3)
+        self.assertEqual(nuevos['eliminados'], [])
+
+        # Una sincronización nueva no recibe eliminaciones anteriores
+        self.assertEqual(self.cambios()['eliminados'], [])
+        self.assertEqual(self.client.get('/api/cambios/', {'token': 'roto'}).status_code, 400)
+
+    @override_settings(VEHICULOS_CAMBIOS_MARGEN_SEGUNDOS=0.2)
+    def test_update_sellado_despues_de_esperar_el_bloqueo(self):
+        token = obtener_cambios()['token']
+        esperando = []
+
+        def otro_escritor(execute, sql, params, many, context):
+            # Mientras el UPDATE espera el bloqueo, otro escritor confirma y un
+            # lector del feed avanza su token más allá del margen
+            if not esperando and sql.startswith(('BEGIN', 'SAVEPOINT')):
+                esperando.append(True)
+                sleep(0.1)
+                Vehiculo.objects.filter(codigo='F2').update(numero_entregas=7)
+                sleep(0.3)
+                esperando.append(obtener_cambios(token=token)['token'])
+            return execute(sql, params, many, context)
+
+        with connection.execute_wrapper(otro_escritor):
+            Vehiculo.objects.filter(codigo='F0').update(numero_entregas=5)
+        sleep(0.3)
+        self.assertEqual([fila['codigo'] for fila in obtener_cambios(token=esperando[1])['vehiculos']], ['F0'])
+
+    def test_poda_de_marcas_y_tokens_expirados(self):
+        token = self.cambios()['token']
+        for vehiculo in self.vehiculos:
+            vehiculo.delete()
+        antiguas = VehiculoEliminado.objects.order_by('id')[:2]
+        VehiculoEliminado.objects.filter(id__in=[marca.id for marca in antiguas]).update(
+            eliminado_at=timezone.now() - timedelta(days=31)
+        )
+        reciente = self.cambios(token=token)
+        self.assertEqual(len(reciente['eliminados']), 3)
+
+        salida = StringIO()
+        call_command('podar_eliminados', stdout=salida)
+        self.assertIn('borradas: 1', salida.getvalue())
+        self.assertEqual(VehiculoEliminado.objects.count(), 2)
+
+        # El token anterior a la poda perdería una eliminación: 410
+        respuesta = self.client.get('/api/cambios/', {'token': token})
+        self.assertEqual(respuesta.status_code, 410)
+        self.assertFalse(respuesta.json()['success'])
+        self.assertEqual(self.cambios(token=reciente['token'])['eliminados'], [])
+
+
+class TrabajosExportacionTests(TestCase):
+    def setUp(self):
+        directorio = TemporaryDirectory()
+        self.addCleanup(directorio.cleanup)
+        self.directorio = Path(directorio.name)
+        ajustes = override_settings(VEHICULOS_EXPORT_DIR=self.directorio)
+        ajustes.enable()
+        self.addCleanup(ajustes.disable)
+        self.usuario = User.objects.create_user('exportador', password='x')
+        self.client.force_login(self.usuario)
+        crear_vehiculo(validado=True)
+        crear_vehiculo(validado=True)
+        crear_vehiculo(validado=False)
+
+    def enviar(self, **datos):
+        # Los trabajos se encolan al confirmar; aquí se ejecutan en el mismo hilo
+        return self.client.post('/api/exportaciones/', {'type': 'csv', **datos})
+
+    def test_ciclo_de_vida(self):
+        respuesta = self.enviar(validado='true')
+        self.assertEqual(respuesta.status_code, 202)
+        datos = respuesta.json()
+        self.assertEqual(datos['trabajo']['estado'], 'pendiente')
+        self.assertEqual(self.client.get(datos['descarga_url']).status_code, 404)
+
+        ejecutar_trabajo(datos['trabajo']['id'])
+        trabajo = self.client.get(datos['estado_url']).json()['trabajo']
+        self.assertEqual(trabajo['estado'], 'completado')
+        self.assertEqual((trabajo['filas_procesadas'], trabajo['total_filas'], trabajo['progreso']), (2, 2, 100))
+
+        descarga = self.client.get(datos['descarga_url'])
+        filas = list(csv.reader(StringIO(b''.join(descarga.streaming_content).decode('utf-8'))))
+        self.assertEqual(len(filas), 3)
+        self.assertEqual({fila[9] for fila in filas[1:]}, {'Sí'})
+
+        otro = User.objects.create_user('otro', password='x')
+        self.client.force_login(otro)
+        self.assertEqual(self.client.get(datos['estado_url']).status_code, 404)
+        self.assertEqual(self.enviar(type='pdf').status_code, 400)
+
+    @override_settings(VEHICULOS_EXPORT_MAX_POR_USUARIO=2)
+    def test_maximo_por_usuario(self):
+        ids = [self.enviar().json()['trabajo']['id'] for _ in range(2)]
+        respuesta = self.enviar()
+        self.assertEqual(respuesta.status_code, 429)
+        self.assertEqual(TrabajoExportacion.objects.filter(usuario=self.usuario).count(), 2)
+
+        ejecutar_trabajo(ids[0])
+        self.assertEqual(self.enviar().status_code, 202)
+
+    def test_retencion_de_trabajos_terminados(self):
+        trabajo_id = self.enviar().json()['trabajo']['id']
+        ejecutar_trabajo(trabajo_id)
+        archivo = self.directorio / TrabajoExportacion.objects.get(pk=trabajo_id).archivo
+        self.assertTrue(archivo.exists())
+
+        TrabajoExportacion.objects.filter(pk=trabajo_id).update(
+            finalizado_at=timezone.now() - timedelta(hours=25)
+        )
+        self.assertEqual(self.enviar().status_code, 202)
+        self.assertFalse(TrabajoExportacion.objects.filter(pk=trabajo_id).exists())
+        self.assertFalse(archivo.exists())
+
+
+class CacheDatosTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.usuario = User.objects.create_user('analista', password='clave-segura-123')
+        self.client.force_login(self.usuario)
+
+    def test_escrituras_invalidan_stats(self):
+        vehiculo = crear_vehiculo()
+        self.assertEqual(self.client.get('/api/real-time-stats/').json()['vehiculos_validados'], 0)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post('/toggle-validacion/', {'vehiculo_id': vehiculo.pk, 'validado': 'true'})
+        self.assertEqual(self.client.get('/api/real-time-stats/').json()['vehiculos_validados'], 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Vehiculo.objects.update(validado=False)
+        self.assertEqual(self.client.get('/api/real-time-stats/').json()['vehiculos_validados'], 0)
+        with self.assertNumQueries(2):  # sesión y usuario; las stats salen de la caché
+            self.client.get('/api/real-time-stats/')
+
+    def test_version_compartida_en_la_base_de_datos(self):
+        anterior = version_datos()
+        with self.captureOnCommitCallbacks(execute=True):
+            crear_vehiculo()
+        version = version_datos()
+        self.assertGreater(version, anterior)
+        self.assertEqual(VersionDatos.objects.get().version, version)
+
+        # Otro proceso (o esta caché tras perder la clave) lee la misma versión
+        cache.clear()
+        self.assertEqual(version_datos(), version)
+        VersionDatos.objects.update(version=F('version') + 1)
+        self.assertEqual(version_datos(), version)
+        cache.clear()
+        self.assertEqual(version_datos(), version + 1)
+
+
+class ValidacionMasivaTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.usuario = User.objects.create_user('analista', password='clave-segura-123')
+        self.client.force_login(self.usuario)
+        self.vehiculos = [crear_vehiculo(codigo=f'V{i:03d}', placa=f'ABC{i:03d}') for i in range(5)]
+
+    def test_por_ids_en_un_update(self):
+        ids = [v.pk for v in self.vehiculos[:3]]
+        with CaptureQueriesContext(connection) as consultas:
+            respuesta = self.client.post('/api/bulk-validation/', {
+                'action': 'validate', 'vehicle_ids[]': ids
+            }).json()
+        self.assertEqual(respuesta['updated_count'], 3)
+        sentencias = [q['sql'] for q in consultas.captured_queries if '"vehiculos_vehiculo"' in q['sql']]
+        self.assertEqual(sum(sql.startswith('UPDATE') for sql in sentencias), 1)
+        self.assertFalse(any(sql.startswith('SELECT "vehiculos_vehiculo"."id"') for sql in sentencias))
+        actualizado = Vehiculo.objects.get(pk=ids[0])
+        self.assertTrue(actualizado.validado)
+        self.assertEqual(actualizado.usuario_modificacion, self.usuario)
+        self.assertEqual(stats_desde_resumen()['vehiculos_validados'], 3)
+
+    def test_por_filtros(self):
+        respuesta = self.client.post('/api/bulk-validation/', {
+            'action': 'validate', 'modo': 'filtros', 'placa': 'ABC00',
+        }).json()
+        self.assertEqual(respuesta['updated_count'], 5)
+        self.assertEqual(Vehiculo.objects.filter(validado=True).count(), 5)
+        self.assertEqual(stats_desde_resumen()['vehiculos_validados'], 5)
+
+
+@override_settings(VEHICULOS_EVENTOS_DETECTOR=False, VEHICULOS_EVENTOS_ESPERA_SEGUNDOS=0.1)
+class EventosTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(User.objects.create_user('tablero', password='x'))
+        self.async_client.force_login(User.objects.get(username='tablero'))
+        # Las versiones de pruebas anteriores se deshicieron con su transacción
+        difusor.__init__()
+
+    def publicar_cambio(self, **kwargs):
+        """Lo que hace el detector tras una escritura: publicar las filas nuevas con su versión"""
+        token = obtener_cambios(desde=timezone.now() - timedelta(seconds=1), limite=1, margen=0)['token']
+        with self.captureOnCommitCallbacks(execute=True):
+            vehiculo = crear_vehiculo(**kwargs)
+        difusor._publicar_cambios(token, version_datos())
+        return vehiculo
+
+    def test_long_poll(self):
+        inicial = self.client.get('/api/eventos/espera/').json()
+        self.assertEqual((inicial['eventos'], inicial['version']), ([], version_datos()))
+
+        vehiculo = self.publicar_cambio(codigo='VIVO', estado='inactivo')
+        datos = self.client.get('/api/eventos/espera/', {'desde': inicial['version']}).json()
+        self.assertEqual(datos['version'], version_datos())
+        self.assertEqual([evento['tipo'] for evento in datos['eventos']], ['cambios'])
+        cambios = datos['eventos'][0]['datos']
+        self.assertEqual([fila['codigo'] for fila in cambios['vehiculos']], ['VIVO'])
+        self.assertEqual(cambios['vehiculos'][0]['id'], vehiculo.pk)
+        self.assertEqual(cambios['eliminados'], [])
+        # Los KPIs sin filtros viajan con el evento
+        self.assertEqual(cambios['stats']['total_vehiculos'], 1)
+        self.assertEqual(cambios['stats']['stats_estado']['inactivo'], 1)
+
+        # Sin eventos nuevos, la espera vence con una lista vacía
+        vacia = self.client.get('/api/eventos/espera/', {'desde': datos['version']}).json()
+        self.assertEqual((vacia['eventos'], vacia['version']), ([], datos['version']))
+        self.assertEqual(vacia['reintentar'], 5)
+
+    def test_cursor_de_otro_worker(self):
+        # Otro worker ya detectó la versión 12: este espera a alcanzarla sin perder el cursor
+        otro = Difusor()
+        otro.publicar('cambios', {'i': 10}, 10)
+        self.assertEqual(otro.esperar(12, timeout=0), ([], 12))
+        otro.publicar('cambios', {'i': 13}, 13)
+        self.assertEqual(otro.esperar(12, timeout=0), ([(13, 'cambios', {'i': 13})], 13))
+
+    def test_recargar_si_los_eventos_ya_no_estan(self):
+        pequeno = Difusor(capacidad=2)
+        for i in range(4):
+            pequeno.publicar('cambios', {'i': i}, i + 1)
+        self.assertEqual(pequeno.esperar(0, timeout=0)[0], [(4, 'recargar', {})])
+        self.assertEqual([datos['i'] for _, _, datos in pequeno.esperar(2, timeout=0)[0]], [2, 3])
+
+    def test_suscriptor_con_bucle_cerrado(self):
+        cerrado = asyncio.new_event_loop()
+        cerrado.close()
+        activo = asyncio.new_event_loop()
+        self.addCleanup(activo.close)
+        cola = asyncio.Queue()
+        difusor._suscriptores.update({(cerrado, asyncio.Queue()), (activo, cola)})
+        difusor.publicar('cambios', {}, 1)
+        activo.run_until_complete(asyncio.sleep(0))
+        self.assertEqual(cola.get_nowait(), (1, 'cambios', {}))
+        self.assertEqual(difusor._suscriptores, {(activo, cola)})
+
+    def test_sse_solo_con_asgi(self):
+        self.assertEqual(self.client.get('/api/eventos/').status_code, 501)
+
+    async def test_sse(self):
+        desde = await sync_to_async(version_datos)()
+        await sync_to_async(self.publicar_cambio)(codigo='SSE')
+        respuesta = await self.async_client.get('/api/eventos/', {'desde': desde})
+        self.assertEqual(respuesta['Content-Type'], 'text/event-stream')
+        flujo = aiter(respuesta.streaming_content)
+        self.assertEqual(await anext(flujo), b'retry: 5000\n\n')
+        evento = (await anext(flujo)).decode()
+        await flujo.aclose()
+        cabecera, datos = evento.strip().split('\ndata: ')
+        self.assertEqual(cabecera, f'id: {difusor.version}\nevent: cambios')
+        self.assertEqual(json.loads(datos)['vehiculos'][0]['codigo'], 'SSE')
+
+
+class FiltrosFechaTests(TestCase):
+    def setUp(self):
+        self.dia = timezone.localdate() - timedelta(days=3)
+        medianoche = timezone.make_aware(datetime.combine(self.dia, time.min))
+        crear_vehiculo(codigo='V001', fecha_inicio=medianoche)
+        crear_vehiculo(codigo='V002', fecha_inicio=medianoche + timedelta(hours=23, minutes=59))
+        crear_vehiculo(codigo='V003', fecha_inicio=medianoche + timedelta(days=1))
+        crear_vehiculo(codigo='V004', fecha_inicio=medianoche - timedelta(seconds=1))
+
+    def filtrar(self, **filtros):
+        return filtrar_vehiculos(dict(obtener_filtros({}), **filtros))
+
+    def test_dia_local_completo(self):
+        dia = self.dia.isoformat()
+        codigos = self.filtrar(fecha_inicio=dia, fecha_fin=dia).values_list('codigo', flat=True)
+        self.assertEqual(sorted(codigos), ['V001', 'V002'])
+
+    def test_rango_usa_indice(self):
+        dia = self.dia.isoformat()
+        plan = self.filtrar(fecha_inicio=dia, fecha_fin=dia).explain()
+        self.assertIn('USING INDEX vehiculos_v_fecha_i', plan)
+        self.assertNotIn('SCAN vehiculos_vehiculo', plan)
+
+    def test_validado_y_fecha_sin_recorrido_completo(self):
+        # El planificador elige entre el índice de fecha y el compuesto; ambos son range scans
+        plan = self.filtrar(fecha_inicio=self.dia.isoformat(), validado='true').explain()
+        self.assertIn('SEARCH vehiculos_vehiculo USING INDEX', plan)
+        self.assertNotIn('SCAN vehiculos_vehiculo', plan)
+
+    def test_tipo_y_fecha_usan_indice_compuesto(self):
+        plan = self.filtrar(fecha_inicio=self.dia.isoformat()).filter(tipo_vehiculo='Turbo').explain()
+        self.assertIn('USING INDEX vehiculos_v_tipo_ve_31db1c_idx (tipo_vehiculo=? AND fecha_inicio>?)', plan)
+
+
+class BusquedaPlacaTests(TestCase):
+    def setUp(self):
+        crear_vehiculo(codigo='V001', placa='abc-123')
+        crear_vehiculo(codigo='V002', placa='ABD123')
+        Vehiculo.objects.bulk_create([
+            Vehiculo(
+                codigo='V003', placa='xyz 12a', tipo_vehiculo='Sencillo',
+                fecha_inicio=timezone.now(), fecha_fin=timezone.now() + timedelta(hours=2),
+                numero_entregas=3, facturacion=Decimal('300.00'), cliente='Logística Express Ltda.',
+            ),
+        ])
+
+    def buscar(self, texto):
+        queryset = filtrar_vehiculos(dict(obtener_filtros({}), placa=texto))
+        return queryset, sorted(queryset.values_list('codigo', flat=True))
+
+    def test_normaliza_al_guardar(self):
+        self.assertEqual(
+            dict(Vehiculo.objects.values_list('codigo', 'placa_normalizada')),
+            {'V001': 'ABC123', 'V002': 'ABD123', 'V003': 'XYZ12A'},
+        )
+
+    def test_prefijo_por_rango_de_indice(self):
+        queryset, codigos = self.buscar('ab')
+        self.assertEqual(codigos, ['V001', 'V002'])
+        queryset, codigos = self.buscar('abc-1')
+        self.assertEqual(codigos, ['V001'])
+        self.assertIn('(placa_normalizada>? AND placa_normalizada<?)', queryset.explain())
+
+    def test_contenido_por_trigramas(self):
+        queryset, codigos = self.buscar('123')
+        self.assertEqual(codigos, ['V001', 'V002'])
+        self.assertIn('vehiculos_placatrigrama', queryset.explain())
+        self.assertEqual(self.buscar('Z12')[1], ['V003'])
+
+    def test_cambio_de_placa(self):
+        Vehiculo.objects.filter(codigo='V002').update(placa='QRS-987')
+        self.assertEqual(self.buscar('987')[1], ['V002'])
+        self.assertEqual(self.buscar('ABD')[1], [])
+
+    def test_otros_formatos_por_contenido(self):
+        # Las placas no se validan: un texto sin forma de comienzo de placa colombiana va por trigramas
+        crear_vehiculo(codigo='V004', placa='12-ABCD')
+        queryset, codigos = self.buscar('abcd')
+        self.assertEqual(codigos, ['V004'])
+        self.assertIn('vehiculos_placatrigrama', queryset.explain())
+        self.assertEqual(self.buscar('2ab')[1], ['V004'])
+
+        vehiculo = Vehiculo.objects.get(codigo='V002')
+        vehiculo.placa = 'lmn-45b'
+        Vehiculo.objects.bulk_update([vehiculo], ['placa'])
+        self.assertEqual(Vehiculo.objects.get(codigo='V002').placa_normalizada, 'LMN45B')
+        self.assertEqual(self.buscar('45b')[1], ['V002'])
+
+
+class BusquedaTextoTests(TestCase):
+    def setUp(self):
+        self.usuario = User.objects.create_user('analista', password='clave-segura-123')
+        self.client.force_login(self.usuario)
+        crear_vehiculo(codigo='V001', cliente='Logística Express Ltda.', observacion='Entrega urgente')
+        crear_vehiculo(codigo='V002', cliente='Distribuidora Nacional', observacion='Cliente pidió logística inversa')
+        crear_vehiculo(codigo='V003', cliente='Comercial del Norte', observacion=None, validado=True)
+
+    def buscar(self, texto):
+        return sorted(filtrar_vehiculos(dict(obtener_filtros({}), q=texto)).values_list('codigo', flat=True))
+
+    def test_palabras_prefijo_y_acentos(self):
+        self.assertEqual(self.buscar('logistica'), ['V001', 'V002'])
+        self.assertEqual(self.buscar('urg'), ['V001'])
+        self.assertEqual(self.buscar('norte'), ['V003'])
+        self.assertEqual(self.buscar('"); DROP'), [])
+
+    def test_triggers_mantienen_el_indice(self):
+        Vehiculo.objects.filter(codigo='V003').update(observacion='Retraso por lluvia')
+        Vehiculo.objects.get(codigo='V001').delete()
+        self.assertEqual(self.buscar('lluvia'), ['V003'])
+        self.assertEqual(self.buscar('urgente'), [])
+
+    def test_api_ordenada_por_relevancia(self):
+        datos = self.client.get('/api/buscar/', {'q': 'logistica'}).json()
+        # cliente pesa más que observación
+        self.assertEqual([r['codigo'] for r in datos['resultados']], ['V001', 'V002'])
+        datos = self.client.get('/api/buscar/', {'q': 'logistica', 'validado': 'true'}).json()
+        self.assertEqual(datos['resultados'], [])
+
+
+class GeneradorTests(TestCase):
+    def generar(self, **opciones):
+        call_command('generar_vehiculos', 300, lote=70, semilla=7, referencia='2026-01-31',
+                     stdout=StringIO(), **opciones)
+        return list(Vehiculo.objects.order_by('codigo').values_list(
+            'codigo', 'placa', 'fecha_inicio', 'numero_entregas', 'facturacion', 'estado', 'validado'
+        ))
+
+    def test_determinista_y_con_estructuras_derivadas(self):
+        crear_vehiculo(codigo='PREVIO')
+        primera = self.generar(vaciar=True)
+        self.assertEqual(len(primera), 300)
+        self.assertEqual(primera, self.generar(vaciar=True))
+        self.assertLess(max(fila[2] for fila in primera), inicio_dia(date(2026, 1, 31)))
+        self.assertEqual(stats_desde_resumen()['total_vehiculos'], 300)
+        placa = primera[0][1]
+        self.assertIn(primera[0][0], filtrar_vehiculos(dict(obtener_filtros({}), placa=placa[1:]))
+                      .values_list('codigo', flat=True))
+        self.assertTrue(filtrar_vehiculos(dict(obtener_filtros({}), q='entrega')).exists())
+
+    def resumen(self):
+        return sorted(ResumenDiario.objects.values_list(
+            'dia', 'tipo_vehiculo', 'validado', 'cliente', 'estado', 'prioridad', 'total_vehiculos',
+            'total_entregas', 'total_facturacion', 'total_horas',
+        ))
+
+    def test_resumen_acumulado_e_indices_restaurados(self):
+        # Tabla vacía: índices retirados durante la carga; después, añadiendo a datos existentes
+        for opciones in ({'vaciar': True}, {}):
+            self.generar(**opciones)
+            incremental = self.resumen()
+            reconstruir_resumen()
+            self.assertEqual(incremental, self.resumen())
+        self.assertEqual(Vehiculo.objects.count(), 600)
+        with connection.cursor() as cursor:
+            indices = connection.introspection.get_constraints(cursor, Vehiculo._meta.db_table)
+        self.assertTrue({indice.name for indice in Vehiculo._meta.indexes} <= set(indices))
+
+
+class ConsultasPorEndpointTests(TestCase):
+    """Presupuesto de consultas de cada caso del benchmark"""
+
+    def test_consultas_dentro_del_presupuesto(self):
+        usuario = User.objects.create_user('bench', password='x')
+        generar_vehiculos(300, semilla=3, tamano=100)
+        resultados = ejecutar_casos(usuario, repeticiones=1)
+        for caso in CASOS:
+            if caso.max_consultas is None:
+                continue
+            with self.subTest(caso.nombre):
+                self.assertLessEqual(resultados[caso.nombre]['consultas'], caso.max_consultas)
+
+
+class MetricasTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        registro_metricas.reiniciar()
+        cache_exportaciones_temporal(self)
+        crear_vehiculo()
+        self.client.force_login(User.objects.create_user('metricas', password='x'))
+
+    def test_exportacion_medida_hasta_el_ultimo_byte(self):
+        respuesta = self.client.get('/exportar/', {'type': 'csv'})
+        tamano = len(b''.join(respuesta.streaming_content))
+        texto = self.client.get('/metrics').content.decode()
+        self.assertIn('vehiculos_peticiones_total{vista="exportar_datos",metodo="GET",codigo="200"} 1', texto)
+        self.assertIn(f'vehiculos_respuesta_bytes_sum{{vista="exportar_datos"}} {tamano}', texto)
+        self.assertRegex(texto, r'vehiculos_peticion_consultas_sum\{vista="exportar_datos"\} [1-9]')
+        self.assertIn('vehiculos_cache_tasa_aciertos', texto)
+
+    @override_settings(VEHICULOS_METRICAS_LENTO_MS=0, VEHICULOS_METRICAS_TOKEN='secreto')
+    def test_log_de_peticiones_lentas_y_token(self):
+        vehiculo = Vehiculo.objects.get()
+        with self.assertLogs('vehiculos.metricas', 'WARNING') as logs:
+            self.client.get(f'/api/vehicle/{vehiculo.pk}/')
+            self.assertEqual(self.client.get('/metrics').status_code, 401)
+            self.assertEqual(self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer secreto').status_code, 200)
+        self.assertIn('api_vehicle_details', logs.output[0])
+        self.assertIn('vehiculos_vehiculo', logs.output[0])
+
+
+class IndicadoresTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        inicio = timezone.now() - timedelta(days=1)
+        crear_vehiculo(codigo='LENTO', fecha_inicio=inicio, fecha_fin=inicio + timedelta(hours=10),
+                       numero_entregas=5, facturacion=Decimal('1001'))
+        crear_vehiculo(codigo='RAPIDO', fecha_inicio=inicio, fecha_fin=inicio + timedelta(hours=4),
+                       numero_entregas=30, facturacion=Decimal('3000.00'))
+        self.client.force_login(User.objects.create_user('indicadores', password='x'))
+
+    def indicadores(self, codigo):
+        return Vehiculo.objects.filter(codigo=codigo).values_list(
+            'duracion_horas', 'facturacion_por_entrega', 'rendimiento'
+        ).get()
+
+    def test_save_y_update_coinciden(self):
+        self.assertEqual(self.indicadores('LENTO'), (Decimal('10.00'), Decimal('200.20'), Decimal('0.50')))
+        vehiculo = Vehiculo.objects.get(codigo='RAPIDO')
+        Vehiculo.objects.filter(codigo='RAPIDO').update(
+            fecha_fin=vehiculo.fecha_inicio + timedelta(hours=3), numero_entregas=31
+        )
+        self.assertEqual(self.indicadores('RAPIDO'), (Decimal('3.00'), Decimal('96.77'), Decimal('10.33')))
+        Vehiculo.objects.update(rendimiento=0)
+        recalcular_indicadores()
+        self.assertEqual(self.indicadores('RAPIDO')[2], Decimal('10.33'))
+
+    def test_ranking_filtros_y_stats(self):
+        datos = self.client.get('/api/ranking-rendimiento/', {'limite': 1}).json()
+        self.assertEqual([v['codigo'] for v in datos['vehiculos']], ['LENTO'])
+        datos = self.client.get('/api/ranking-rendimiento/', {'orden': 'mejores'}).json()
+        self.assertEqual([v['codigo'] for v in datos['vehiculos']], ['RAPIDO', 'LENTO'])
+        filtrados = filtrar_vehiculos(dict(obtener_filtros({}), rendimiento_max='1'))
+        self.assertEqual(list(filtrados.values_list('codigo', flat=True)), ['LENTO'])
+
+        stats = stats_desde_resumen()
+        self.assertEqual(stats['rendimiento_promedio'], Decimal('2.50'))
+        self.assertEqual(calculate_real_time_stats(Vehiculo.objects.all())['rendimiento_promedio'],
+                         stats['rendimiento_promedio'])
+
+
+class PerfilConexionTests(TestCase):
+    @override_settings(VEHICULOS_SQLITE_PRAGMAS={'busy_timeout': 1234, 'temp_store': 'memory'})
+    def test_pragmas_en_cada_conexion_nueva(self):
+        copia = connection.copy()
+        try:
+            with copia.cursor() as cursor:
+                cursor.execute('PRAGMA busy_timeout')
+                self.assertEqual(cursor.fetchone()[0], 1234)
+                cursor.execute('PRAGMA temp_store')
+                self.assertEqual(cursor.fetchone()[0], 2)
+        finally:
+            copia.close()
+
+    @override_settings(VEHICULOS_SQLITE_PRAGMAS={'busy_timeout': '1; DROP TABLE x'})
+    def test_pragma_invalido(self):
+        with self.assertRaises(ImproperlyConfigured):
+            pragmas()
+
+
+class ImportacionTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(User.objects.create_user('importador', password='x'))
+
+    def resumen(self):
+        return sorted(ResumenDiario.objects.values_list(
+            'dia', 'tipo_vehiculo', 'validado', 'cliente', 'estado', 'prioridad', 'total_vehiculos',
+            'total_entregas', 'total_facturacion', 'total_horas',
+        ))
+
+    def assertResumenConsistente(self):
+        incremental = self.resumen()
+        reconstruir_resumen()
+        self.assertEqual(incremental, self.resumen())
+
+    def importar(self, contenido, nombre='viajes.csv'):
+        return self.client.post('/api/importar/', {'archivo': SimpleUploadedFile(nombre, contenido)}).json()
+
+    @override_settings(VEHICULOS_IMPORTACION_LOTE=2)
+    def test_upsert_por_codigo_con_errores_de_fila(self):
+        crear_vehiculo(codigo='EXISTE', numero_entregas=4, cliente='Cliente A')
+        filas = [
+            ','.join(COLUMNAS_EXPORTACION),
+            'EXISTE,abc-123,Turbo,2026-01-10 08:00:00,2026-01-10 12:00:00,8,800.5,,Cliente B,Sí,,,',
+            'NUEVO,XYZ987,Sencillo,2026-01-10 09:00:00,2026-01-10 10:00:00,3,30,Nota,Cliente A,No,,,',
+            'MALO,XYZ987,Avión,2026-01-10 09:00:00,2026-01-10 10:00:00,3,30,,Cliente A,No,,,',
+            'FECHAS,XYZ987,Turbo,2026-01-10 09:00:00,2026-01-10 08:00:00,-1,30,,Cliente A,No,,,',
+        ]
+        datos = self.importar('\n'.join(filas).encode())
+        self.assertEqual((datos['creados'], datos['actualizados'], datos['total_errores']), (1, 1, 2))
+        self.assertEqual([(e['fila'], e['campo']) for e in datos['errores']],
+                         [(4, 'tipo_vehiculo'), (5, 'fecha_fin')])
+
+        existe = Vehiculo.objects.get(codigo='EXISTE')
+        self.assertEqual((existe.placa_normalizada, existe.facturacion, existe.cliente, existe.validado),
+                         ('ABC123', Decimal('800.50'), 'Cliente B', True))
+        self.assertEqual((existe.duracion_horas, existe.facturacion_por_entrega, existe.rendimiento),
+                         (Decimal('4.00'), Decimal('100.06'), Decimal('2.00')))
+        self.assertEqual(Vehiculo.objects.count(), 2)
+        self.assertResumenConsistente()
+
+        # Reimportar el mismo archivo no reescribe las filas
+        self.assertEqual(self.importar('\n'.join(filas).encode())['sin_cambios'], 2)
+        self.assertEqual(Vehiculo.objects.get(codigo='EXISTE').updated_at, existe.updated_at)
+
+    def test_reimportar_exportacion_modificada(self):
+        generar_vehiculos(300, semilla=5, tamano=100)
+        exportado = ''.join(bloques_csv(Vehiculo.objects.order_by('id')))
+        validados = Vehiculo.objects.filter(validado=True).count()
+        datos = self.importar(exportado.replace(',Sí,', ',No,').encode('utf-8'))
+        self.assertEqual((datos['creados'], datos['actualizados']), (0, validados))
+        self.assertFalse(Vehiculo.objects.filter(validado=True).exists())
+        self.assertResumenConsistente()
+
+
+class AnaliticaTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(User.objects.create_user('analista', password='x'))
+        generar_vehiculos(400, semilla=3, tamano=200)
+
+    def test_coincide_con_estadisticas(self):
+        datos = self.client.get('/api/analitica/', {'por': 'tipo,validado'}).json()
+        stats = calculate_real_time_stats(Vehiculo.objects.all())
+        self.assertEqual(datos['total']['viajes'], stats['total_vehiculos'])
+        self.assertEqual(datos['total']['entregas'], stats['total_entregas'])
+        self.assertAlmostEqual(datos['total']['facturacion'], float(stats['total_facturacion']), places=2)
+        self.assertEqual(datos['total']['rendimiento'], float(stats['rendimiento_promedio']))
+        self.assertEqual(sum(grupo['viajes'] for grupo in datos['grupos']), 400)
+        for grupo in datos['grupos']:
+            self.assertEqual(grupo['viajes'], Vehiculo.objects.filter(
+                tipo_vehiculo=grupo['tipo'], validado=grupo['validado']).count())
+
+        self.assertEqual(self.client.get('/api/analitica/', {'por': 'color'}).status_code, 400)
+
+
+class ExportarPowerBITests(TestCase):
+    def test_csv_y_parquet_por_trozos(self):
+        generar_vehiculos(250, semilla=9, tamano=250)
+        with TemporaryDirectory() as directorio:
+            for nombre in ('vehiculos.csv', 'vehiculos.parquet'):
+                destino = Path(directorio) / nombre
+                salida = StringIO()
+                call_command('exportar_powerbi', str(destino), '--lote', '100', stdout=salida)
+                self.assertIn('250 registros exportados', salida.getvalue())
+                tabla = pd.read_csv(destino) if destino.suffix == '.csv' else pd.read_parquet(destino)
+                self.assertEqual(list(tabla.columns), COLUMNAS_POWERBI)
+                self.assertEqual(len(tabla), 250)
+                self.assertEqual(tabla['Número Entregas'].sum(),
+                                 calculate_real_time_stats(Vehiculo.objects.all())['total_entregas'])
+
+            vehiculo = Vehiculo.objects.order_by('id').first()
+            local = timezone.localtime(vehiculo.fecha_inicio)
+            fila = pd.read_csv(Path(directorio) / 'vehiculos.csv', nrows=1).iloc[0]
+            self.assertEqual((fila['Día'], fila['Mes'], fila['Año']),
+                             (local.date().isoformat(), local.strftime('%Y-%m'), local.year))
+
+
+class ListadoColumnarTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(User.objects.create_user('lector', password='x'))
+        ahora = timezone.now()
+        crear_vehiculo(codigo='C1', cliente='Cliente A', fecha_inicio=ahora)
+        crear_vehiculo(codigo='C2', cliente='Cliente B', fecha_inicio=ahora - timedelta(hours=1))
+        crear_vehiculo(codigo='C3', cliente='Cliente A', fecha_inicio=ahora - timedelta(hours=2))
+
+    def test_paginas_columnares_con_diccionarios(self):
+        datos = self.client.get('/api/vehiculos/', {'campos': 'codigo,cliente', 'por_pagina': 2}).json()
+        self.assertEqual(datos['campos'], ['id', 'codigo', 'cliente'])
+        self.assertEqual(datos['columnas']['codigo'], ['C1', 'C2'])
+        self.assertEqual(datos['columnas']['cliente'], [0, 1])
+        self.assertEqual(datos['diccionarios'], {'cliente': ['Cliente A', 'Cliente B']})
+
+        siguiente = self.client.get('/api/vehiculos/', {
+            'campos': 'codigo,cliente', 'por_pagina': 2, 'cursor': datos['cursor_siguiente'],
+        }).json()
+        self.assertEqual(siguiente['columnas']['codigo'], ['C3'])
+        self.assertIsNone(siguiente['cursor_siguiente'])
+
+        ascendente = self.client.get('/api/vehiculos/', {'campos': 'codigo', 'orden': 'codigo'}).json()
+        self.assertEqual(ascendente['columnas']['codigo'], ['C1', 'C2', 'C3'])
+        # El cursor de un orden no vale para otro
+        for orden in ('codigo', '-rendimiento'):
+            respuesta = self.client.get('/api/vehiculos/', {'orden': orden, 'cursor': datos['cursor_siguiente']})
+            self.assertEqual(respuesta.status_code, 400, orden)
+        self.assertEqual(self.client.get('/api/vehiculos/', {'campos': 'usuario_creacion'}).status_code, 400)
+
+
+class GetCondicionalTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        cache_exportaciones_temporal(self)
+        self.client.force_login(User.objects.create_user('consulta', password='x'))
+        crear_vehiculo()
+
+    def test_304_sin_consultar_y_compresion(self):
+        respuesta = self.client.get('/api/real-time-stats/')
+        etag = respuesta['ETag']
+        self.assertIn('no-cache', respuesta['Cache-Control'])
+
+        with self.assertNumQueries(CONSULTAS_SESION):
+            self.assertEqual(self.client.get('/api/real-time-stats/', HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            crear_vehiculo()
+        respuesta = self.client.get('/api/real-time-stats/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertNotEqual(respuesta['ETag'], etag)
+
+        comprimida = self.client.get('/api/real-time-stats/', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(comprimida['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(comprimida.content), respuesta.content)
+        # Cada codificación tiene su propio validador
+        self.assertNotIn(respuesta['ETag'].strip('"'), comprimida['ETag'])
+        self.assertEqual(self.client.get(
+            '/api/real-time-stats/', HTTP_ACCEPT_ENCODING='gzip', HTTP_IF_NONE_MATCH=comprimida['ETag']
+        ).status_code, 304)
+        self.assertEqual(self.client.get(
+            '/api/real-time-stats/', HTTP_IF_NONE_MATCH=comprimida['ETag']
+        ).status_code, 200)
+
+    def test_sin_last_modified(self):
+        # Dos escrituras en el mismo segundo: If-Modified-Since no puede dar un 304 viejo
+        respuesta = self.client.get('/api/real-time-stats/')
+        self.assertNotIn('Last-Modified', respuesta)
+        with self.captureOnCommitCallbacks(execute=True):
+            crear_vehiculo()
+        self.assertEqual(self.client.get(
+            '/api/real-time-stats/', HTTP_IF_MODIFIED_SINCE=http_date(), HTTP_IF_NONE_MATCH=respuesta['ETag'],
+        ).json()['total_vehiculos'], 2)
+
+    def test_etag_de_la_exportacion_csv_por_codificacion(self):
+        etags = {
+            codificacion: self.client.get('/exportar/', {'type': 'csv'}, HTTP_ACCEPT_ENCODING=codificacion)['ETag']
+            for codificacion in ('', 'gzip', 'br')
+        }
+        self.assertEqual(len(set(etags.values())), 3)
+
+
+class CacheExportacionesTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.directorio = cache_exportaciones_temporal(self)
+        self.client.force_login(User.objects.create_user('exportador', password='x'))
+        crear_vehiculo()
+
+    def descargar(self, **params):
+        respuesta = self.client.get('/exportar/', params, HTTP_ACCEPT_ENCODING='gzip')
+        return respuesta, b''.join(respuesta.streaming_content)
+
+    def test_repeticiones_desde_disco_hasta_que_cambian_los_datos(self):
+        for tipo in ('csv', 'parquet'):
+            _, primera = self.descargar(type=tipo)
+            with self.assertNumQueries(CONSULTAS_SESION):
+                respuesta, segunda = self.descargar(type=tipo)
+            self.assertEqual(segunda, primera)
+        self.assertEqual(respuesta['Content-Type'], 'application/vnd.apache.parquet')
+
+        # El CSV se guarda ya comprimido con la codificación negociada
+        respuesta, csv_gzip = self.descargar(type='csv')
+        self.assertEqual(respuesta['Content-Encoding'], 'gzip')
+        self.assertIn(b'Transportes', gzip.decompress(csv_gzip))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            crear_vehiculo(cliente='Cliente Nuevo')
+        _, nueva = self.descargar(type='csv')
+        self.assertIn(b'Cliente Nuevo', gzip.decompress(nueva))
+        self.assertEqual(len(list(self.directorio.iterdir())), 3)
+
+    def test_flujo_seguidores_leen_el_temporal(self):
+        generados = []
+
+        def bloques():
+            for i in range(3):
+                generados.append(i)
+                yield f'bloque {i}\n'.encode()
+
+        lider = flujo('v1-b.csv', bloques())
+        self.assertEqual(next(lider), b'bloque 0\n')
+        recibido = []
+        seguidor = threading.Thread(target=lambda: recibido.append(b''.join(flujo('v1-b.csv', bloques()))))
+        seguidor.start()
+        for _ in range(100):
+            if _flujos['v1-b.csv'].seguidores:
+                break
+            sleep(0.01)
+        # El cliente del líder se desconecta: el archivo se termina para el seguidor
+        lider.close()
+        seguidor.join(5)
+        self.assertEqual(recibido, [b'bloque 0\nbloque 1\nbloque 2\n'])
+        self.assertEqual(generados, [0, 1, 2])
+        self.assertEqual((self.directorio / 'v1-b.csv').read_bytes(), recibido[0])
+
+        # Sin seguidores, una descarga interrumpida no deja nada en la caché
+        lider = flujo('v1-c.csv', bloques())
+        next(lider)
+        lider.close()
+        self.assertEqual(sorted(ruta.name for ruta in self.directorio.iterdir()), ['v1-b.csv'])
+
+    def test_single_flight_y_desalojo_lru(self):
+        generaciones = []
+
+        def escribir(destino):
+            generaciones.append(1)
+            sleep(0.1)
+            destino.write(b'x' * 100)
+
+        # Los hilos no comparten la transacción del test: la versión se lee antes
+        version_datos()
+        hilos = [threading.Thread(target=lambda: obtener('v1-a.csv', escribir).close()) for _ in range(4)]
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+        self.assertEqual(len(generaciones), 1)
+
+        for antiguedad, nombre in enumerate(['v1-c.csv', 'v1-b.csv']):
+            (self.directorio / nombre).write_bytes(b'x' * 100)
+            os.utime(self.directorio / nombre, (1000 - antiguedad, 1000 - antiguedad))
+        with override_settings(VEHICULOS_EXPORT_CACHE_MAX_BYTES=200):
+            self.assertEqual(desalojar(conservar='v1-a.csv'), 100)
+        self.assertEqual(sorted(ruta.name for ruta in self.directorio.iterdir()), ['v1-a.csv', 'v1-c.csv'])
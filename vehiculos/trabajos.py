@@ -0,0 +1,157 @@
+"""
+Exportaciones asíncronas en un pool de hilos del proceso.
+
+La vista solo registra un ``TrabajoExportacion`` y lo encola; un hilo del
+pool genera el archivo en ``VEHICULOS_EXPORT_DIR`` actualizando el avance,
+que el cliente consulta por separado antes de descargar el resultado.
+
+Los trabajos terminados (y sus archivos) se conservan
+``VEHICULOS_EXPORT_RETENCION_HORAS``; se borran al enviar uno nuevo.
+"""
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import close_old_connections, connections, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .exportacion import FORMATOS_ARCHIVO
+from .filtros import filtrar_vehiculos
+from .models import TrabajoExportacion
+
+
+ESTADOS_ACTIVOS = ('pendiente', 'en_proceso')
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+class LimiteTrabajosExcedido(Exception):
+    pass
+
+
+def directorio_exportaciones():
+    directorio = Path(getattr(settings, 'VEHICULOS_EXPORT_DIR', settings.BASE_DIR / 'exportaciones'))
+    directorio.mkdir(parents=True, exist_ok=True)
+    return directorio
+
+
+def ruta_archivo(trabajo):
+    return directorio_exportaciones() / trabajo.archivo
+
+
+def obtener_pool():
+    """Pool de hilos compartido, creado en el primer uso"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(
+                max_workers=getattr(settings, 'VEHICULOS_EXPORT_WORKERS', 2),
+                thread_name_prefix='exportacion',
+            )
+        return _pool
+
+
+def marcar_abandonados():
+    """Dar por fallidos los trabajos activos que superaron el tiempo máximo (p. ej. tras un reinicio)"""
+    limite = timezone.now() - timedelta(seconds=getattr(settings, 'VEHICULOS_EXPORT_TIMEOUT', 3600))
+    return TrabajoExportacion.objects.filter(
+        estado__in=ESTADOS_ACTIVOS, created_at__lt=limite
+    ).update(estado='error', error='Trabajo abandonado', finalizado_at=timezone.now())
+
+
+def podar_trabajos():
+    """Borrar los trabajos terminados hace más de la retención, con sus archivos; devuelve cuántos"""
+    limite = timezone.now() - timedelta(hours=getattr(settings, 'VEHICULOS_EXPORT_RETENCION_HORAS', 24))
+    vencidos = TrabajoExportacion.objects.filter(
+        estado__in=('completado', 'error'), finalizado_at__lt=limite
+    )
+    for archivo in vencidos.exclude(archivo='').values_list('archivo', flat=True):
+        (directorio_exportaciones() / archivo).unlink(missing_ok=True)
+    borrados, _ = vencidos.delete()
+    return borrados
+
+
+def enviar_trabajo(usuario, formato, filtros):
+    """Registrar y encolar una exportación; respeta el máximo de trabajos activos por usuario"""
+    if formato not in FORMATOS_ARCHIVO:
+        raise ValueError(f'Formato de exportación no soportado: {formato}')
+
+    marcar_abandonados()
+    podar_trabajos()
+    maximo = getattr(settings, 'VEHICULOS_EXPORT_MAX_POR_USUARIO', 2)
+    with transaction.atomic():
+        # Conteo y alta en la misma transacción: el bloqueo de la fila del usuario
+        # (BEGIN IMMEDIATE en SQLite) impide que dos envíos simultáneos superen el máximo
+        User.objects.select_for_update().get(pk=usuario.pk)
+        activos = TrabajoExportacion.objects.filter(usuario=usuario, estado__in=ESTADOS_ACTIVOS).count()
+        if activos >= maximo:
+            raise LimiteTrabajosExcedido(
+                f'Ya tienes {activos} exportaciones en curso (máximo {maximo})'
+            )
+
+        trabajo = TrabajoExportacion.objects.create(usuario=usuario, formato=formato, filtros=filtros)
+        # El hilo debe ver la fila ya confirmada
+        transaction.on_commit(lambda: obtener_pool().submit(ejecutar_trabajo, trabajo.pk))
+    return trabajo
+
+
+def ejecutar_trabajo(trabajo_id):
+    """Generar el archivo de un trabajo (se ejecuta en un hilo del pool)"""
+    close_old_connections()
+    try:
+        trabajo = TrabajoExportacion.objects.get(pk=trabajo_id)
+        escritor, extension, _ = FORMATOS_ARCHIVO[trabajo.formato]
+        queryset = filtrar_vehiculos(trabajo.filtros).order_by('-fecha_inicio')
+
+        TrabajoExportacion.objects.filter(pk=trabajo_id).update(
+            estado='en_proceso',
+            iniciado_at=timezone.now(),
+            total_filas=queryset.count(),
+        )
+
+        def progreso(filas):
+            TrabajoExportacion.objects.filter(pk=trabajo_id).update(
+                filas_procesadas=F('filas_procesadas') + filas
+            )
+
+        nombre = f'vehiculos_{trabajo_id}_{timezone.now():%Y%m%d_%H%M%S}.{extension}'
+        destino = directorio_exportaciones() / nombre
+        temporal = destino.with_suffix(destino.suffix + '.tmp')
+        try:
+            with open(temporal, 'wb') as archivo:
+                escritor(queryset, archivo, progreso=progreso)
+            os.replace(temporal, destino)
+        except BaseException:
+            temporal.unlink(missing_ok=True)
+            raise
+
+        TrabajoExportacion.objects.filter(pk=trabajo_id).update(
+            estado='completado', archivo=nombre, finalizado_at=timezone.now()
+        )
+    except Exception as e:
+        TrabajoExportacion.objects.filter(pk=trabajo_id).update(
+            estado='error', error=str(e), finalizado_at=timezone.now()
+        )
+    finally:
+        connections.close_all()
+
+
+def serializar_trabajo(trabajo):
+    return {
+        'id': trabajo.pk,
+        'formato': trabajo.formato,
+        'filtros': trabajo.filtros,
+        'estado': trabajo.estado,
+        'progreso': trabajo.progreso,
+        'filas_procesadas': trabajo.filas_procesadas,
+        'total_filas': trabajo.total_filas,
+        'error': trabajo.error or None,
+        'created_at': trabajo.created_at.isoformat(),
+        'finalizado_at': trabajo.finalizado_at.isoformat() if trabajo.finalizado_at else None,
+    }
@@ -7,9 +7,21 @@ urlpatterns = [
     path('', views.principal_view, name='principal'),
     path('toggle-validacion/', views.toggle_validacion, name='toggle_validacion'),
     path('exportar/', views.exportar_datos, name='exportar_datos'),
+    path('exportaciones/<int:trabajo_id>/descargar/', views.descargar_exportacion, name='descargar_exportacion'),
     # APIs avanzadas para full stack
     path('api/real-time-stats/', views.api_real_time_stats, name='api_real_time_stats'),
     path('api/check-updates/', views.api_check_updates, name='api_check_updates'),
+    path('api/vehiculos/', views.api_vehiculos, name='api_vehiculos'),
     path('api/vehicle/<int:vehicle_id>/', views.api_vehicle_details, name='api_vehicle_details'),
     path('api/bulk-validation/', views.api_bulk_validation, name='api_bulk_validation'),
+    path('api/importar/', views.api_importar, name='api_importar'),
+    path('api/ranking-rendimiento/', views.api_ranking_rendimiento, name='api_ranking_rendimiento'),
+    path('api/analitica/', views.api_analitica, name='api_analitica'),
+    path('api/buscar/', views.api_buscar, name='api_buscar'),
+    path('api/cambios/', views.api_cambios, name='api_cambios'),
+    path('api/eventos/', views.api_eventos, name='api_eventos'),
+    path('api/eventos/espera/', views.api_eventos_espera, name='api_eventos_espera'),
+    path('api/exportaciones/', views.api_exportaciones, name='api_exportaciones'),
+    path('api/exportaciones/<int:trabajo_id>/', views.api_exportacion_estado, name='api_exportacion_estado'),
+    path('metrics', views.metricas_view, name='metricas'),
 ]
@@ -1,17 +1,34 @@
-from django.shortcuts import render, redirect
+from asgiref.sync import sync_to_async
+from django.shortcuts import render, redirect, get_object_or_404
+from django.urls import reverse
 from django.contrib.auth import authenticate, login, logout
 from django.contrib.auth.decorators import login_required
-from django.http import JsonResponse, HttpResponse
-from django.db.models import Q, Sum, Avg
-from django.utils.dateparse import parse_date
+from django.http import JsonResponse, HttpResponse, HttpResponseBadRequest, StreamingHttpResponse, FileResponse, Http404
+from django.db.models import Q, Sum, Avg, Count, Max
 from django.views.decorators.csrf import csrf_exempt
-from django.core.cache import cache
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
 from django.utils import timezone
+from django.utils.cache import patch_vary_headers
+from django.utils.crypto import constant_time_compare
+from django.utils.dateparse import parse_datetime
 import csv
-import pandas as pd
 from datetime import datetime, timedelta
 import json
-from .models import Vehiculo
+from urllib.parse import urlencode
+from .models import Vehiculo, ResumenDiario, TrabajoExportacion
+from .filtros import filtrar_vehiculos, obtener_filtros, q_rango_dias, rango_fechas, valor_validado
+from . import analitica, busqueda, cache_datos, cache_exportaciones, importacion, listado, resumen
+from .cambios import TokenExpirado, TokenInvalido, obtener_cambios
+from .compresion import codificacion_aceptada, comprimir_flujo
+from .condicional import condicional
+from .eventos import difusor
+from .exportacion import FORMATOS_ARCHIVO, bloques_csv, comprimir_gzip
+from .metricas import registro as registro_metricas
+from .paginacion import CursorInvalido, PaginadorKeyset, tamano_pagina
+from .trabajos import LimiteTrabajosExcedido, enviar_trabajo, ruta_archivo, serializar_trabajo
 
 
 def login_view(request):
@@ -43,89 +60,110 @@ def logout_view(request):
 
 @login_required
 def principal_view(request):
-    """Vista principal con caché y optimización"""
-    # Obtener parámetros de filtrado
-    placa_filter = request.GET.get('placa', '')
-    fecha_inicio_filter = request.GET.get('fecha_inicio', '')
-    fecha_fin_filter = request.GET.get('fecha_fin', '')
-    validado_filter = request.GET.get('validado', '')
-    
-    # Construir consulta base con optimización
-    queryset = Vehiculo.objects.all()
-    
-    # Aplicar filtros
-    if placa_filter:
-        queryset = queryset.filter(placa__icontains=placa_filter)
-    
-    if fecha_inicio_filter:
-        fecha_inicio = parse_date(fecha_inicio_filter)
-        if fecha_inicio:
-            queryset = queryset.filter(fecha_inicio__date__gte=fecha_inicio)
-    
-    if fecha_fin_filter:
-        fecha_fin = parse_date(fecha_fin_filter)
-        if fecha_fin:
-            queryset = queryset.filter(fecha_inicio__date__lte=fecha_fin)
-    
-    if validado_filter:
-        if validado_filter == 'true':
-            queryset = queryset.filter(validado=True)
-        elif validado_filter == 'false':
-            queryset = queryset.filter(validado=False)
-    
-    # MOSTRAR TODOS LOS VEHÍCULOS (sin paginación)
-    vehiculos = queryset.order_by('-fecha_inicio')
+    """Vista principal con paginación por cursor"""
+    filtros = obtener_filtros(request.GET)
+    queryset = filtrar_vehiculos(filtros)
+    
+    # Paginación keyset sobre (fecha_inicio, id): el costo no depende de la profundidad
+    paginador = PaginadorKeyset(queryset, tamano=request.GET.get('por_pagina'))
+    cursor = request.GET.get('cursor')
+    try:
+        pagina = cache_datos.obtener_o_calcular(
+            'pagina',
+            {**filtros, 'cursor': cursor, 'tamano': paginador.tamano},
+            lambda: paginador.pagina(cursor),
+        )
+    except CursorInvalido as e:
+        return HttpResponseBadRequest(str(e))
     
     # Calcular estadísticas adicionales
-    stats = calculate_real_time_stats(queryset)
+    stats = obtener_stats(filtros, queryset)
+    
+    # Query string de los filtros para los enlaces de paginación
+    parametros = {nombre: valor for nombre, valor in filtros.items() if valor}
+    if request.GET.get('por_pagina'):
+        parametros['por_pagina'] = pagina.tamano
     
     context = {
-        'vehiculos': vehiculos,
-        'placa_filter': placa_filter,
-        'fecha_inicio_filter': fecha_inicio_filter,
-        'fecha_fin_filter': fecha_fin_filter,
-        'validado_filter': validado_filter,
+        'vehiculos': pagina.objetos,
+        'pagina': pagina,
+        'filtros_query': urlencode(parametros),
+        'placa_filter': filtros['placa'],
+        'q_filter': filtros['q'],
+        'fecha_inicio_filter': filtros['fecha_inicio'],
+        'fecha_fin_filter': filtros['fecha_fin'],
+        'validado_filter': filtros['validado'],
         'stats': stats,
     }
     
     return render(request, 'vehiculos/principal.html', context)
 
 
+def obtener_stats(filtros, queryset):
+    """Estadísticas (cacheadas por versión de datos) desde el resumen diario cuando los filtros lo permiten"""
+    def calcular():
+        if getattr(settings, 'VEHICULOS_STATS_DESDE_RESUMEN', False) and resumen.admite_filtros(filtros):
+            fecha_desde, fecha_hasta = rango_fechas(filtros)
+            return resumen.stats_desde_resumen(fecha_desde, fecha_hasta, valor_validado(filtros))
+        return calculate_real_time_stats(queryset)
+    
+    return cache_datos.obtener_o_calcular('stats', filtros, calcular)
+
+
 def calculate_real_time_stats(queryset):
-    """Calcular estadísticas en tiempo real"""
-    total = queryset.count()
-    validados = queryset.filter(validado=True).count()
-    no_validados = total - validados
+    """Calcular estadísticas en tiempo real con una sola consulta de agregación"""
+    hoy = timezone.localdate()
     
-    # Estadísticas por tipo
-    stats_tipo = {}
-    for tipo in ['Turbo', 'Sencillo', 'Eléctrico']:
-        count = queryset.filter(tipo_vehiculo=tipo).count()
-        stats_tipo[tipo.lower()] = count
+    agregados = {
+        'total': Count('pk'),
+        'validados': Count('pk', filter=Q(validado=True)),
+        'total_entregas': Sum('numero_entregas'),
+        'total_facturacion': Sum('facturacion'),
+        'total_horas': Sum('duracion_horas'),
+        'ultima_actualizacion': Max('fecha_inicio'),
+        'vehiculos_hoy': Count('pk', filter=q_rango_dias(hoy, hoy)),
+        'vehiculos_ultima_semana': Count('pk', filter=q_rango_dias(hoy - timedelta(days=7))),
+    }
+    
+    # Desgloses por tipo, estado y prioridad como conteos condicionales
+    desgloses = {
+        'stats_tipo': ('tipo_vehiculo', Vehiculo.TIPO_VEHICULO_CHOICES),
+        'stats_estado': ('estado', Vehiculo.ESTADO_CHOICES),
+        'stats_prioridad': ('prioridad', Vehiculo.PRIORIDAD_CHOICES),
+    }
+    for nombre, (campo, choices) in desgloses.items():
+        for indice, (valor, _) in enumerate(choices):
+            agregados[f'{nombre}_{indice}'] = Count('pk', filter=Q(**{campo: valor}))
     
-    # Entregas y facturación
-    total_entregas = queryset.aggregate(total_entregas=Sum('numero_entregas'))['total_entregas'] or 0
-    total_facturacion = queryset.aggregate(total_facturacion=Sum('facturacion'))['total_facturacion'] or 0
+    resultado = queryset.aggregate(**agregados)
     
-    # Última actualización
-    ultima_actualizacion = queryset.order_by('-fecha_inicio').first()
+    total = resultado['total']
+    validados = resultado['validados']
+    total_entregas = resultado['total_entregas'] or 0
+    total_facturacion = resultado['total_facturacion'] or 0
+    total_horas = resultado['total_horas'] or 0
     
-    return {
+    stats = {
         'total_vehiculos': total,
         'vehiculos_validados': validados,
-        'vehiculos_no_validados': no_validados,
+        'vehiculos_no_validados': total - validados,
         'porcentaje_validacion': round((validados / total * 100), 2) if total > 0 else 0,
-        'stats_tipo': stats_tipo,
         'total_entregas': total_entregas,
         'total_facturacion': total_facturacion,
         'promedio_entregas': round(total_entregas / total, 2) if total > 0 else 0,
         'promedio_facturacion': round(total_facturacion / total, 2) if total > 0 else 0,
-        'ultima_actualizacion': ultima_actualizacion.fecha_inicio if ultima_actualizacion else None,
-        'vehiculos_hoy': queryset.filter(fecha_inicio__date=timezone.now().date()).count(),
-        'vehiculos_ultima_semana': queryset.filter(
-            fecha_inicio__date__gte=timezone.now().date() - timedelta(days=7)
-        ).count(),
+        **resumen.indicadores_stats(total, total_entregas, total_horas),
+        'ultima_actualizacion': resultado['ultima_actualizacion'],
+        'vehiculos_hoy': resultado['vehiculos_hoy'],
+        'vehiculos_ultima_semana': resultado['vehiculos_ultima_semana'],
     }
+    for nombre, (campo, choices) in desgloses.items():
+        stats[nombre] = {
+            (str(etiqueta) if campo == 'prioridad' else str(valor)).lower(): resultado[f'{nombre}_{indice}']
+            for indice, (valor, etiqueta) in enumerate(choices)
+        }
+    
+    return stats
 
 
 @login_required
@@ -163,37 +201,42 @@ def toggle_validacion(request):
     })
 
 
+async def _flujo_asincrono(bloques):
+    """
+    Recorrer un iterable síncrono de a un bloque por vez desde el event loop.
+
+    Bajo ASGI, Django 4.2 consume los iteradores síncronos de las respuestas
+    en streaming con ``sync_to_async(list)``: la exportación entera quedaría
+    en memoria antes de enviar el primer byte. Cada bloque se genera en el
+    hilo de la petición (``thread_sensitive``), donde vive su cursor.
+    """
+    bloques = iter(bloques)
+    siguiente = sync_to_async(next, thread_sensitive=True)
+    fin = object()
+    try:
+        while (bloque := await siguiente(bloques, fin)) is not fin:
+            yield bloque
+    finally:
+        # Cliente desconectado: el generador limpia sus temporales
+        if hasattr(bloques, 'close'):
+            await sync_to_async(bloques.close, thread_sensitive=True)()
+
+
+def _streaming_asgi(request, response):
+    """Adaptar al servidor ASGI una respuesta en streaming con iterador síncrono"""
+    if isinstance(request, ASGIRequest) and response.streaming and not response.is_async:
+        response.streaming_content = _flujo_asincrono(response.streaming_content)
+    return response
+
+
 @login_required
+@condicional
 def exportar_datos(request):
     """Exportación simplificada y sin errores"""
     # Obtener los mismos filtros que en la vista principal
-    placa_filter = request.GET.get('placa', '')
-    fecha_inicio_filter = request.GET.get('fecha_inicio', '')
-    fecha_fin_filter = request.GET.get('fecha_fin', '')
-    validado_filter = request.GET.get('validado', '')
     export_type = request.GET.get('type', 'excel')
-    
-    # Construir consulta base
-    queryset = Vehiculo.objects.all()
-    
-    if placa_filter:
-        queryset = queryset.filter(placa__icontains=placa_filter)
-    
-    if fecha_inicio_filter:
-        fecha_inicio = parse_date(fecha_inicio_filter)
-        if fecha_inicio:
-            queryset = queryset.filter(fecha_inicio__date__gte=fecha_inicio)
-    
-    if fecha_fin_filter:
-        fecha_fin = parse_date(fecha_fin_filter)
-        if fecha_fin:
-            queryset = queryset.filter(fecha_inicio__date__lte=fecha_fin)
-    
-    if validado_filter:
-        if validado_filter == 'true':
-            queryset = queryset.filter(validado=True)
-        elif validado_filter == 'false':
-            queryset = queryset.filter(validado=False)
+    filtros = obtener_filtros(request.GET)
+    queryset = filtrar_vehiculos(filtros)
     
     # Ordenar
     vehiculos = queryset.order_by('-fecha_inicio')
@@ -202,141 +245,215 @@ def exportar_datos(request):
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
     filename_base = f"vehiculos_{timestamp}"
     
-    if export_type == 'csv':
+    if export_type == 'resumen':
+        # Resumen diario precalculado: O(días) en lugar de O(filas)
+        fecha_desde, fecha_hasta = rango_fechas(filtros)
+        filas = ResumenDiario.objects.all()
+        if fecha_desde:
+            filas = filas.filter(dia__gte=fecha_desde)
+        if fecha_hasta:
+            filas = filas.filter(dia__lte=fecha_hasta)
+        validado = valor_validado(filtros)
+        if validado is not None:
+            filas = filas.filter(validado=validado)
+        
         response = HttpResponse(content_type='text/csv')
-        response['Content-Disposition'] = f'attachment; filename="{filename_base}.csv"'
+        response['Content-Disposition'] = f'attachment; filename="resumen_{timestamp}.csv"'
         
         writer = csv.writer(response)
         writer.writerow([
-            'Código', 'Placa', 'Tipo Vehículo', 'Fecha Inicio', 'Fecha Fin', 
-            'Número Entregas', 'Facturación', 'Observación', 'Cliente', 'Validado'
+            'Día', 'Tipo Vehículo', 'Validado', 'Cliente',
+            'Vehículos', 'Número Entregas', 'Facturación'
         ])
-        
-        for vehiculo in vehiculos:
+        for fila in filas.order_by('dia', 'tipo_vehiculo', 'cliente').values_list(
+            'dia', 'tipo_vehiculo', 'validado', 'cliente',
+            'total_vehiculos', 'total_entregas', 'total_facturacion'
+        ):
+            dia, tipo, validado_fila, cliente, total, entregas, facturacion = fila
             writer.writerow([
-                vehiculo.codigo,
-                vehiculo.placa,
-                vehiculo.tipo_vehiculo,
-                vehiculo.fecha_inicio.strftime('%Y-%m-%d %H:%M:%S'),
-                vehiculo.fecha_fin.strftime('%Y-%m-%d %H:%M:%S'),
-                vehiculo.numero_entregas,
-                str(vehiculo.facturacion),
-                vehiculo.observacion or '',
-                vehiculo.cliente,
-                'Sí' if vehiculo.validado else 'No'
+                dia.isoformat(), tipo, 'Sí' if validado_fila else 'No', cliente,
+                total, entregas, str(facturacion)
             ])
         
         return response
     
-    else:  # Excel - versión ultra simplificada
-        try:
-            # Crear datos básicos
-            data = []
-            for vehiculo in vehiculos:
-                data.append({
-                    'Código': vehiculo.codigo,
-                    'Placa': vehiculo.placa,
-                    'Tipo Vehículo': vehiculo.tipo_vehiculo,
-                    'Fecha Inicio': vehiculo.fecha_inicio.strftime('%Y-%m-%d %H:%M:%S'),
-                    'Fecha Fin': vehiculo.fecha_fin.strftime('%Y-%m-%d %H:%M:%S'),
-                    'Número Entregas': vehiculo.numero_entregas,
-                    'Facturación': float(vehiculo.facturacion),
-                    'Observación': vehiculo.observacion or '',
-                    'Cliente': vehiculo.cliente,
-                    'Validado': 'Sí' if vehiculo.validado else 'No'
-                })
-            
-            df = pd.DataFrame(data)
-            
-            # Crear respuesta HTTP
-            response = HttpResponse(content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
-            response['Content-Disposition'] = f'attachment; filename="{filename_base}.xlsx"'
-            
-            # Exportar a Excel
-            with pd.ExcelWriter(response, engine='openpyxl') as writer:
-                df.to_excel(writer, index=False, sheet_name='Vehículos')
-            
-            return response
-            
-        except Exception as e:
-            # Si falla, intentar con método más simple
-            try:
-                import io
-                output = io.BytesIO()
-                
-                # Crear DataFrame simple
-                data = []
-                for vehiculo in vehiculos:
-                    data.append([
-                        vehiculo.codigo,
-                        vehiculo.placa,
-                        vehiculo.tipo_vehiculo,
-                        vehiculo.fecha_inicio.strftime('%Y-%m-%d %H:%M:%S'),
-                        vehiculo.fecha_fin.strftime('%Y-%m-%d %H:%M:%S'),
-                        vehiculo.numero_entregas,
-                        float(vehiculo.facturacion),
-                        vehiculo.observacion or '',
-                        vehiculo.cliente,
-                        'Sí' if vehiculo.validado else 'No'
-                    ])
-                
-                df = pd.DataFrame(data, columns=[
-                    'Código', 'Placa', 'Tipo Vehículo', 'Fecha Inicio', 'Fecha Fin',
-                    'Número Entregas', 'Facturación', 'Observación', 'Cliente', 'Validado'
-                ])
-                
-                # Guardar en BytesIO
-                df.to_excel(output, index=False, engine='openpyxl')
-                output.seek(0)
-                
-                # Crear respuesta
-                response = HttpResponse(
-                    output.read(),
-                    content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-                )
-                response['Content-Disposition'] = f'attachment; filename="{filename_base}.xlsx"'
-                
-                return response
-                
-            except Exception as e2:
-                # Último recurso: CSV con extensión XLSX
-                response = HttpResponse(content_type='text/csv')
-                response['Content-Disposition'] = f'attachment; filename="{filename_base}.xlsx"'
-                
-                writer = csv.writer(response)
-                writer.writerow([
-                    'Código', 'Placa', 'Tipo Vehículo', 'Fecha Inicio', 'Fecha Fin', 
-                    'Número Entregas', 'Facturación', 'Observación', 'Cliente', 'Validado'
-                ])
-                
-                for vehiculo in vehiculos:
-                    writer.writerow([
-                        vehiculo.codigo,
-                        vehiculo.placa,
-                        vehiculo.tipo_vehiculo,
-                        vehiculo.fecha_inicio.strftime('%Y-%m-%d %H:%M:%S'),
-                        vehiculo.fecha_fin.strftime('%Y-%m-%d %H:%M:%S'),
-                        vehiculo.numero_entregas,
-                        str(vehiculo.facturacion),
-                        vehiculo.observacion or '',
-                        vehiculo.cliente,
-                        'Sí' if vehiculo.validado else 'No'
-                    ])
-                
-                return response
+    elif export_type == 'csv':
+        # CSV en streaming: memoria constante y descarga inmediata. Se guarda a la vez
+        # en la caché de exportaciones, ya comprimido con la codificación negociada,
+        # para que las repeticiones se sirvan desde disco sin comprimir de nuevo
+        if request.GET.get('gzip') in ('1', 'true'):
+            formato, extension, content_type, codificacion = 'csv.gz', 'csv.gz', 'application/gzip', None
+            bloques = comprimir_gzip(bloques_csv(vehiculos))
+        else:
+            codificacion = codificacion_aceptada(request)
+            formato, content_type = 'csv', 'text/csv'
+            extension = f'csv.{codificacion}' if codificacion else 'csv'
+            bloques = comprimir_flujo((bloque.encode('utf-8') for bloque in bloques_csv(vehiculos)), codificacion)
+        
+        nombre = cache_exportaciones.nombre_archivo(formato, filtros, extension)
+        archivo = cache_exportaciones.abrir(nombre)
+        if archivo is not None:
+            response = FileResponse(archivo, content_type=content_type)
+        else:
+            response = StreamingHttpResponse(cache_exportaciones.flujo(nombre, bloques), content_type=content_type)
+        descarga = 'csv.gz' if formato == 'csv.gz' else 'csv'
+        response['Content-Disposition'] = f'attachment; filename="{filename_base}.{descarga}"'
+        if codificacion:
+            response['Content-Encoding'] = codificacion
+        patch_vary_headers(response, ('Accept-Encoding',))
+        
+        return _streaming_asgi(request, response)
+    
+    else:
+        # Excel (write-only), Parquet y Arrow IPC se generan una sola vez por versión de
+        # datos en la caché de exportaciones y se sirven con FileResponse (sendfile)
+        if export_type not in FORMATOS_ARCHIVO:
+            export_type = 'excel'
+        escritor, extension, content_type = FORMATOS_ARCHIVO[export_type]
+        archivo = cache_exportaciones.obtener(
+            cache_exportaciones.nombre_archivo(export_type, filtros, extension),
+            lambda destino: escritor(vehiculos, destino),
+        )
+        return _streaming_asgi(request, FileResponse(
+            archivo,
+            as_attachment=True,
+            filename=f'{filename_base}.{extension}',
+            content_type=content_type,
+        ))
 
 
 @login_required
+def api_exportaciones(request):
+    """API para encolar una exportación en segundo plano con los filtros actuales"""
+    if request.method != 'POST':
+        return JsonResponse({
+            'success': False,
+            'message': 'Método no permitido'
+        }, status=405)
+    
+    try:
+        trabajo = enviar_trabajo(
+            request.user,
+            request.POST.get('type', 'excel'),
+            obtener_filtros(request.POST),
+        )
+    except LimiteTrabajosExcedido as e:
+        return JsonResponse({'success': False, 'message': str(e)}, status=429)
+    except ValueError as e:
+        return JsonResponse({'success': False, 'message': str(e)}, status=400)
+    
+    return JsonResponse({
+        'success': True,
+        'trabajo': serializar_trabajo(trabajo),
+        'estado_url': reverse('api_exportacion_estado', args=[trabajo.pk]),
+        'descarga_url': reverse('descargar_exportacion', args=[trabajo.pk]),
+    }, status=202)
+
+
+@login_required
+def api_exportacion_estado(request, trabajo_id):
+    """API para consultar el avance de una exportación en segundo plano"""
+    try:
+        trabajo = TrabajoExportacion.objects.get(pk=trabajo_id, usuario=request.user)
+    except TrabajoExportacion.DoesNotExist:
+        return JsonResponse({
+            'success': False,
+            'message': 'Exportación no encontrada'
+        }, status=404)
+    
+    return JsonResponse({'success': True, 'trabajo': serializar_trabajo(trabajo)})
+
+
+@login_required
+def descargar_exportacion(request, trabajo_id):
+    """Descargar el archivo de una exportación completada"""
+    trabajo = get_object_or_404(
+        TrabajoExportacion, pk=trabajo_id, usuario=request.user, estado='completado'
+    )
+    ruta = ruta_archivo(trabajo)
+    if not ruta.exists():
+        raise Http404('El archivo de la exportación ya no está disponible')
+    
+    _, _, content_type = FORMATOS_ARCHIVO[trabajo.formato]
+    return _streaming_asgi(request, FileResponse(
+        open(ruta, 'rb'), as_attachment=True, filename=trabajo.archivo, content_type=content_type,
+    ))
+
+
+@login_required
+@condicional
 def api_real_time_stats(request):
     """API para estadísticas en tiempo real"""
-    stats = calculate_real_time_stats(Vehiculo.objects.all())
+    filtros = obtener_filtros(request.GET)
+    stats = obtener_stats(filtros, filtrar_vehiculos(filtros))
     return JsonResponse(stats)
 
 
+@login_required
+@condicional
+def api_ranking_rendimiento(request):
+    """
+    Viajes con peor (``orden=peores``, por defecto) o mejor rendimiento.
+    
+    Admite los filtros habituales; con un rango de fechas, p. ej. los 100
+    viajes menos eficientes del mes, es una sola consulta sobre el índice
+    ``(rendimiento, fecha_inicio)``.
+    """
+    filtros = obtener_filtros(request.GET)
+    orden = request.GET.get('orden', 'peores')
+    if orden not in ('peores', 'mejores'):
+        return JsonResponse({
+            'success': False,
+            'message': 'Parámetro orden inválido (peores o mejores)'
+        }, status=400)
+    
+    try:
+        limite = min(max(int(request.GET.get('limite', 100)), 1), 1000)
+    except ValueError:
+        limite = 100
+    
+    def calcular():
+        campo = 'rendimiento' if orden == 'peores' else '-rendimiento'
+        return list(
+            filtrar_vehiculos(filtros).order_by(campo, 'id').values(
+                'id', 'codigo', 'placa', 'tipo_vehiculo', 'cliente', 'fecha_inicio',
+                'numero_entregas', 'duracion_horas', 'facturacion_por_entrega', 'rendimiento',
+            )[:limite]
+        )
+    
+    vehiculos = cache_datos.obtener_o_calcular(
+        'ranking', {**filtros, 'orden': orden, 'limite': limite}, calcular
+    )
+    return JsonResponse({'success': True, 'orden': orden, 'vehiculos': vehiculos})
+
+
+@login_required
+@condicional
+def api_analitica(request):
+    """
+    KPIs de la flota agregados por las dimensiones de ``por`` (p. ej. ``por=cliente,tipo``).
+    
+    Admite los filtros habituales; el resultado se cachea por versión de datos.
+    """
+    filtros = obtener_filtros(request.GET)
+    try:
+        dimensiones = analitica.dimensiones(request.GET.get('por', 'tipo'))
+    except ValueError as e:
+        return JsonResponse({'success': False, 'message': str(e)}, status=400)
+    
+    datos = cache_datos.obtener_o_calcular(
+        'analitica',
+        {**filtros, 'por': ','.join(dimensiones)},
+        lambda: analitica.analizar(filtrar_vehiculos(filtros), dimensiones),
+    )
+    return JsonResponse({'success': True, **datos})
+
+
 @login_required
 def api_check_updates(request):
     """API para verificar actualizaciones"""
-    last_check = request.session.get('last_check', timezone.now() - timedelta(minutes=5))
+    # La sesión guarda el último chequeo como texto ISO
+    last_check = parse_datetime(request.session.get('last_check', '')) or timezone.now() - timedelta(minutes=5)
     has_updates = Vehiculo.objects.filter(
         updated_at__gt=last_check
     ).exists()
@@ -345,12 +462,192 @@ def api_check_updates(request):
     
     return JsonResponse({
         'hasUpdates': has_updates,
-        'lastCheck': last_check.isoformat() if last_check else None,
+        'lastCheck': last_check.isoformat(),
         'currentTime': timezone.now().isoformat()
     })
 
 
 @login_required
+def api_cambios(request):
+    """
+    API de cambios incrementales (watermark + token de continuación).
+    
+    El cliente aplica primero ``vehiculos`` (upsert por id) y luego
+    ``eliminados``; mientras ``hay_mas`` sea verdadero debe volver a llamar
+    con el ``token`` recibido, que también sirve para la siguiente sincronización.
+    """
+    desde = request.GET.get('desde')
+    if desde:
+        desde = parse_datetime(desde)
+        if desde is None:
+            return JsonResponse({
+                'success': False,
+                'message': 'Parámetro desde inválido'
+            }, status=400)
+    
+    try:
+        cambios = obtener_cambios(
+            token=request.GET.get('token'),
+            desde=desde,
+            limite=request.GET.get('limite'),
+        )
+    except TokenInvalido as e:
+        # 410: las eliminaciones posteriores al token ya se podaron
+        return JsonResponse({
+            'success': False,
+            'message': str(e)
+        }, status=410 if isinstance(e, TokenExpirado) else 400)
+    
+    return JsonResponse({'success': True, **cambios})
+
+
+@login_required
+def api_buscar(request):
+    """
+    Búsqueda de texto libre en cliente y observación, ordenada por relevancia.
+    
+    Admite además los filtros habituales (placa, fechas, validado).
+    """
+    texto = request.GET.get('q', '').strip()
+    if not texto:
+        return JsonResponse({
+            'success': False,
+            'message': 'Parámetro q requerido'
+        }, status=400)
+    
+    try:
+        limite = min(max(int(request.GET.get('limite', 20)), 1), 100)
+    except ValueError:
+        limite = 20
+    
+    filtros = {**obtener_filtros(request.GET), 'q': ''}
+    resultados = busqueda.buscar(texto, limite, queryset=filtrar_vehiculos(filtros))
+    vehiculos = Vehiculo.objects.in_bulk([vehiculo_id for vehiculo_id, _, _ in resultados])
+    
+    return JsonResponse({
+        'success': True,
+        'resultados': [
+            {
+                'id': vehiculo_id,
+                'codigo': vehiculos[vehiculo_id].codigo,
+                'placa': vehiculos[vehiculo_id].placa,
+                'cliente': vehiculos[vehiculo_id].cliente,
+                'fecha_inicio': vehiculos[vehiculo_id].fecha_inicio.isoformat(),
+                'fragmento': fragmento,
+                'relevancia': round(-rango, 4),
+            }
+            for vehiculo_id, rango, fragmento in resultados
+            if vehiculo_id in vehiculos
+        ],
+    })
+
+
+def _evento_sse(evento):
+    if evento is None:
+        return ': ping\n\n'
+    secuencia, tipo, datos = evento
+    return f'id: {secuencia}\nevent: {tipo}\ndata: {json.dumps(datos, cls=DjangoJSONEncoder)}\n\n'
+
+
+async def api_eventos(request):
+    """
+    Server-Sent Events con los cambios de vehículos y los KPIs actualizados.
+    
+    Requiere un servidor ASGI (``gestion_vehiculos.asgi``); bajo WSGI el
+    cliente debe usar el long-poll de ``api/eventos/espera/``.
+    """
+    autenticado = await sync_to_async(lambda: request.user.is_authenticated)()
+    if not autenticado:
+        return JsonResponse({'success': False, 'message': 'No autenticado'}, status=401)
+    if not isinstance(request, ASGIRequest):
+        return JsonResponse({
+            'success': False,
+            'message': 'Eventos en vivo disponibles solo con ASGI; usar api/eventos/espera/'
+        }, status=501)
+    
+    difusor.iniciar_detector()
+    try:
+        desde = int(request.headers.get('Last-Event-ID') or request.GET.get('desde') or difusor.version)
+    except (TypeError, ValueError):
+        desde = None
+    
+    async def flujo():
+        yield 'retry: 5000\n\n'
+        async for evento in difusor.escuchar(desde=desde):
+            yield _evento_sse(evento)
+    
+    response = StreamingHttpResponse(flujo(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+@login_required
+def api_eventos_espera(request):
+    """
+    Long-poll de eventos (alternativa a SSE bajo WSGI).
+    
+    ``desde`` es la versión de datos devuelta por la llamada anterior, válida
+    en cualquier worker. Por defecto no se espera: la respuesta es inmediata y
+    ``reintentar`` indica cuántos segundos esperar antes de volver a preguntar,
+    para no retener un worker WSGI por pestaña abierta.
+    """
+    try:
+        desde = int(request.GET['desde'])
+    except (KeyError, ValueError):
+        desde = None
+    
+    eventos, version = difusor.esperar(desde, timeout=getattr(settings, 'VEHICULOS_EVENTOS_ESPERA_SEGUNDOS', 0))
+    return JsonResponse({
+        'version': version,
+        'reintentar': getattr(settings, 'VEHICULOS_EVENTOS_SONDEO_SEGUNDOS', 5),
+        'eventos': [
+            {'id': id_evento, 'tipo': tipo, 'datos': datos}
+            for id_evento, tipo, datos in eventos
+        ],
+    })
+
+
+@login_required
+@condicional
+def api_vehiculos(request):
+    """
+    Listado paginado en formato columnar para la tabla virtualizada.
+    
+    Parámetros: los filtros habituales, ``campos`` (separados por comas),
+    ``orden`` (``fecha_inicio``, ``rendimiento`` o ``codigo``, con ``-`` para
+    descendente), ``por_pagina`` y ``cursor``. ``tipo_vehiculo``, ``estado`` y
+    ``cliente`` llegan como índices en ``diccionarios``.
+    """
+    filtros = obtener_filtros(request.GET)
+    try:
+        nombres = listado.campos(request.GET.get('campos'))
+        campo, descendente = listado.orden(request.GET.get('orden'))
+    except ValueError as e:
+        return JsonResponse({'success': False, 'message': str(e)}, status=400)
+    
+    tamano = tamano_pagina(request.GET.get('por_pagina'))
+    cursor = request.GET.get('cursor')
+    parametros = {
+        **filtros,
+        'campos': ','.join(nombres),
+        'orden': f'{"-" if descendente else ""}{campo}',
+        'tamano': tamano,
+        'cursor': cursor,
+    }
+    try:
+        datos = cache_datos.obtener_o_calcular(
+            'listado',
+            parametros,
+            lambda: listado.listar(filtrar_vehiculos(filtros), nombres, campo, descendente, tamano, cursor),
+        )
+    except CursorInvalido as e:
+        return JsonResponse({'success': False, 'message': str(e)}, status=400)
+    return JsonResponse({'success': True, **datos}, json_dumps_params={'separators': (',', ':')})
+
+
+@login_required
+@condicional
 def api_vehicle_details(request, vehicle_id):
     """API para detalles de vehículo específico"""
     try:
@@ -369,6 +666,9 @@ def api_vehicle_details(request, vehicle_id):
                 'observacion': vehicle.observacion,
                 'cliente': vehicle.cliente,
                 'validado': vehicle.validado,
+                'duracion_horas': str(vehicle.duracion_horas),
+                'facturacion_por_entrega': str(vehicle.facturacion_por_entrega),
+                'rendimiento': str(vehicle.rendimiento),
                 'created_at': vehicle.created_at.isoformat() if hasattr(vehicle, 'created_at') else None,
                 'updated_at': vehicle.updated_at.isoformat() if hasattr(vehicle, 'updated_at') else None,
             }
@@ -382,30 +682,47 @@ def api_vehicle_details(request, vehicle_id):
 
 @login_required
 def api_bulk_validation(request):
-    """API para validación masiva"""
+    """
+    API para validación masiva con UPDATE por conjuntos dentro de una transacción.
+    
+    Con ``modo=filtros`` se actualizan todos los vehículos que coinciden con
+    los filtros enviados (los mismos de la vista principal) sin enviar ids.
+    """
     if request.method == 'POST':
-        vehicle_ids = request.POST.getlist('vehicle_ids[]')
         action = request.POST.get('action')  # 'validate' or 'invalidate'
+        if action not in ('validate', 'invalidate'):
+            return JsonResponse({
+                'success': False,
+                'message': 'Acción no válida'
+            })
+        validado = action == 'validate'
+        
+        if request.POST.get('modo') == 'filtros':
+            querysets = [filtrar_vehiculos(obtener_filtros(request.POST))]
+        else:
+            vehicle_ids = request.POST.getlist('vehicle_ids[]')
+            lote = getattr(settings, 'VEHICULOS_VALIDACION_LOTE', 900)
+            querysets = [
+                Vehiculo.objects.filter(id__in=vehicle_ids[i:i + lote])
+                for i in range(0, len(vehicle_ids), lote)
+            ]
         
         try:
-            vehicles = Vehiculo.objects.filter(id__in=vehicle_ids)
             updated_count = 0
-            
-            for vehicle in vehicles:
-                if action == 'validate':
-                    vehicle.validado = True
-                elif action == 'invalidate':
-                    vehicle.validado = False
-                
-                vehicle.save()
-                updated_count += 1
-            
-            # Invalidar caché
-            cache.delete_pattern(f"vehiculos_*")
+            with transaction.atomic():
+                ahora = timezone.now()
+                for queryset in querysets:
+                    # Solo se tocan las filas que cambian de estado; el resumen lo mantiene update()
+                    pendientes = queryset.exclude(validado=validado)
+                    updated_count += pendientes.update(
+                        validado=validado,
+                        updated_at=ahora,
+                        usuario_modificacion=request.user,
+                    )
             
             return JsonResponse({
                 'success': True,
-                'message': f'Se {action}ron {updated_count} vehículos exitosamente',
+                'message': f'Se {"validaron" if validado else "invalidaron"} {updated_count} vehículos exitosamente',
                 'updated_count': updated_count
             })
             
@@ -419,3 +736,51 @@ def api_bulk_validation(request):
         'success': False,
         'message': 'Método no permitido'
     })
+
+
+@login_required
+def api_importar(request):
+    """
+    API de importación de un archivo CSV/XLSX (campo ``archivo``) con upsert por código.
+    
+    Las filas con errores se informan en ``errores`` sin detener la carga.
+    """
+    if request.method != 'POST':
+        return JsonResponse({'success': False, 'message': 'Método no permitido'}, status=405)
+    
+    archivo = request.FILES.get('archivo')
+    if archivo is None:
+        return JsonResponse({'success': False, 'message': 'Falta el archivo'}, status=400)
+    
+    try:
+        resultado = importacion.importar(archivo, archivo.name, usuario=request.user)
+    except importacion.ErrorImportacion as e:
+        return JsonResponse({'success': False, 'message': str(e)}, status=400)
+    
+    return JsonResponse({
+        'success': True,
+        'message': (
+            f'{resultado["creados"]} creados, {resultado["actualizados"]} actualizados, '
+            f'{resultado["sin_cambios"]} sin cambios, {resultado["total_errores"]} filas con errores'
+        ),
+        **resultado,
+    })
+
+
+def metricas_view(request):
+    """
+    Métricas del proceso en formato de texto de Prometheus.
+    
+    Sin sesión: si ``VEHICULOS_METRICAS_TOKEN`` está definido se exige
+    ``Authorization: Bearer <token>``.
+    """
+    token = getattr(settings, 'VEHICULOS_METRICAS_TOKEN', '')
+    if token:
+        autorizacion = request.headers.get('Authorization', '')
+        if not constant_time_compare(autorizacion, f'Bearer {token}'):
+            return HttpResponse('No autorizado', status=401, content_type='text/plain')
+    
+    return HttpResponse(
+        registro_metricas.exposicion(),
+        content_type='text/plain; version=0.0.4; charset=utf-8'
+    )